@@ -1,108 +1,345 @@
+import base64
+import csv
 import os
+import queue
+import time
 import tkinter as tk
-from tkinter import ttk, messagebox, simpledialog
-import win32com.client
-import re
-import csv
+from tkinter import ttk, filedialog, messagebox, simpledialog
 from ttkthemes import ThemedTk
+import lbx
+from backends import create_backend
+from diagnostics import InstrumentedBackend, recorder, timed_action
+from jobs import DONE, Job, worker_pool
+from label_index import LabelIndex
+from labels import listed_folder, scan_folder
+from preview import PreviewRenderer, ThumbnailCache
+from reprice import (RepriceJournal, close_rolled_back, journal_old_prices, latest_journal, reprice_if_changed,
+                     restore_label)
+from row_view import LabelGridView, NAV_COLUMNS
+from schedule import DAYS
+from schedule_store import ScheduleStore
+from sessions import DocumentPool
+from settings import (BACKGROUND_WORKERS, BASE_DIR, CUT_MODE, DIAGNOSTICS_LOG, DOCUMENT_POOL_SIZE, INDEX_FILE,
+                      JOB_WORKERS, PREVIEW_CACHE_DIR, PREVIEW_DPI, PREVIEW_MEMORY_MB, PREVIEW_WIDTH, PRINT_BACKEND,
+                      PRINT_SERVER, PRINTER_PROFILES, PRINTERS, REPRICE_JOURNAL_DIR, SCHEDULE_DB, SCHEDULE_DIR,
+                      SNAPSHOT_DELAY, SNAPSHOT_FILE, SPOOL_DIR, TAB_PREFETCH, WATCH_DEBOUNCE, WATCH_POLL_INTERVAL)
+from server import PrintClient, PrintServerError
+from snapshot import Snapshot
+from spooler import PrintRun, Spooler, interrupted_jobs, plan_jobs
+from watcher import TreeWatcher
 
 # ------------------------------------------------------------------------
 # Global variables
 # ------------------------------------------------------------------------
-BASE_DIR = r"C:\Users\Deivydas\Desktop\label_printer1"  # Replace with your actual path
 current_price = "£0.00"
-CSV_FILE = "Spalding_numbers.csv"         # For white and brown labels
-CSV_PANINIS = "Spalding_paninis.CSV"        # For "other" (panini's) labels
 
 # This dictionary maps each tab (ttk.Frame) to its folder path.
 tab_folders = {}
 
-# Stores references to our file widgets keyed by:
-# (folder_path, (folder_type, filename)) -> (actual_subfolder, entry_widget)
-file_widgets = {}
+# Label data model for each tab keyed by folder_path -> FolderModel
+models = {}
+
+# Reverse map from an entry widget to the LabelRow it edits
+row_by_entry = {}
+
+# Tabs whose widgets have been created (tabs start as empty placeholders)
+built_tabs = set()
 
-# Global dictionary to map (folder_path, row, col) -> entry widget for arrow-key navigation
-grid_entries = {}
+# Tabs whose folder is being scanned on a worker before their widgets are created
+loading_tabs = set()
+
+# Models scanned ahead of time by the background thread, keyed by folder_path
+prescanned_models = {}
 
 # Dictionary to store day buttons for each tab (keyed by folder_path)
 day_buttons_by_tab = {}
 
-# --- NEW: Dictionaries to store the canvas and its scrollable frame for each folder ---
-canvas_by_folder = {}
-scrollable_frames = {}
+# Virtualized label grid of each built tab keyed by folder_path -> LabelGridView
+views_by_folder = {}
+
+# Print backend (see backends.py), created in main()
+backend = None
+
+# Worker threads shared by every background job, started in main(). They live as long as
+# the app, so the warm b-PAC documents the backend pools per thread are reused across actions.
+job_executor = None
+
+# Worker threads for work nobody is waiting on (the startup prescan and index refreshes after
+# file changes), so that a cold index never holds up the interactive jobs on job_executor.
+background_executor = None
+
+# Label metadata index, opened in main()
+label_index = None
+
+# Print spooler with its own worker thread, started in main()
+spooler = None
+
+# Client of the shared print server when PRINT_SERVER is set; printing and repricing then go through it
+print_client = None
+
+# Autosaved quantities of every tab, loaded in main() and restored as tabs are built
+snapshot = None
+
+# Day schedules of every store, imported from SCHEDULE_DIR into SCHEDULE_DB in main()
+schedule_store = None
+
+# Stores that have a schedule; their tabs get day buttons
+scheduled_stores = set()
+
+# (CSV path, problems) already shown by report_schedule_problems()
+reported_problems = set()
+
+# (store, product, day, bread) demand matrix built from the schedule store's newest weeks,
+# created by demand_matrix() the first time it is needed so that the GUI starts without numpy
+demand = None
+
+# Day loaded into each tab and its planned total from the demand matrix, keyed by folder_path
+planned_totals = {}
+
+# File changes reported by the BASE_DIR watcher thread, applied by poll_file_changes()
+file_changes = queue.Queue()
+watcher = None
+
+# Price of each tab's labels fetched on a worker, keyed by folder_path; cleared when the index is refreshed
+tab_prices = {}
+
+# Folders whose price is being fetched, and a counter that tells fetches started before the last refresh apart
+pending_prices = set()
+price_generation = 0
+
+# Folder of the last tab switch and when it happened, until its price is shown
+tab_switch = None
+
+# Background preview renderer, started in main(), and the label whose preview is wanted
+previews = None
+preview_path = None
 
 # Global references to main window objects
 root = None
 notebook = None
 current_tab_total_label = None
 price_label = None
+preview_label = None
 
 # ------------------------------------------------------------------------
 # Utility Functions
 # ------------------------------------------------------------------------
-def natural_key(text):
-    """
-    Splits the string into alpha and numeric parts so that sorting is done in natural order.
-    """
-    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', text)]
+def current_folder_path():
+    """Returns the folder path of the selected tab, or None."""
+    current_tab_name = notebook.select()
+    if not current_tab_name:
+        return None
+    return tab_folders.get(notebook.nametowidget(current_tab_name))
 
 # ------------------------------------------------------------------------
 # Price reading
 # ------------------------------------------------------------------------
 def get_price_from_label(file_path):
-    """Read the 'Price' value from a label file."""
+    """
+    Read the 'Price' value from a label file. .lbx files are read natively;
+    anything the codec can't parse is opened through b-PAC.
+    """
+    try:
+        return lbx.read_price(file_path)
+    except lbx.LbxError:
+        pass
     try:
-        bpac = win32com.client.Dispatch("bpac.Document")
-        if bpac.Open(file_path):
-            price_object = bpac.GetObject("Price")
-            return price_object.Text if price_object else None
+        with backend.session() as bpac:
+            if bpac.Open(file_path):
+                price_object = bpac.GetObject("Price")
+                return price_object.Text if price_object else None
     except Exception as e:
-        print(f"Error reading price from {file_path}: {e}")
-    finally:
-        bpac = None
+        recorder.error("get_price_from_label", e, file=file_path)
     return None
 
 # ------------------------------------------------------------------------
 # Updating price display
 # ------------------------------------------------------------------------
-def update_price_display():
+# Prices are fetched on worker threads so that switching tabs never waits on the
+# label index or b-PAC. The tabs next to the selected one are fetched ahead, and
+# a result that arrives after the user has moved to another tab is only cached.
+def fetch_tab_price(folder_path):
     """
-    Uses the first label from the 'white' subfolder of the current folder to update the displayed price.
+    Runs on a worker thread: returns the price of the first label of the folder's
+    'white' subfolder. The price comes from the label index; only labels the
+    index couldn't read are opened. With a print server, the server reads it.
     """
-    global current_price
-    current_tab_name = notebook.select()
-    current_tab = notebook.nametowidget(current_tab_name)
-    folder_path = tab_folders.get(current_tab)
+    if print_client:
+        return print_client.store_labels(os.path.basename(folder_path))["price"] or "£0.00"
+    entry = label_index.first_entry(os.path.join(folder_path, "white"))
+    if entry:
+        return entry.price or get_price_from_label(entry.path) or "£0.00"
+    return "£0.00"
+
+def request_prices(folder_paths):
+    """Starts fetching the prices of the given folders that aren't cached or already being fetched."""
+    missing = [fp for fp in folder_paths if fp not in tab_prices and fp not in pending_prices]
+    if not missing:
+        return
+    pending_prices.update(missing)
+    start_job("Fetch price", missing, fetch_tab_price,
+              on_done=lambda job, generation=price_generation: prices_fetched(job, generation))
+
+def prices_fetched(job, generation):
+    if generation != price_generation:
+        return  # the index was refreshed while this fetch ran
+    pending_prices.difference_update(job.items)
+    tab_prices.update(job.results)
+    tab_prices.update((folder_path, "£0.00") for folder_path, _ in job.errors)
+    show_current_price()
+
+def show_current_price():
+    """Shows the cached price of the selected tab, or starts fetching it."""
+    global current_price, tab_switch
+    folder_path = current_folder_path()
     if not folder_path:
         price_label.config(text="Current Price: £0.00")
         return
-
-    price = "£0.00"
-    white_path = os.path.join(folder_path, "white")
-    if os.path.isdir(white_path):
-        files = [f for f in os.listdir(white_path) if f.lower().endswith((".lbx", ".lbl"))]
-        if files:
-            first_label = os.path.join(white_path, files[0])
-            price = get_price_from_label(first_label) or "£0.00"
-    current_price = price
+    if folder_path not in tab_prices:
+        price_label.config(text="Current Price: ...")
+        request_prices([folder_path])
+        return
+    current_price = tab_prices[folder_path]
     price_label.config(text=f"Current Price: {current_price}")
+    if tab_switch and tab_switch[0] == folder_path:
+        recorder.record("tab_switch", time.perf_counter() - tab_switch[1], file=folder_path)
+        tab_switch = None
+
+def prefetch_neighbour_prices():
+    """Fetches the prices of the TAB_PREFETCH tabs on each side of the selected one."""
+    tabs = notebook.tabs()
+    current_tab_name = notebook.select()
+    if not current_tab_name:
+        return
+    position = tabs.index(current_tab_name)
+    neighbours = tabs[max(0, position - TAB_PREFETCH):position] + tabs[position + 1:position + 1 + TAB_PREFETCH]
+    request_prices([tab_folders[notebook.nametowidget(tab)] for tab in neighbours])
+
+def update_price_display():
+    """
+    Drops the cached prices (the label index has just been refreshed) and shows
+    the price of the current folder once it has been fetched again.
+    """
+    global price_generation
+    price_generation += 1
+    tab_prices.clear()
+    pending_prices.clear()
+    show_current_price()
+
+# ------------------------------------------------------------------------
+# Background jobs
+# ------------------------------------------------------------------------
+def start_job(name, items, work, on_done=None, executor=None):
+    """
+    Runs work(item) for every item on the shared JOB_WORKERS worker threads (or
+    on executor), which are initialised for the print backend so they can fall
+    back to b-PAC.
+    """
+    job = Job(name, items, work, executor=executor or job_executor)
+    job.start()
+    watch_job(job, on_done=on_done)
+    return job
+
+def watch_job(job, on_progress=None, on_done=None):
+    """Polls a job's event queue from the Tk event loop until it finishes."""
+    finished = False
+    for kind, item, error in job.poll():
+        if kind == DONE:
+            finished = True
+        elif on_progress:
+            on_progress(job, item, error)
+    if finished:
+        recorder.record(f"job.{job.name}", job.elapsed(), items=job.total, errors=len(job.errors))
+        for item, error in job.errors:
+            recorder.error(f"job.{job.name}", error, file=str(item))
+        if on_done:
+            on_done(job)
+    else:
+        root.after(100, watch_job, job, on_progress, on_done)
+
+def show_job_progress(job, title, on_done=None):
+    """
+    Runs a job behind a progress dialog with a Cancel button. The dialog shows
+    real throughput and closes itself when the job finishes.
+    """
+    progress_window = tk.Toplevel(root)
+    progress_window.title(title)
+    progress_bar = ttk.Progressbar(progress_window, orient="horizontal", length=300, mode="determinate")
+    progress_bar["maximum"] = max(job.total, 1)
+    progress_bar.pack(padx=20, pady=10)
+    progress_label = tk.Label(progress_window, text=f"0/{job.total}")
+    progress_label.pack(pady=5)
+    ttk.Button(progress_window, text="Cancel", command=job.cancel).pack(pady=5)
+    progress_window.protocol("WM_DELETE_WINDOW", job.cancel)
+    progress_window.grab_set()
+
+    # Center the progress window
+    progress_window.update_idletasks()
+    pw_width = progress_window.winfo_width()
+    pw_height = progress_window.winfo_height()
+    screen_width = root.winfo_screenwidth()
+    screen_height = root.winfo_screenheight()
+    x = (screen_width - pw_width) // 2
+    y = (screen_height - pw_height) // 2
+    progress_window.geometry(f"+{x}+{y}")
+
+    def on_progress(job, item, error):
+        progress_bar["value"] = job.done
+        text = f"{job.done}/{job.total}  ({job.throughput():.1f}/s)"
+        if job.errors:
+            text += f"  {len(job.errors)} failed"
+        progress_label.config(text=text)
+
+    def finish(job):
+        progress_window.destroy()
+        if job.errors:
+            failed = "\n".join(f"{os.path.basename(str(item))}: {error}" for item, error in job.errors[:20])
+            messagebox.showwarning(title, f"{len(job.errors)} of {job.total} failed:\n{failed}")
+        if on_done:
+            on_done(job)
+
+    job.start()
+    watch_job(job, on_progress, finish)
+    return job
 
 # ------------------------------------------------------------------------
 # Set Price
 # ------------------------------------------------------------------------
 def set_price():
     """
-    Prompts the user for a new price and updates all 'white' and 'brown' labels in the current folder.
+    Prompts the user for a new price and updates the 'white' and 'brown' labels in the current folder.
+    Labels that already have the price are skipped; the others are rewritten by a background job,
+    with their old prices journaled first. An interrupted run can be resumed or rolled back.
     """
     global current_price
-    current_tab_name = notebook.select()
-    current_tab = notebook.nametowidget(current_tab_name)
-    folder_path = tab_folders.get(current_tab)
-    if not folder_path:
+    folder_path = current_folder_path()
+    model = models.get(folder_path)
+    if not model:
         messagebox.showinfo("Info", "No folder selected.")
         return
 
-    new_price = simpledialog.askstring("Set Price", "Enter new price (e.g., £2.50):")
+    if print_client:
+        new_price = simpledialog.askstring("Set Price", "Enter new price (e.g., £2.50):")
+        if new_price:
+            send_to_print_server("Set Price",
+                                 lambda: print_client.submit_reprice(os.path.basename(folder_path), new_price))
+        return
+
+    journal = RepriceJournal(REPRICE_JOURNAL_DIR, os.path.basename(folder_path))
+    interrupted = journal.unfinished()
+    new_price = None
+    if interrupted:
+        answer = messagebox.askyesnocancel(
+            "Set Price", f"Changing the price to {interrupted} was interrupted.\n\n"
+                         "Yes: finish it.\nNo: roll it back to the old prices.")
+        if answer is None:
+            return
+        if not answer:
+            undo_price(confirm=False)
+            return
+        new_price = interrupted
+    if not new_price:
+        new_price = simpledialog.askstring("Set Price", "Enter new price (e.g., £2.50):")
     if not new_price:
         return
     if not new_price.startswith("£"):
@@ -112,162 +349,226 @@ def set_price():
     price_label.config(text=f"Current Price: {current_price}")
 
     # Only update white and brown labels
-    files_to_process = []
-    for (fpath, key_tuple), (actual_subfolder, entry_widget) in file_widgets.items():
-        if fpath == folder_path:
-            folder_type, filename = key_tuple
-            if folder_type != "other":
-                files_to_process.append((actual_subfolder, filename))
-
-    if not files_to_process:
+    label_paths = [row.path for row in model.iter_rows(("white", "brown"))]
+    if not label_paths:
         messagebox.showinfo("Info", "No labels to update.")
         return
 
-    total_files = len(files_to_process)
-    progress_window = tk.Toplevel(root)
-    progress_window.title("Updating Prices")
-    progress_bar = ttk.Progressbar(progress_window, orient="horizontal", length=300, mode="determinate")
-    progress_bar["maximum"] = total_files
-    progress_bar.pack(padx=20, pady=10)
-    progress_label = tk.Label(progress_window, text=f"0/{total_files}")
-    progress_label.pack(pady=5)
-    progress_window.grab_set()
-    progress_window.update()
+    folders = [os.path.join(folder_path, folder_type) for folder_type in ("white", "brown")]
+    known_prices = {}
+    for folder in folders:
+        known_prices.update(label_index.fresh_prices(folder))
+    journal.begin(new_price)
 
-    # Center the progress window
-    progress_window.update_idletasks()
-    pw_width = progress_window.winfo_width()
-    pw_height = progress_window.winfo_height()
-    screen_width = root.winfo_screenwidth()
-    screen_height = root.winfo_screenheight()
-    x = (screen_width - pw_width) // 2
-    y = (screen_height - pw_height) // 2
-    progress_window.geometry(f"+{x}+{y}")
+    def finished(job):
+        changed = sum(1 for written in job.results.values() if written)
+        skipped = sum(1 for written in job.results.values() if not written)
+        if not job.errors and not job.cancelled.is_set():
+            journal.finish(price=new_price, changed=changed, skipped=skipped)
+        messagebox.showinfo("Set Price", f"{changed} label(s) updated, {skipped} already at {new_price}.")
+        start_job("Refresh index", folders, label_index.refresh_folder, on_done=lambda job: update_price_display())
 
-    for index, (folder, file) in enumerate(files_to_process):
-        label_path = os.path.join(folder, file)
-        try:
-            bpac = win32com.client.Dispatch("bpac.Document")
-            if bpac.Open(label_path):
-                price_obj = bpac.GetObject("Price")
-                if isinstance(price_obj, win32com.client.CDispatch):
-                    price_obj.Text = new_price
-                    if not bpac.Save():
-                        print(f"Warning: Failed to save {label_path}")
-                else:
-                    print(f"Invalid Price object in {file}")
-        except Exception as e:
-            print(f"Error updating {file}: {e}")
-        finally:
-            bpac = None
-
-        progress_bar["value"] = index + 1
-        progress_label.config(text=f"{index+1}/{total_files}")
-        progress_window.update()
-
-    progress_window.destroy()
-    update_price_display()
+    job = Job("Set price", label_paths,
+              lambda label_path: reprice_if_changed(backend, journal, label_path, new_price, known_prices),
+              executor=job_executor)
+    show_job_progress(job, "Updating Prices", on_done=finished)
+
+def undo_price(confirm=True):
+    """Rolls the labels of the current folder back to the prices recorded by its last reprice run."""
+    folder_path = current_folder_path()
+    if not folder_path:
+        return
+    if print_client:
+        messagebox.showinfo("Undo Price", "Prices are changed by the print server; undo them there with "
+                                          "'python cli.py undo-price'.")
+        return
+    journal_path = latest_journal(REPRICE_JOURNAL_DIR, os.path.basename(folder_path))
+    old_prices = journal_old_prices(journal_path) if journal_path else []
+    if not old_prices:
+        messagebox.showinfo("Undo Price", "No price change to undo.")
+        return
+    if confirm and not messagebox.askyesno("Undo Price", f"Put back the old price of {len(old_prices)} label(s)?"):
+        return
+
+    def finished(job):
+        if not job.errors and not job.cancelled.is_set():
+            close_rolled_back(journal_path)
+        start_job("Refresh index", [os.path.join(folder_path, folder_type) for folder_type in ("white", "brown")],
+                  label_index.refresh_folder, on_done=lambda job: update_price_display())
+
+    job = Job("Undo price", old_prices, lambda item: restore_label(backend, *item),
+              executor=job_executor)
+    show_job_progress(job, "Restoring Prices", on_done=finished)
+
+def rescan_all():
+    """Brings the label index of every store up to date in the background."""
+    if print_client:
+        update_price_display()  # the print server keeps its own index up to date
+        return
+    job = Job("Rescan", list(tab_folders.values()), label_index.refresh_store,
+              executor=job_executor)
+    show_job_progress(job, "Rescanning Labels", on_done=lambda job: update_price_display())
 
 # ------------------------------------------------------------------------
 # Print Labels
 # ------------------------------------------------------------------------
 def print_labels():
     """
-    Prints all labels in the current folder that have a quantity > 0.
+    Prints all labels in the current folder that have a quantity > 0. The
+    quantities are turned into a job plan and printed by the spooler's worker
+    thread. If the same plan was interrupted before, the user chooses between
+    resuming where it stopped and printing every label again.
     """
-    current_tab_name = notebook.select()
-    current_tab = notebook.nametowidget(current_tab_name)
-    folder_path = tab_folders.get(current_tab)
-    if not folder_path:
+    folder_path = current_folder_path()
+    model = models.get(folder_path)
+    if not model:
         messagebox.showinfo("Info", "No folder selected.")
         return
 
-    labels_to_print = []
-    for (fpath, key_tuple), (actual_subfolder, entry_widget) in file_widgets.items():
-        if fpath == folder_path:
-            folder_type, file = key_tuple
-            copies_str = entry_widget.get().strip()
-            copies = int(copies_str) if copies_str.isdigit() else 0
-            if copies > 0:
-                file_path = os.path.join(actual_subfolder, file)
-                labels_to_print.append((file_path, copies))
-
-    if not labels_to_print:
+    jobs = plan_jobs((row.path, row.quantity) for row in model.iter_rows())
+    if not jobs:
         messagebox.showinfo("Info", "No labels selected.")
         return
 
-    try:
-        bpac = win32com.client.Dispatch("bpac.Document")
-        if not bpac.StartPrint("", 0):
-            messagebox.showerror("Error", "Failed to start printing.")
+    if print_client:
+        labels = [{"label": f"{row.folder_type}/{row.filename}", "copies": row.quantity}
+                  for row in model.iter_rows() if row.quantity > 0]
+        send_to_print_server("Print Labels", lambda: print_client.submit_print(os.path.basename(folder_path), labels))
+        return
+
+    run = PrintRun(os.path.basename(folder_path), jobs)
+    printed = interrupted_jobs(SPOOL_DIR, run)
+    if printed:
+        labels = sum(jobs[i].copies for i in printed if i < len(jobs))
+        answer = messagebox.askyesnocancel(
+            "Print Labels", f"An earlier run of these labels stopped after {labels} of {run.total_copies} labels.\n"
+                            "Yes: print only the rest.\nNo: print every label again.")
+        if answer is None:
             return
+        run.resume = answer
+    spooler.submit(run)
+    root.after(200, watch_print_run, run)
 
-        for file_path, copies in labels_to_print:
-            try:
-                if bpac.Open(file_path):
-                    bpac.PrintOut(copies, 1)  # second argument indicates cut mode
-                else:
-                    messagebox.showerror("Error", f"Failed to open: {os.path.basename(file_path)}")
-            except Exception as e:
-                print(f"Error printing {file_path}: {e}")
-                continue
-
-        bpac.EndPrint()
-        bpac.Close()
-        messagebox.showinfo("Success", "All selected labels printed successfully!")
-    except Exception as e:
-        print(e)
-    finally:
-        bpac = None
+def watch_print_run(run):
+    """Polls the spooler until a run has finished, then reports how it went."""
+    spooler.poll()
+    if not run.finished.is_set():
+        root.after(200, watch_print_run, run)
+        return
+    report_print_run(run)
+
+def report_print_run(run):
+    summary = run.summary()
+    recorder.record("print_run", run.elapsed(), **summary)
+    for shard in run.shards:
+        recorder.record("print_shard", shard.elapsed(), **shard.summary())
+    for path, message in run.errors:
+        recorder.error("print_run", message, file=path)
+    if run.errors:
+        failed = "\n".join(f"{os.path.basename(path)}: {message}" for path, message in run.errors[:20])
+        messagebox.showerror("Error", f"{len(run.errors)} label(s) failed:\n{failed}\n\n"
+                                      "Print Labels again and choose Yes to retry only the labels "
+                                      "that weren't printed.")
+    else:
+        resumed = f" ({run.resumed} already printed earlier)" if run.resumed else ""
+        printers = "".join(f"\n{p['printer']}: {p['labels_printed']} labels at {p['labels_per_minute']} labels/min"
+                           for p in summary["printers"]) if len(summary["printers"]) > 1 else ""
+        saved = (f"\nAbout {summary['tape_saved_mm']:.0f} mm of tape and {summary['seconds_saved']:.0f}s saved "
+                 f"on feeds and cuts" if summary["tape_saved_mm"] or summary["seconds_saved"] else "")
+        messagebox.showinfo("Success", f"All selected labels printed successfully!{resumed}\n"
+                                       f"{run.labels_printed} labels at {summary['labels_per_minute']} labels/min"
+                                       f"{printers}{saved}")
+
+# ------------------------------------------------------------------------
+# Print server client
+# ------------------------------------------------------------------------
+def send_to_print_server(title, submit):
+    """Sends a request to the print server off the UI thread, then follows it until it has finished."""
+    def sent(job):
+        if job.errors:
+            messagebox.showerror(title, f"Print server: {job.errors[0][1]}")
+        else:
+            root.after(500, check_server_request, title, job.results[title]["id"])
+
+    start_job(title, [title], lambda _: submit(), on_done=sent)
+
+def check_server_request(title, request_id):
+    def checked(job):
+        if job.errors:
+            messagebox.showerror(title, f"Print server: {job.errors[0][1]}")
+            return
+        status = job.results[request_id]
+        if status["status"] in ("queued", "running"):
+            root.after(1000, check_server_request, title, request_id)
+        else:
+            report_server_request(title, status)
+
+    start_job("Server status", [request_id], print_client.status, on_done=checked)
+
+def report_server_request(title, status):
+    errors = status.get("errors") or ([["", status["error"]]] if "error" in status else [])
+    if errors:
+        failed = "\n".join(f"{name}: {message}" if name else message for name, message in errors[:20])
+        messagebox.showerror(title, f"{len(errors)} problem(s):\n{failed}")
+    elif status["kind"] == "print":
+        messagebox.showinfo(title, f"{status.get('labels_printed', 0)} of {status['copies']} labels printed "
+                                   f"by the print server.")
+    else:
+        messagebox.showinfo(title, f"{status.get('changed', 0)} label(s) updated, "
+                                   f"{status.get('skipped', 0)} already at {status['price']}.")
+        update_price_display()
 
 # ------------------------------------------------------------------------
 # Per-Tab Dynamic Sum Calculation
 # ------------------------------------------------------------------------
 def update_tab_total_display(folder_path):
     """
-    Recalculates and displays the total for the current folder.
+    Displays the running total kept by the folder's model, which is what Print
+    Labels would print, and the demand matrix's plan for the tab's labels on the
+    day loaded into it. The two agree until the quantities are edited.
     """
-    total = 0
-    for (fpath, key_tuple), (actual_subfolder, entry_widget) in file_widgets.items():
-        if fpath == folder_path:
-            try:
-                value = float(entry_widget.get())
-                total += int(value)
-            except ValueError:
-                pass
-    current_tab_total_label.config(text=f"Total: {total}")
+    model = models.get(folder_path)
+    text = f"Total: {model.total if model else 0}"
+    if folder_path in planned_totals:
+        day, planned = planned_totals[folder_path]
+        text += f"  ({day[:3]} plan: {planned})"
+    current_tab_total_label.config(text=text)
 
 def entry_update(event):
     """
-    Called when an entry is updated; recalculates the total for the current folder.
+    Called when an entry is updated; applies the change to its row and, if the
+    row belongs to the current folder, refreshes the displayed total.
     """
-    current_tab_name = notebook.select()
-    current_tab = notebook.nametowidget(current_tab_name)
-    current_folder_path = tab_folders.get(current_tab)
-    changed_entry = event.widget
-    changed_entry_folder_path = None
-    for (fpath, key_tuple), (actual_subfolder, entry_widget) in file_widgets.items():
-        if entry_widget == changed_entry:
-            changed_entry_folder_path = fpath
-            break
-    if changed_entry_folder_path == current_folder_path:
-        update_tab_total_display(current_folder_path)
+    row = row_by_entry.get(event.widget)
+    text = event.widget.get()
+    if row is None or text == row.text:
+        return  # e.g. an arrow or Tab key
+    models[row.folder_path].set_text(row, text)
+    snapshot.set_row(row)
+    if row.folder_path == current_folder_path():
+        update_tab_total_display(row.folder_path)
 
 # ------------------------------------------------------------------------
 # On Tab Change: Enable/Disable Day Buttons
 # ------------------------------------------------------------------------
+@timed_action("on_tab_change")
 def on_tab_change(event):
     """
-    Called whenever the user switches tabs. Enables all day buttons for the "Spalding" tab,
-    and for other tabs enables only the "Reset" button.
+    Called whenever the user switches tabs. Enables all day buttons for tabs of stores
+    that have a schedule, and for other tabs enables only the "Reset" button.
     """
-    update_price_display()
+    global tab_switch
     current_tab_name = notebook.select()
-    current_tab = notebook.nametowidget(current_tab_name)
-    folder_path = tab_folders.get(current_tab)
+    if current_tab_name:
+        ensure_tab_built(notebook.nametowidget(current_tab_name))
+    folder_path = current_folder_path()
+    if folder_path:
+        tab_switch = (folder_path, time.perf_counter())
+    show_current_price()
+    prefetch_neighbour_prices()
     for fp, buttons in day_buttons_by_tab.items():
         if fp == folder_path:
-            if os.path.basename(fp) == "Spalding":
+            if os.path.basename(fp) in scheduled_stores:
                 for btn in buttons:
                     btn.config(state="normal")
             else:
@@ -285,293 +586,466 @@ def on_tab_change(event):
 # ------------------------------------------------------------------------
 # Populate entries from CSV when a day button is pressed
 # ------------------------------------------------------------------------
+@timed_action("populate_day")
 def populate_day(day, folder_path):
     """
-    Reads data from two CSV files and populates the inputs:
-      - White and brown inputs are updated from CSV_FILE.
-      - Other inputs are updated from CSV_PANINIS.
-    
-    CSV_FILE is expected to have headers like:  
-         Name,Monday white,Tuesday white,Wednesday white,...,Monday brown,Tuesday brown,...  
-    CSV_PANINIS is expected to have headers like:  
-         Name,Monday other,Tuesday other,Wednesday other,...,Saturday other
-         
-    This function strips extra spaces from keys to help match your CSV file.
-    """
-    # Load CSV data for white and brown
-    data_main = {}
-    try:
-        with open(CSV_FILE, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                # Strip keys and values
-                row = {k.strip(): (v.strip() if v is not None else "") for k, v in row.items() if k}
-                key = row.get("Name", "").strip()
-                if key:
-                    data_main[key] = row
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not read CSV file: {e}")
-        return
+    Fills the inputs of a folder with its store's quantities for a day:
+      - White and brown inputs are updated from <store>_numbers.csv.
+      - Other inputs are updated from <store>_paninis.csv.
 
-    # Load CSV data for "other" (paninis)
-    data_paninis = {}
+    The store's CSVs are imported into the schedule store again only if they
+    changed on disk, and the day is read with one indexed query.
+    "Reset" clears every input of the tab, whether or not the store has a schedule.
+    """
+    model = models.get(folder_path)
+    if not model:
+        return
+    if day not in DAYS:
+        for row in model.iter_rows():
+            model.set_text(row, "")
+        snapshot.set_model(model)
+        planned_totals.pop(folder_path, None)
+        views_by_folder[folder_path].refresh()
+        update_tab_total_display(folder_path)
+        return
+    store = os.path.basename(folder_path)
     try:
-        with open(CSV_PANINIS, newline='', encoding='utf-8') as csvfile:
-            reader = csv.DictReader(csvfile)
-            for row in reader:
-                row = {k.strip(): (v.strip() if v is not None else "") for k, v in row.items() if k}
-                key = row.get("Name", "").strip()
-                if key:
-                    data_paninis[key] = row
-    except Exception as e:
-        messagebox.showerror("Error", f"Could not read CSV file ({CSV_PANINIS}): {e}")
+        schedule_store.import_dir(SCHEDULE_DIR, [store])
+        values = schedule_store.day_values(model, day)
+    except (OSError, csv.Error) as e:
+        messagebox.showerror("Error", f"Could not read the schedule: {e}")
         return
+    report_schedule_problems(schedule_store.problems([store]))
 
-    # Update each input field in the current folder
-    for (fpath, key_tuple), (actual_subfolder, entry_widget) in file_widgets.items():
-        if fpath == folder_path:
-            folder_type, filename = key_tuple
-            base_name = os.path.splitext(filename)[0]
-            if folder_type in ("white", "brown"):
-                if base_name in data_main:
-                    csv_row = data_main[base_name]
-                    col_name = f"{day} {folder_type}".strip()  # e.g., "Monday white"
-                    value = csv_row.get(col_name, "")
-                    entry_widget.delete(0, tk.END)
-                    entry_widget.insert(0, value)
-            elif folder_type == "other":
-                if base_name in data_paninis:
-                    csv_row = data_paninis[base_name]
-                    col_name = f"{day} {folder_type}".strip()  # e.g., "Monday other"
-                    value = csv_row.get(col_name, "")
-                    entry_widget.delete(0, tk.END)
-                    entry_widget.insert(0, value)
+    for row, value in zip(model.iter_rows(), values):
+        if value is not None:
+            model.set_text(row, value)
+    snapshot.set_model(model)
+    planned_totals.pop(folder_path, None)
+    try:
+        matrix = demand_matrix()
+    except (ImportError, OSError, csv.Error) as e:
+        recorder.error("demand_matrix", e, file=SCHEDULE_DIR)
+    else:
+        if store in matrix.store_index:
+            labels = [(row.folder_type, row.name) for row in model.iter_rows()]
+            planned_totals[folder_path] = (day, matrix.labels_total(store, day, labels))
+    views_by_folder[folder_path].refresh()
     update_tab_total_display(folder_path)
 
+def demand_matrix():
+    """
+    Returns the demand matrix of the stores with a tab, after importing any of
+    their CSVs that changed. demand.py (and numpy) is imported on first use.
+    """
+    global demand
+    if demand is None:
+        from demand import DemandCache
+        demand = DemandCache(schedule_store)
+    stores = [os.path.basename(fp) for fp in tab_folders.values()]
+    schedule_store.import_dir(SCHEDULE_DIR, stores)
+    return demand.matrix(stores)
+
+def report_schedule_problems(problems):
+    """
+    Warns about malformed rows in schedule CSVs ({path: problems}), whether
+    they were imported just now or at startup. Each version of a CSV's problems
+    is shown once per session.
+    """
+    for path, lines in problems.items():
+        if (path, tuple(lines)) in reported_problems:
+            continue
+        reported_problems.add((path, tuple(lines)))
+        messagebox.showwarning("Schedule problems", f"{path}:\n" + "\n".join(lines))
+
 # ------------------------------------------------------------------------
 # Arrow Key Navigation Functionality with Auto-Scroll
 # ------------------------------------------------------------------------
 def navigate_arrow(event):
     """
-    Enables navigation among input fields using arrow keys.
-    After moving focus, if the target widget is not fully visible,
-    scroll the canvas so that it becomes visible.
+    Enables navigation among the white and brown input fields using arrow keys.
+    The grid view scrolls the target row into view before focusing it.
     """
-    widget = event.widget
-    folder_path = getattr(widget, 'folder_path', None)
-    if folder_path is None:
-        return
-    row = getattr(widget, 'row', None)
-    col = getattr(widget, 'col', None)
-    if row is None or col is None:
+    row = row_by_entry.get(event.widget)
+    if row is None or row.folder_type not in NAV_COLUMNS:
         return
-
-    new_row, new_col = row, col
+    index = row.index
+    col = NAV_COLUMNS.index(row.folder_type)
     if event.keysym == "Up":
-        new_row = row - 1
+        index -= 1
     elif event.keysym == "Down":
-        new_row = row + 1
+        index += 1
     elif event.keysym == "Left":
-        new_col = col - 1
+        col -= 1
     elif event.keysym == "Right":
-        new_col = col + 1
-
-    target = grid_entries.get((folder_path, new_row, new_col))
-    if target:
-        target.focus_set()
-        # --- NEW: Auto-scroll if the target is not visible ---
-        if folder_path in canvas_by_folder and folder_path in scrollable_frames:
-            canvas = canvas_by_folder[folder_path]
-            scroll_frame = scrollable_frames[folder_path]
-            # Get the target's top position relative to the screen and the canvas's top position.
-            target_top = target.winfo_rooty()
-            target_bottom = target_top + target.winfo_height()
-            canvas_top = canvas.winfo_rooty()
-            canvas_bottom = canvas_top + canvas.winfo_height()
-            # If the target is above or below the visible area of the canvas, scroll.
-            if target_top < canvas_top or target_bottom > canvas_bottom:
-                # Compute the target's relative y-position inside the scrollable content.
-                rel_y = target.winfo_rooty() - scroll_frame.winfo_rooty()
-                total_height = scroll_frame.winfo_height()
-                fraction = rel_y / total_height
-                canvas.yview_moveto(fraction)
+        col += 1
+    if not 0 <= col < len(NAV_COLUMNS):
+        return
+
+    view = views_by_folder.get(row.folder_path)
+    if view:
+        view.focus_row(NAV_COLUMNS[col], index)
+
+# ------------------------------------------------------------------------
+# Label preview
+# ------------------------------------------------------------------------
+def show_row_preview(event):
+    """
+    Called when an entry gets the focus: shows the preview of its label. A
+    preview still in memory is shown at once; the renderer thread checks it is
+    current (or renders it) without holding up the arrow keys.
+    """
+    global preview_path
+    row = row_by_entry.get(event.widget)
+    if row is None or row.path == preview_path:
+        return
+    preview_path = row.path
+    if print_client:
+        preview_label.config(image="", text="No preview: the labels are on the print server")
+        preview_label.png = None
+        return
+    png = previews.cache.peek(row.path)
+    if png:
+        display_preview(png)
+    else:
+        preview_label.config(image="", text="Rendering preview...")
+        preview_label.png = None
+    previews.request(row.path)
+
+def display_preview(png):
+    if png == getattr(preview_label, "png", None):
+        return
+    image = tk.PhotoImage(data=base64.b64encode(png).decode("ascii"))
+    factor = -(-image.width() // PREVIEW_WIDTH)
+    if factor > 1:
+        image = image.subsample(factor)
+    preview_label.config(image=image, text="")
+    preview_label.image = image  # Tk doesn't keep a reference
+    preview_label.png = png
+
+def poll_previews():
+    """Shows the preview of the selected label once the renderer has it; other results were only cached."""
+    while True:
+        try:
+            path, png, error = previews.results.get_nowait()
+        except queue.Empty:
+            break
+        if error is not None:
+            recorder.error("preview", error, file=path)
+        if path != preview_path:
+            continue
+        if png:
+            display_preview(png)
+        else:
+            preview_label.config(image="", text="No preview")
+            preview_label.png = None
+    root.after(50, poll_previews)
 
 # ------------------------------------------------------------------------
 # Global Mouse Wheel Handler for Scrolling
 # ------------------------------------------------------------------------
 def on_global_mousewheel(event):
-    current_tab_name = notebook.select()
-    current_tab = notebook.nametowidget(current_tab_name)
-    canvas = None
-    for child in current_tab.winfo_children():
-        if isinstance(child, tk.Canvas):
-            canvas = child
-            break
-    if canvas:
-        canvas.yview_scroll(-1 * int(event.delta / 120), "units")
+    view = views_by_folder.get(current_folder_path())
+    if view:
+        view.canvas.yview_scroll(-1 * int(event.delta / 120), "units")
 
 # ------------------------------------------------------------------------
 # Build Tabs
 # ------------------------------------------------------------------------
+@timed_action("build_tabs")
 def build_tabs():
     """
-    Creates a tab for each folder in BASE_DIR. Each tab includes sub-frames
-    for white, brown, and other labels plus a side frame with day buttons.
+    Creates an empty placeholder tab for each folder in BASE_DIR, or each store
+    of the print server if there is one. The folder scan and the widgets of a
+    tab are only created when it is first selected, while a background job scans
+    the remaining folders ahead of time.
     """
-    folders = [f for f in os.listdir(BASE_DIR) if os.path.isdir(os.path.join(BASE_DIR, f))]
-    
+    if print_client:
+        try:
+            folders = print_client.stores()["stores"]
+        except PrintServerError as e:
+            messagebox.showerror("Error", f"Could not list the stores of the print server: {e}")
+            folders = []
+    else:
+        folders = [f for f in os.listdir(BASE_DIR) if os.path.isdir(os.path.join(BASE_DIR, f))]
+
     for folder_name in folders:
         folder_path = os.path.join(BASE_DIR, folder_name)
-        
-        # Create a tab for this folder.
         folder_tab = ttk.Frame(notebook)
         notebook.add(folder_tab, text=folder_name)
         tab_folders[folder_tab] = folder_path
 
-        # Configure grid layout for the tab.
-        folder_tab.grid_rowconfigure(0, weight=1)
-        folder_tab.grid_columnconfigure(0, weight=1)   # Canvas column
-        folder_tab.grid_columnconfigure(1, weight=0)   # Scrollbar column
-        folder_tab.grid_columnconfigure(2, weight=0)   # Days frame column
-
-        # Create a canvas and vertical scrollbar.
-        canvas = tk.Canvas(folder_tab, bd=0, highlightthickness=0, relief='flat')
-        scrollbar = ttk.Scrollbar(folder_tab, orient="vertical", command=canvas.yview)
-        scrollable_frame = ttk.Frame(canvas)
-
-        # Attach the scrollable frame to the canvas.
-        canvas.create_window((0, 0), window=scrollable_frame, anchor="nw")
-        canvas.configure(yscrollcommand=scrollbar.set)
-        canvas.grid(row=0, column=0, sticky="nsew")
-        scrollbar.grid(row=0, column=1, sticky="ns")
-        # --- NEW: Save canvas and scrollable_frame for auto-scrolling ---
-        canvas_by_folder[folder_path] = canvas
-        scrollable_frames[folder_path] = scrollable_frame
-
-        # Create the days frame on the right side.
-        days_frame = tk.Frame(folder_tab, padx=5, pady=5)
-        days_frame.grid(row=0, column=2, sticky="nsew")
-
-        # Create day buttons.
-        days = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Reset"]
-        tab_day_buttons = []
-        for day in days:
-            btn = ttk.Button(days_frame, text=day, width=12,
-                             command=lambda d=day, fp=folder_path: populate_day(d, fp))
-            btn.pack(side="top", fill="x", pady=2)
-            tab_day_buttons.append(btn)
-        day_buttons_by_tab[folder_path] = tab_day_buttons
-
-        # Disable day buttons for non-Spalding tabs except Reset.
-        if folder_name != "Spalding":
-            for btn in tab_day_buttons:
-                if btn['text'] != "Reset":
-                    btn.config(state="disabled")
-                else:
-                    btn.config(state="normal")
+    start_job("Prescan", list(tab_folders.values()), prescan_folder, executor=background_executor)
 
-        # Configure the canvas to update its scroll region.
-        scrollable_frame.bind(
-            "<Configure>",
-            lambda e, canvas=canvas: canvas.configure(scrollregion=canvas.bbox("all"))
-        )
-
-        # Create sub-frames for white, brown, and other labels.
-        white_frame = tk.Frame(scrollable_frame, bd=0, relief="flat")
-        brown_frame = tk.Frame(scrollable_frame, bd=0, relief="flat")
-        other_frame = tk.Frame(scrollable_frame, bd=0, relief="flat")
-        white_frame.pack(side="left", fill="both", expand=True, padx=0, pady=0)
-        brown_frame.pack(side="left", fill="both", expand=True, padx=0, pady=0)
-        other_frame.pack(side="left", fill="both", expand=True, padx=0, pady=0)
-
-        # ---------------------------
-        # WHITE LABELS
-        # ---------------------------
-        tk.Label(white_frame, text="W", font=("Calibri", 10, "bold")).pack(anchor="e", padx=0, pady=0)
-        white_path = os.path.join(folder_path, "white")
-        if os.path.isdir(white_path):
-            files = sorted([f for f in os.listdir(white_path) if f.lower().endswith((".lbx", ".lbl"))], key=natural_key)
-            white_row_index = 0
-            for lbl_file in files:
-                row_frame = tk.Frame(white_frame)
-                row_frame.pack(anchor="w", padx=0, pady=0)
-                bottom_border = tk.Frame(row_frame, bg="grey", height=0.5)
-                bottom_border.pack(fill="x", side="bottom")
-                tk.Label(row_frame, text=os.path.splitext(lbl_file)[0],
-                         width=25, anchor="w").pack(side="left", padx=0, pady=0)
-                entry = ttk.Entry(row_frame, width=3)
-                entry.pack(side="left", padx=0, pady=0)
-                entry.folder_path = folder_path
-                entry.row = white_row_index
-                entry.col = 0  # white column
-                grid_entries[(folder_path, white_row_index, 0)] = entry
-                entry.bind("<Up>", navigate_arrow)
-                entry.bind("<Down>", navigate_arrow)
-                entry.bind("<Left>", navigate_arrow)
-                entry.bind("<Right>", navigate_arrow)
-                entry.bind("<KeyRelease>", entry_update)
-                file_widgets[(folder_path, ("white", lbl_file))] = (white_path, entry)
-                white_row_index += 1
-        else:
-            tk.Label(white_frame, text="No 'white' folder").pack(anchor="w")
-
-        # ---------------------------
-        # BROWN LABELS
-        # ---------------------------
-        tk.Label(brown_frame, text="B", font=("Calibri", 10, "bold")).pack(anchor="w")
-        brown_path = os.path.join(folder_path, "brown")
-        if os.path.isdir(brown_path):
-            files = sorted([f for f in os.listdir(brown_path) if f.lower().endswith((".lbx", ".lbl"))], key=natural_key)
-            brown_row_index = 0
-            for lbl_file in files:
-                row_frame = tk.Frame(brown_frame)
-                row_frame.pack(anchor="w", padx=2)
-                bottom_border = tk.Frame(row_frame, bg="grey", height=0.5)
-                bottom_border.pack(fill="x", side="bottom")
-                entry = ttk.Entry(row_frame, width=3)
-                entry.insert(0, "")
-                entry.pack(side="left")
-                entry.folder_path = folder_path
-                entry.row = brown_row_index
-                entry.col = 1  # brown column
-                grid_entries[(folder_path, brown_row_index, 1)] = entry
-                entry.bind("<Up>", navigate_arrow)
-                entry.bind("<Down>", navigate_arrow)
-                entry.bind("<Left>", navigate_arrow)
-                entry.bind("<Right>", navigate_arrow)
-                entry.bind("<KeyRelease>", entry_update)
-                file_widgets[(folder_path, ("brown", lbl_file))] = (brown_path, entry)
-                brown_row_index += 1
-        else:
-            tk.Label(brown_frame, text="No 'brown' folder").pack(anchor="w")
-
-        # ---------------------------
-        # OTHER LABELS
-        # ---------------------------
-        tk.Label(other_frame, text="Panini's", font=("Calibri", 10, "bold")).pack(anchor="w", padx=30)
-        other_path = os.path.join(folder_path, "other")
-        if os.path.isdir(other_path):
-            files = [f for f in os.listdir(other_path) if f.lower().endswith((".lbx", ".lbl"))]
-            for lbl_file in files:
-                row_frame = tk.Frame(other_frame)
-                row_frame.pack(anchor="w", padx=30)
-                bottom_border = tk.Frame(row_frame, bg="grey", height=0.5)
-                bottom_border.pack(fill="x", side="bottom")
-                tk.Label(row_frame, text=os.path.splitext(lbl_file)[0],
-                         width=15, anchor="w").pack(side="left")
-                entry = ttk.Entry(row_frame, width=3)
-                entry.insert(0, "")
-                entry.pack(side="left")
-                entry.bind("<KeyRelease>", entry_update)
-                file_widgets[(folder_path, ("other", lbl_file))] = (other_path, entry)
-        else:
-            tk.Label(other_frame, text="No 'other' folder").pack(anchor="w")
+def prescan_folder(folder_path):
+    """
+    Runs on a worker thread: scans a folder that hasn't been built yet so that
+    selecting its tab doesn't have to wait on the file system, and brings its
+    label index up to date.
+    """
+    if folder_path not in models and folder_path not in prescanned_models:
+        prescanned_models[folder_path] = scan_store(folder_path)
+    if not print_client:
+        label_index.refresh_store(folder_path)
+
+def scan_store(folder_path):
+    """
+    Runs on a worker thread: returns the FolderModel of a store, scanned from
+    BASE_DIR or listed by the print server if there is one.
+    """
+    if print_client:
+        listing = print_client.store_labels(os.path.basename(folder_path))
+        return listed_folder(folder_path, [label["label"] for label in listing["labels"]], listing["missing"])
+    return scan_folder(folder_path)
+
+def ensure_tab_built(folder_tab):
+    """
+    Creates the contents of a tab the first time it is selected. A folder the
+    prescan hasn't reached yet is scanned on a worker and the tab is built when
+    the scan finishes.
+    """
+    if folder_tab in built_tabs or folder_tab in loading_tabs or folder_tab not in tab_folders:
+        return
+    folder_path = tab_folders[folder_tab]
+    model = prescanned_models.pop(folder_path, None)
+    if model is not None:
+        build_tab(folder_tab, model)
+        return
+
+    def scanned(job):
+        loading_tabs.discard(folder_tab)
+        if folder_path in job.results:
+            build_tab(folder_tab, prescanned_models.pop(folder_path, None) or job.results[folder_path])
+            if folder_path == current_folder_path():
+                update_tab_total_display(folder_path)
+
+    loading_tabs.add(folder_tab)
+    start_job("Scan tab", [folder_path], scan_store, on_done=scanned)
+
+def build_tab(folder_tab, model):
+    """
+    Creates the widgets of a tab: a virtualized grid of white, brown, and other
+    labels plus a side frame with day buttons.
+    """
+    built_tabs.add(folder_tab)
+    folder_path = tab_folders[folder_tab]
+    folder_name = os.path.basename(folder_path)
+
+    snapshot.restore(model)
+    models[folder_path] = model
+
+    # Configure grid layout for the tab.
+    folder_tab.grid_rowconfigure(1, weight=1)
+    folder_tab.grid_columnconfigure(0, weight=1)   # Canvas column
+    folder_tab.grid_columnconfigure(1, weight=0)   # Scrollbar column
+    folder_tab.grid_columnconfigure(2, weight=0)   # Days frame column
+
+    # Create the virtualized label grid: headers, canvas and vertical scrollbar.
+    view = LabelGridView(folder_tab, model, row_by_entry, entry_update, navigate_arrow, show_row_preview)
+    view.header.grid(row=0, column=0, sticky="w")
+    view.canvas.grid(row=1, column=0, sticky="nsew")
+    view.scrollbar.grid(row=1, column=1, sticky="ns")
+    views_by_folder[folder_path] = view
+
+    # Create the days frame on the right side.
+    days_frame = tk.Frame(folder_tab, padx=5, pady=5)
+    days_frame.grid(row=0, column=2, rowspan=2, sticky="nsew")
+
+    # Create day buttons.
+    days = list(DAYS) + ["Reset"]
+    tab_day_buttons = []
+    for day in days:
+        btn = ttk.Button(days_frame, text=day, width=12,
+                         command=lambda d=day, fp=folder_path: populate_day(d, fp))
+        btn.pack(side="top", fill="x", pady=2)
+        tab_day_buttons.append(btn)
+    day_buttons_by_tab[folder_path] = tab_day_buttons
+
+    # Disable day buttons except Reset for stores without a schedule.
+    if folder_name not in scheduled_stores:
+        for btn in tab_day_buttons:
+            if btn['text'] != "Reset":
+                btn.config(state="disabled")
+            else:
+                btn.config(state="normal")
+
+# ------------------------------------------------------------------------
+# Live folder updates
+# ------------------------------------------------------------------------
+def poll_file_changes():
+    """
+    Applies the folder changes reported by the watcher: only the added and removed
+    rows of a built tab change, so the quantities already entered are kept.
+    Tabs that haven't been built yet simply drop their prescanned model.
+    """
+    changed_folders = []
+    while True:
+        try:
+            changes = file_changes.get_nowait()
+        except queue.Empty:
+            break
+        for (folder_path, folder_type), filenames in changes.items():
+            model = models.get(folder_path)
+            if model is None:
+                prescanned_models.pop(folder_path, None)
+            else:
+                added, removed = model.sync_files(folder_type, filenames)
+                if not added and not removed:
+                    continue
+                views_by_folder[folder_path].refresh()
+                if folder_path == current_folder_path():
+                    update_tab_total_display(folder_path)
+            changed_folders.append(os.path.join(folder_path, folder_type))
+    if changed_folders:
+        start_job("Refresh index", changed_folders, label_index.refresh_folder,
+                  on_done=lambda job: update_price_display(), executor=background_executor)
+    root.after(250, poll_file_changes)
+
+def start_watcher():
+    global watcher
+    if print_client:
+        return  # the labels are on the print server
+    watcher = TreeWatcher(tab_folders.values(), file_changes.put,
+                          debounce=WATCH_DEBOUNCE, poll_interval=WATCH_POLL_INTERVAL).start()
+    root.after(250, poll_file_changes)
+
+# ------------------------------------------------------------------------
+# Production Report
+# ------------------------------------------------------------------------
+def show_production():
+    """
+    Opens a window with the production sheet of a day (or the week) summed over
+    every store that has a schedule, with CSV export.
+    """
+    try:
+        from demand import SHEET_HEADER
+        matrix = demand_matrix()
+    except ImportError as e:
+        messagebox.showerror("Error", f"The production sheet needs numpy: {e}")
+        return
+    except (OSError, csv.Error) as e:
+        messagebox.showerror("Error", f"Could not read the schedules: {e}")
+        return
+    if not matrix.stores:
+        messagebox.showinfo("Production", f"No store schedules found in {os.path.abspath(SCHEDULE_DIR)}.")
+        return
+
+    window = tk.Toplevel(root)
+    window.title("Production")
+    window.geometry("520x600")
+    top = tk.Frame(window)
+    top.pack(fill="x", padx=5, pady=5)
+    day_var = tk.StringVar(value="Week")
+    ttk.Combobox(top, textvariable=day_var, values=["Week"] + list(DAYS), state="readonly",
+                 width=12).pack(side="left")
+    summary = ttk.Label(top)
+    summary.pack(side="left", padx=10)
+    sheet = ttk.Treeview(window, columns=SHEET_HEADER[1:], height=20)
+    sheet.heading("#0", text=SHEET_HEADER[0])
+    sheet.column("#0", width=220)
+    for column in SHEET_HEADER[1:]:
+        sheet.heading(column, text=column)
+        sheet.column(column, width=60, anchor="e")
+    sheet.pack(fill="both", expand=True, padx=5, pady=5)
+
+    def show(event=None):
+        day = None if day_var.get() == "Week" else day_var.get()
+        sheet.delete(*sheet.get_children())
+        for row in matrix.production_sheet(day):
+            sheet.insert("", "end", text=row[0], values=row[1:])
+        summary.config(text=f"{len(matrix.stores)} stores, {matrix.total(day=day)} items")
+
+    def export(by_store):
+        path = filedialog.asksaveasfilename(parent=window, defaultextension=".csv",
+                                            filetypes=[("CSV files", "*.csv")],
+                                            initialfile="production_by_store.csv" if by_store else "production.csv")
+        if path:
+            matrix.export_csv(path, by_store=by_store)
+
+    buttons = tk.Frame(window)
+    buttons.pack(fill="x", padx=5, pady=(0, 5))
+    ttk.Button(buttons, text="Export CSV", command=lambda: export(False)).pack(side="left")
+    ttk.Button(buttons, text="Export by store", command=lambda: export(True)).pack(side="left", padx=5)
+    window.bind("<<ComboboxSelected>>", show)
+    show()
+
+# ------------------------------------------------------------------------
+# Diagnostics Window
+# ------------------------------------------------------------------------
+def show_diagnostics():
+    """
+    Opens a window with p50/p95/p99 latencies per operation and the slowest
+    files, refreshed every second while it is open.
+    """
+    window = tk.Toplevel(root)
+    window.title("Diagnostics")
+    window.geometry("640x480")
+    columns = ("count", "errors", "p50", "p95", "p99", "max")
+    ops = ttk.Treeview(window, columns=columns, height=12)
+    ops.heading("#0", text="Operation")
+    ops.column("#0", width=180)
+    for column in columns:
+        ops.heading(column, text=column if column in ("count", "errors") else f"{column} ms")
+        ops.column(column, width=70, anchor="e")
+    ops.pack(fill="both", expand=True, padx=5, pady=5)
+    ttk.Label(window, text="Slowest files", font=("Arial", 10, "bold")).pack(anchor="w", padx=5)
+    files = ttk.Treeview(window, columns=("ms", "op"), height=8)
+    files.heading("#0", text="File")
+    files.heading("ms", text="ms")
+    files.heading("op", text="Operation")
+    files.column("#0", width=360)
+    files.column("ms", width=70, anchor="e")
+    files.column("op", width=120)
+    files.pack(fill="both", expand=True, padx=5, pady=5)
+    pool_label = ttk.Label(window)
+    pool_label.pack(anchor="w", padx=5, pady=(0, 5))
+
+    def refresh():
+        if not window.winfo_exists():
+            return
+        ops.delete(*ops.get_children())
+        for row in recorder.summary():
+            ops.insert("", "end", text=row["op"], values=(
+                row["count"], row["errors"], f"{row['p50_ms']:.1f}", f"{row['p95_ms']:.1f}",
+                f"{row['p99_ms']:.1f}", f"{row['max_ms']:.1f}"))
+        files.delete(*files.get_children())
+        for seconds, op, file in recorder.slowest_files():
+            files.insert("", "end", text=file, values=(f"{seconds * 1000:.1f}", op))
+        pool = backend.stats()
+        pool_label.config(text=f"Document pool: {pool['hits']} hits, {pool['misses']} misses, "
+                               f"{pool['broken']} replaced, {pool['activation_ms_mean']} ms per activation")
+        window.after(1000, refresh)
+
+    refresh()
 
 # ------------------------------------------------------------------------
 # Main GUI
 # ------------------------------------------------------------------------
+def on_close():
+    """Saves the quantities that haven't been autosaved yet before the window closes."""
+    try:
+        snapshot.close()
+    except OSError as e:
+        recorder.error("snapshot.save", e, file=snapshot.path)
+    root.destroy()
+
 def main():
-    global root, notebook, price_label, current_tab_total_label
+    global root, notebook, price_label, current_tab_total_label, label_index, spooler, backend, snapshot
+    global print_client, previews, preview_label, schedule_store, job_executor
+    global background_executor
+    startup_start = time.perf_counter()
+    recorder.open_log(DIAGNOSTICS_LOG)
+    label_index = LabelIndex(INDEX_FILE)
+    snapshot = Snapshot(SNAPSHOT_FILE, delay=SNAPSHOT_DELAY)
+    if PRINT_SERVER:
+        print_client = PrintClient(PRINT_SERVER)
+    backend = DocumentPool(InstrumentedBackend(create_backend(PRINT_BACKEND)), size=DOCUMENT_POOL_SIZE)
+    job_executor = worker_pool(JOB_WORKERS, backend.initialize_thread)
+    background_executor = worker_pool(BACKGROUND_WORKERS, backend.initialize_thread, name="Background")
+    previews = PreviewRenderer(backend, ThumbnailCache(PREVIEW_CACHE_DIR, PREVIEW_MEMORY_MB * 1024 * 1024),
+                               dpi=PREVIEW_DPI, initializer=backend.initialize_thread)
+    spooler = Spooler(backend.session, SPOOL_DIR, initializer=backend.initialize_thread, printers=PRINTERS,
+                      cut_mode=CUT_MODE, printer_profiles=PRINTER_PROFILES)
     root = ThemedTk(theme="clearlooks")
     root.title("Butty Printer 3000")
     root.geometry("550x810")
@@ -580,16 +1054,35 @@ def main():
     controls = tk.Frame(root)
     controls.grid(row=1, column=0, columnspan=3, sticky="ew")
     ttk.Button(controls, text="Set Price", command=set_price).pack(side="left", padx=5, pady=3)
+    ttk.Button(controls, text="Undo Price", command=undo_price).pack(side="left", padx=5, pady=3)
+    ttk.Button(controls, text="Rescan", command=rescan_all).pack(side="left", padx=5, pady=3)
+    ttk.Button(controls, text="Production", command=show_production).pack(side="left", padx=5, pady=3)
+    ttk.Button(controls, text="Diagnostics", command=show_diagnostics).pack(side="left", padx=5, pady=3)
     price_label = ttk.Label(controls, text=f"Current Price: {current_price}", font=("Arial", 10, "bold"))
     price_label.pack(side="left", padx=5)
     ttk.Button(controls, text="Print Labels", command=print_labels).pack(side="right", padx=15, pady=3)
     current_tab_total_label = ttk.Label(controls, text="Total: 0", font=("Arial", 10, "bold"))
     current_tab_total_label.pack(side="right", padx=5)
     root.columnconfigure(0, weight=1)
+    preview_label = ttk.Label(root, text="Select a label to preview it", anchor="center")
+    preview_label.grid(row=2, column=0, columnspan=3, sticky="ew", pady=3)
     root.rowconfigure(0, weight=1)
     build_tabs()
+    schedule_store = ScheduleStore(SCHEDULE_DB)
+    try:
+        for schedule in schedule_store.import_dir(SCHEDULE_DIR, [os.path.basename(fp) for fp in tab_folders.values()]):
+            for problem in schedule.problems:
+                recorder.error("schedule_import", problem, file=schedule.path)
+    except (OSError, csv.Error) as e:
+        recorder.error("schedule_import", e, file=SCHEDULE_DIR)
+    scheduled_stores.update(schedule_store.stores())
     notebook.bind("<<NotebookTabChanged>>", on_tab_change)
+    if notebook.select():
+        ensure_tab_built(notebook.nametowidget(notebook.select()))
     root.bind_all("<MouseWheel>", on_global_mousewheel)
+    root.protocol("WM_DELETE_WINDOW", on_close)
+    start_watcher()
+    root.after(50, poll_previews)
     root.update_idletasks()
     window_width = root.winfo_width()
     window_height = root.winfo_height()
@@ -598,6 +1091,7 @@ def main():
     x = (screen_width - window_width) // 2
     y = (screen_height - window_height) // 2
     root.geometry(f"+{x}+{y}")
+    recorder.record("startup", time.perf_counter() - startup_start, tabs=len(tab_folders))
     root.mainloop()
 
 if __name__ == "__main__":
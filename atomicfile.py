@@ -0,0 +1,34 @@
+import os
+import secrets
+import shutil
+
+# ------------------------------------------------------------------------
+# Atomic file writes
+# ------------------------------------------------------------------------
+# Labels, quantity snapshots and preview thumbnails are all rewritten the same
+# way: the new contents go to a temporary file in the same folder, are fsynced,
+# and replace the old file in one os.replace, so a crash leaves either the old
+# file or the new one, never half of each.
+
+
+def write_file_atomic(file_path, data):
+    """
+    Writes bytes to a temporary file next to file_path and swaps it in with
+    os.replace. The data is on disk before the swap, and the file keeps the
+    permissions it had (a new file gets the default ones, as open() would give it).
+    """
+    folder = os.path.dirname(os.path.abspath(file_path))
+    temp_path = os.path.join(folder, f".{os.path.basename(file_path)}-{secrets.token_hex(8)}.tmp")
+    fd = os.open(temp_path, os.O_WRONLY | os.O_CREAT | os.O_EXCL | getattr(os, "O_BINARY", 0), 0o666)
+    try:
+        with os.fdopen(fd, "wb") as temp_file:
+            temp_file.write(data)
+            temp_file.flush()
+            os.fsync(temp_file.fileno())
+        if os.path.exists(file_path):
+            shutil.copymode(file_path, temp_path)
+        os.replace(temp_path, file_path)
+    except BaseException:
+        if os.path.exists(temp_path):
+            os.remove(temp_path)
+        raise
@@ -0,0 +1,270 @@
+import os
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+
+import lbx
+import render
+
+# ------------------------------------------------------------------------
+# Print backends
+# ------------------------------------------------------------------------
+# Everything that prints, reads or saves a label goes through a backend's
+# session() (or document()), which provides an object with the b-PAC document interface:
+#     Open(path) -> bool              GetObject(name) -> object with .Text, or None
+#     Save() -> bool                  StartPrint(name, options) -> bool
+#     PrintOut(copies, options) -> bool
+#     EndPrint() -> bool              Close() -> bool
+#     SetPrinter(name, fit_page) -> bool
+#     Export(file_type, path, dpi) -> bool
+# BpacBackend wraps the real Brother b-PAC COM object; FakeBackend and
+# FileBackend let the print and reprice paths run on machines without it.
+EXPORT_BMP = 4  # bexBmp, the b-PAC export type for bitmaps
+
+
+class PrintBackend:
+    """Base class: creates documents and prepares threads that will use them."""
+    name = "base"
+
+    def document(self):
+        raise NotImplementedError
+
+    def initialize_thread(self):
+        """Called once on every thread before it creates documents."""
+
+    @contextmanager
+    def session(self):
+        """Lends out a document for one read, save or print session and closes it afterwards."""
+        document = self.document()
+        try:
+            yield document
+        finally:
+            try:
+                document.Close()
+            except Exception:
+                pass
+
+
+class BpacBackend(PrintBackend):
+    """The Brother b-PAC runtime, through COM. Only usable on Windows with b-PAC installed."""
+    name = "bpac"
+
+    def document(self):
+        import win32com.client
+        return win32com.client.Dispatch("bpac.Document")
+
+    def initialize_thread(self):
+        import pythoncom
+        pythoncom.CoInitialize()
+
+
+# ------------------------------------------------------------------------
+# Fake backend
+# ------------------------------------------------------------------------
+class FakeTextObject:
+    __slots__ = ("Text",)
+
+    def __init__(self, text):
+        self.Text = text
+
+
+class FakeDocument:
+    """
+    In-process stand-in for bpac.Document. Every call is recorded on the
+    backend and sleeps for the backend's configured latency. Text objects are
+    read from and saved to .lbx files with the native codec. Setting broken
+    makes every further call raise, like a COM object whose server died.
+    """
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.broken = False
+        self.path = None
+        self.xml = None
+        self.objects = {}
+        self.printing = False
+        self.printer = ""
+
+    def _call(self, method, *args):
+        if self.broken:
+            raise RuntimeError("The RPC server is unavailable.")
+        self.backend.record(method, args)
+
+    def Open(self, path):
+        self._call("Open", path)
+        self.path = path
+        self.objects = {}
+        try:
+            self.xml = lbx.read_label_xml(path)
+        except lbx.LbxError:
+            self.xml = None
+            return os.path.exists(path)
+        return True
+
+    def GetObject(self, name):
+        self._call("GetObject", name)
+        if name not in self.objects:
+            text = lbx.get_text(self.xml, name) if self.xml is not None else None
+            self.objects[name] = FakeTextObject(text) if text is not None else None
+        return self.objects[name]
+
+    def Save(self):
+        self._call("Save")
+        if self.xml is None:
+            return False
+        xml = self.xml
+        for name, obj in self.objects.items():
+            if obj is not None:
+                xml = lbx.set_text(xml, obj.Text, name) or xml
+        if xml != self.xml:
+            lbx.write_label_xml(self.path, xml)
+            self.xml = xml
+        return True
+
+    def SetPrinter(self, name, fit_page):
+        self._call("SetPrinter", name, fit_page)
+        self.printer = name
+        return True
+
+    def StartPrint(self, name, options):
+        self._call("StartPrint", name, options)
+        self.printing = True
+        return True
+
+    def PrintOut(self, copies, options):
+        self._call("PrintOut", copies, options)
+        if self.printing and self.path:
+            self.backend.printed.append((self.path, copies, options))
+            return True
+        return False
+
+    def EndPrint(self):
+        self._call("EndPrint")
+        self.printing = False
+        return True
+
+    def Close(self):
+        self._call("Close")
+        self.path = None
+        return True
+
+    def Export(self, file_type, path, dpi):
+        self._call("Export", file_type, path, dpi)
+        if not self.path:
+            return False
+        render.render_label(self.path, path)
+        return True
+
+
+class FakeBackend(PrintBackend):
+    """
+    Records every document call as (method, args) in calls, and every printed
+    label as (path, copies, options) in printed. latency is the number of
+    seconds each call takes, either one number or a dict keyed by method name.
+    """
+    name = "fake"
+
+    def __init__(self, latency=0.0):
+        self.latency = latency
+        self.calls = []
+        self.printed = []
+        self.documents_created = 0
+        self._lock = threading.Lock()
+
+    def document(self):
+        with self._lock:
+            self.documents_created += 1
+        return FakeDocument(self)
+
+    def record(self, method, args):
+        delay = self.latency.get(method, 0.0) if isinstance(self.latency, dict) else self.latency
+        if delay:
+            time.sleep(delay)
+        with self._lock:
+            self.calls.append((method, args))
+
+    def count(self, method):
+        with self._lock:
+            return sum(1 for called, _ in self.calls if called == method)
+
+
+# ------------------------------------------------------------------------
+# Print-to-file backend
+# ------------------------------------------------------------------------
+class FileDocument(FakeDocument):
+    """A fake document whose print sessions are rendered to files when EndPrint is called."""
+
+    def __init__(self, backend):
+        super().__init__(backend)
+        self.session = []
+
+    def StartPrint(self, name, options):
+        self.session = []
+        return super().StartPrint(name, options)
+
+    def PrintOut(self, copies, options):
+        if super().PrintOut(copies, options):
+            self.session.append((self.path, copies))
+            return True
+        return False
+
+    def EndPrint(self):
+        self.backend.render_session(self.session)
+        self.session = []
+        return super().EndPrint()
+
+
+class FileBackend(FakeBackend):
+    """
+    Prints to files instead of a printer: each print session is rendered to one
+    PNG or PDF per job in out_dir, spread over a process pool.
+    """
+    name = "file"
+
+    def __init__(self, out_dir="printed_labels", file_format="png", workers=None, latency=0.0):
+        super().__init__(latency)
+        self.out_dir = out_dir
+        self.file_format = file_format
+        self.workers = workers
+        self.rendered = []
+        self._executor = None
+        self._sequence = 0
+
+    def document(self):
+        with self._lock:
+            self.documents_created += 1
+        return FileDocument(self)
+
+    def render_session(self, session):
+        if not session:
+            return
+        os.makedirs(self.out_dir, exist_ok=True)
+        tasks = []
+        with self._lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.workers)
+            for path, copies in session:
+                self._sequence += 1
+                name = os.path.splitext(os.path.basename(path))[0]
+                out_path = os.path.join(self.out_dir, f"{self._sequence:05d}-{name}.{self.file_format}")
+                tasks.append(self._executor.submit(render.render_label, path, out_path, copies))
+        paths = [task.result() for task in tasks]
+        with self._lock:
+            self.rendered.extend(paths)
+
+    def close(self):
+        if self._executor is not None:
+            self._executor.shutdown()
+            self._executor = None
+
+
+BACKENDS = {backend.name: backend for backend in (BpacBackend, FakeBackend, FileBackend)}
+
+
+def create_backend(name, **options):
+    """Creates a backend by name ("bpac", "fake" or "file")."""
+    try:
+        return BACKENDS[name](**options)
+    except KeyError:
+        raise ValueError(f"Unknown print backend: {name}") from None
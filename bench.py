@@ -0,0 +1,308 @@
+"""
+Benchmarks for Butty Printer 3000 against a synthetic BASE_DIR.
+
+    python bench.py --stores 20 --labels 200 --out bench.json
+
+Generates N stores x M labels across white/brown/other folders plus matching
+schedule CSVs, then times the hot paths against the fake print backend and
+writes the results as JSON. The GUI benchmarks (build_tabs, on_tab_change,
+populate_day, entry_update, scrolling) need a display; without one they are
+reported as skipped and only the core benchmarks run.
+"""
+import argparse
+import csv
+import json
+import os
+import platform
+import random
+import shutil
+import statistics
+import subprocess
+import tempfile
+import time
+import zipfile
+
+from backends import FakeBackend
+from jobs import Job, worker_pool
+from label_index import LabelIndex
+from labels import FOLDER_TYPES, scan_folder
+from reprice import reprice_label
+from schedule import DAYS
+from schedule_store import ScheduleStore
+from sessions import DocumentPool
+from snapshot import Snapshot
+from spooler import PrintRun, Spooler, plan_jobs
+
+LABEL_XML_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<pt:document xmlns:pt="http://schemas.brother.info/ptouch/2007/lbx/main" '
+    'xmlns:text="http://schemas.brother.info/ptouch/2007/lbx/text"><pt:body><pt:objects>'
+    '<text:text><pt:objectStyle x="4pt" y="4pt"><pt:expanded objectName="Name" ID="0"/></pt:objectStyle>'
+    '<pt:data>{name}</pt:data><text:stringItem charLen="{name_len}"><text:ptFontInfo/></text:stringItem></text:text>'
+    '<text:text><pt:objectStyle x="4pt" y="20pt"><pt:expanded objectName="Price" ID="1"/></pt:objectStyle>'
+    '<pt:data>{price}</pt:data><text:stringItem charLen="{price_len}"><text:ptFontInfo/></text:stringItem></text:text>'
+    '</pt:objects></pt:body></pt:document>'
+)
+
+
+# ------------------------------------------------------------------------
+# Synthetic data
+# ------------------------------------------------------------------------
+def write_label(file_path, name, price="£2.50"):
+    """Writes a minimal .lbx file with a Name and a Price text object."""
+    xml = LABEL_XML_TEMPLATE.format(name=name.replace("&", "&amp;"), name_len=len(name),
+                                    price=price, price_len=len(price))
+    with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        archive.writestr("label.xml", xml)
+        archive.writestr("prop.xml", '<?xml version="1.0" encoding="UTF-8"?><meta:properties/>')
+
+
+def generate_base_dir(base_dir, stores, labels, seed=0):
+    """
+    Creates `stores` store folders with `labels` label files each, split over
+    white, brown and other, plus a numbers CSV and a paninis CSV covering every
+    product. Returns (store_paths, numbers_csv, paninis_csv).
+    """
+    rng = random.Random(seed)
+    sandwiches = max(1, labels * 2 // 5)
+    paninis = max(1, labels - 2 * sandwiches)
+    sandwich_names = [f"{i}.Sandwich {i}" for i in range(1, sandwiches + 1)]
+    panini_names = [f"Panini {i}" for i in range(1, paninis + 1)]
+
+    store_paths = []
+    for store in range(1, stores + 1):
+        store_path = os.path.join(base_dir, f"Store{store:03d}")
+        for folder_type, names in (("white", sandwich_names), ("brown", sandwich_names), ("other", panini_names)):
+            folder = os.path.join(store_path, folder_type)
+            os.makedirs(folder, exist_ok=True)
+            for name in names:
+                write_label(os.path.join(folder, f"{name}.lbx"), name)
+        store_paths.append(store_path)
+
+    numbers_csv = os.path.join(base_dir, "numbers.csv")
+    with open(numbers_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name"] + [f"{day} {bread}" for day in DAYS for bread in ("white", "brown")])
+        for name in sandwich_names:
+            writer.writerow([name] + [rng.randint(0, 6) for _ in range(len(DAYS) * 2)])
+    paninis_csv = os.path.join(base_dir, "paninis.csv")
+    with open(paninis_csv, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name"] + [f"{day} other" for day in DAYS])
+        for name in panini_names:
+            writer.writerow([name] + [rng.randint(0, 4) for _ in range(len(DAYS))])
+    return store_paths, numbers_csv, paninis_csv
+
+
+def write_store_schedules(schedule_dir, store_paths, numbers_csv, paninis_csv):
+    """Copies the generated CSVs to <store>_numbers.csv / <store>_paninis.csv for every store."""
+    os.makedirs(schedule_dir, exist_ok=True)
+    for store_path in store_paths:
+        store = os.path.basename(store_path)
+        shutil.copy(numbers_csv, os.path.join(schedule_dir, f"{store}_numbers.csv"))
+        shutil.copy(paninis_csv, os.path.join(schedule_dir, f"{store}_paninis.csv"))
+
+
+# ------------------------------------------------------------------------
+# Timing
+# ------------------------------------------------------------------------
+def summarize(samples):
+    ordered = sorted(samples)
+    return {
+        "n": len(samples),
+        "mean_ms": round(statistics.fmean(samples) * 1000, 3),
+        "p50_ms": round(ordered[len(ordered) // 2] * 1000, 3),
+        "max_ms": round(ordered[-1] * 1000, 3),
+    }
+
+
+def timed(results, name, fn, repeat=1):
+    """Runs fn `repeat` times and stores a summary of its wall-clock time under name."""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        samples.append(time.perf_counter() - start)
+    results[name] = summarize(samples)
+
+
+def bench_core(results, store_paths, numbers_csv, paninis_csv, work_dir, repeat):
+    """Benchmarks that don't need Tk: scanning, indexing, schedules, totals, repricing and printing."""
+    timed(results, "scan_folder", lambda: [scan_folder(p) for p in store_paths])
+    model = scan_folder(store_paths[0])
+
+    index = LabelIndex(os.path.join(work_dir, "index.sqlite"))
+    timed(results, "index_cold", lambda: [index.refresh_store(p) for p in store_paths])
+    timed(results, "index_warm", lambda: [index.refresh_store(p) for p in store_paths], repeat)
+    timed(results, "price_lookup", lambda: index.first_entry(os.path.join(store_paths[0], "white")), repeat)
+
+    schedule_dir = os.path.join(work_dir, "schedules")
+    write_store_schedules(schedule_dir, store_paths, numbers_csv, paninis_csv)
+    schedules = ScheduleStore(os.path.join(work_dir, "schedules.sqlite"))
+    timed(results, "schedule_import_cold", lambda: schedules.import_dir(schedule_dir))
+    timed(results, "schedule_import_warm", lambda: schedules.import_dir(schedule_dir), repeat)
+    timed(results, "schedule_day", lambda: schedules.day_values(model, "Monday"), repeat)
+
+    rows = list(model.iter_rows())
+    timed(results, "set_text_keystroke", lambda: model.set_text(rows[len(rows) // 2], "7"), repeat * 100)
+
+    backend = FakeBackend()
+    label_paths = [row.path for row in model.iter_rows(("white", "brown"))]
+
+    def reprice():
+        job = Job("Set price", label_paths, lambda path: reprice_label(backend, path, "£2.75"), workers=4).start()
+        job.wait()
+    timed(results, "reprice_job", reprice)
+
+    spooler = Spooler(backend.session, os.path.join(work_dir, "journal"))
+    for row, value in zip(rows, schedules.day_values(model, "Monday")):
+        model.set_text(row, value or "1")
+
+    def print_run():
+        run = spooler.submit(PrintRun(os.path.basename(model.folder_path),
+                                      plan_jobs((row.path, row.quantity) for row in model.iter_rows())))
+        run.finished.wait()
+    timed(results, "spooler_print_run", print_run, repeat)
+    results["spooler_print_run"]["fake_calls"] = len(backend.calls)
+
+    pool = DocumentPool(FakeBackend())
+    read_paths = label_paths[:50]
+
+    def pooled_reads():
+        for path in read_paths:
+            with pool.session() as document:
+                document.Open(path)
+                document.GetObject("Price")
+    timed(results, "pooled_sessions", pooled_reads, repeat)
+    results["pooled_sessions"].update(pool.stats())
+    schedules.close()
+    index.close()
+
+
+def bench_gui(results, store_paths, numbers_csv, paninis_csv, work_dir, repeat):
+    """Benchmarks of the Tk paths, driven through app.py's own functions."""
+    import tkinter as tk
+    from tkinter import ttk
+    import app
+    from demand import DemandCache
+
+    root = tk.Tk()
+    root.withdraw()
+    app.BASE_DIR = os.path.dirname(store_paths[0])
+    app.root = root
+    app.notebook = ttk.Notebook(root)
+    app.notebook.grid(row=0, column=0, sticky="nsew")
+    app.price_label = ttk.Label(root)
+    app.current_tab_total_label = ttk.Label(root)
+    app.backend = FakeBackend()
+    app.job_executor = worker_pool(4, app.backend.initialize_thread)
+    app.background_executor = worker_pool(1, app.backend.initialize_thread, name="Background")
+    app.label_index = LabelIndex(os.path.join(work_dir, "gui-index.sqlite"))
+    app.spooler = Spooler(app.backend.session, os.path.join(work_dir, "gui-journal"))
+    app.SCHEDULE_DIR = os.path.join(work_dir, "gui-schedules")
+    write_store_schedules(app.SCHEDULE_DIR, store_paths, numbers_csv, paninis_csv)
+    app.schedule_store = ScheduleStore(os.path.join(work_dir, "gui-schedules.sqlite"))
+    app.schedule_store.import_dir(app.SCHEDULE_DIR)
+    app.demand = DemandCache(app.schedule_store)
+    app.scheduled_stores.update(app.schedule_store.stores())
+    app.snapshot = Snapshot(os.path.join(work_dir, "gui-snapshot.json"))
+
+    timed(results, "build_tabs", app.build_tabs)
+    root.update()
+    tabs = app.notebook.tabs()
+
+    def switch(tab):
+        app.notebook.select(tab)
+        app.on_tab_change(None)
+        root.update_idletasks()
+    timed(results, "on_tab_change_first", lambda: [switch(tab) for tab in tabs[:min(5, len(tabs))]])
+    timed(results, "on_tab_change_again", lambda: switch(tabs[0]), repeat)
+
+    folder_path = app.current_folder_path()
+    while folder_path not in app.views_by_folder:  # tabs the prescan hasn't reached are built after a scan job
+        root.update()
+        time.sleep(0.01)
+    timed(results, "populate_day", lambda: app.populate_day("Monday", folder_path), repeat)
+
+    view = app.views_by_folder[folder_path]
+    entry = next(iter(app.row_by_entry))
+
+    class Event:
+        widget = entry
+
+    def keystroke():
+        entry.delete(0, tk.END)
+        entry.insert(0, "3")
+        app.entry_update(Event)
+    timed(results, "entry_update", keystroke, repeat * 10)
+
+    def scroll():
+        view.canvas.yview_scroll(5, "units")
+        view.render()
+        root.update_idletasks()
+    timed(results, "scroll_redraw", scroll, repeat * 10)
+    results["scroll_redraw"]["row_widgets"] = len(view.slots)
+    app.snapshot.close()
+    app.schedule_store.close()
+    app.label_index.close()
+    app.job_executor.shutdown()
+    app.background_executor.shutdown(wait=False)
+    root.destroy()
+
+
+def git_version():
+    try:
+        return subprocess.run(["git", "describe", "--always", "--dirty"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark Butty Printer 3000 on a synthetic BASE_DIR.")
+    parser.add_argument("--stores", type=int, default=10)
+    parser.add_argument("--labels", type=int, default=100, help="labels per store")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default="bench.json", help="where to write the JSON results")
+    parser.add_argument("--keep", metavar="DIR", help="generate into DIR and keep it")
+    parser.add_argument("--no-gui", action="store_true", help="skip the Tk benchmarks")
+    args = parser.parse_args(argv)
+
+    work_dir = args.keep or tempfile.mkdtemp(prefix="butty-bench-")
+    base_dir = os.path.join(work_dir, "base")
+    os.makedirs(base_dir, exist_ok=True)
+    results = {}
+    try:
+        start = time.perf_counter()
+        store_paths, numbers_csv, paninis_csv = generate_base_dir(base_dir, args.stores, args.labels, args.seed)
+        results["generate"] = summarize([time.perf_counter() - start])
+
+        bench_core(results, store_paths, numbers_csv, paninis_csv, work_dir, args.repeat)
+        if args.no_gui:
+            results["gui"] = "skipped: --no-gui"
+        else:
+            try:
+                bench_gui(results, store_paths, numbers_csv, paninis_csv, work_dir, args.repeat)
+            except Exception as e:  # no display, or the GUI dependencies aren't installed
+                results["gui"] = f"skipped: {e}"
+    finally:
+        if not args.keep:
+            shutil.rmtree(work_dir, ignore_errors=True)
+
+    report = {
+        "version": git_version(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "params": {"stores": args.stores, "labels": args.labels, "repeat": args.repeat,
+                   "folder_types": list(FOLDER_TYPES)},
+        "results": results,
+    }
+    with open(args.out, "w", encoding="utf-8") as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(report, indent=2))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,339 @@
+"""
+Headless batch mode for scheduled runs, e.g. from cron or Task Scheduler:
+
+    python cli.py print --day Monday --all
+    python cli.py print --day Monday --store Spalding --dry-run
+    python cli.py reprice --store Spalding --price 2.75
+    python cli.py undo-price --store Spalding
+    python cli.py production --all --out production.csv
+    python cli.py import-schedules
+
+Uses the same label, schedule, spooler and repricing code as the GUI but never
+imports tkinter. Exit codes: 0 success, 1 some labels failed, 2 bad arguments,
+3 a store folder or schedule CSV could not be read.
+"""
+import argparse
+import csv
+import json
+import os
+import sys
+import time
+
+import settings
+
+EXIT_OK = 0
+EXIT_FAILED = 1
+EXIT_USAGE = 2
+EXIT_NOT_FOUND = 3
+
+
+class CliError(Exception):
+    """A problem with the inputs of a run; carries the exit code to return."""
+
+    def __init__(self, message, exit_code=EXIT_NOT_FOUND):
+        super().__init__(message)
+        self.exit_code = exit_code
+
+
+def store_paths(base_dir, stores, all_stores):
+    """Returns the folder of every requested store, checking that each exists."""
+    if all_stores:
+        try:
+            names = sorted(f for f in os.listdir(base_dir) if os.path.isdir(os.path.join(base_dir, f)))
+        except OSError as e:
+            raise CliError(f"Cannot list {base_dir}: {e}")
+    else:
+        names = stores
+    paths = []
+    for name in names:
+        path = os.path.join(base_dir, name)
+        if not os.path.isdir(path):
+            raise CliError(f"No store folder {path}")
+        paths.append(path)
+    if not paths:
+        raise CliError(f"No stores found in {base_dir}")
+    return paths
+
+
+def make_backend(name):
+    from backends import create_backend
+    from diagnostics import InstrumentedBackend
+    from sessions import DocumentPool
+    return DocumentPool(InstrumentedBackend(create_backend(name)), size=settings.DOCUMENT_POOL_SIZE)
+
+
+def emit(payload):
+    json.dump(payload, sys.stdout, indent=2, ensure_ascii=False)
+    sys.stdout.write("\n")
+
+
+# ------------------------------------------------------------------------
+# print
+# ------------------------------------------------------------------------
+def plan_store(store_path, day, schedules):
+    """Returns the job plan for one store and day from its schedule, as populate_day + print_labels would."""
+    from labels import scan_folder
+    from spooler import plan_jobs
+    model = scan_folder(store_path)
+    for row, value in zip(model.iter_rows(), schedules.day_values(model, day)):
+        if value is not None:
+            model.set_text(row, value)
+    return plan_jobs((row.path, row.quantity) for row in model.iter_rows())
+
+
+def cmd_print(args):
+    from cutter import DEFAULT_PROFILE, estimate_savings
+    from schedule_store import ScheduleStore
+    from spooler import BATCH_SIZE, PrintRun, Spooler
+
+    paths = store_paths(args.base_dir, args.store, args.all)
+    schedules = ScheduleStore(settings.SCHEDULE_DB)
+    try:
+        schedules.import_dir(args.schedule_dir, [os.path.basename(path) for path in paths])
+    except (OSError, csv.Error) as e:
+        schedules.close()
+        raise CliError(f"Could not read the schedules: {e}")
+
+    # A store without schedule CSVs would otherwise print nothing without saying so.
+    scheduled = schedules.stores()
+    unscheduled = [path for path in paths if os.path.basename(path) not in scheduled]
+    if unscheduled and not args.skip_unscheduled:
+        schedules.close()
+        raise CliError(f"No schedule in {args.schedule_dir} for "
+                       f"{', '.join(os.path.basename(path) for path in unscheduled)}")
+    for path in unscheduled:
+        print(f"skipping {os.path.basename(path)}: no schedule in {args.schedule_dir}", file=sys.stderr)
+    paths = [path for path in paths if path not in unscheduled]
+    if not paths:
+        schedules.close()
+        raise CliError(f"No store schedules found in {args.schedule_dir}")
+
+    for csv_path, problems in schedules.problems([os.path.basename(path) for path in paths]).items():
+        for problem in problems:
+            print(f"{csv_path}: {problem}", file=sys.stderr)
+    plans = [(path, plan_store(path, args.day, schedules)) for path in paths]
+    schedules.close()
+    if args.dry_run:
+        # Estimated as if each run went to the first printer alone
+        printer = (args.printer or settings.PRINTERS or [""])[0]
+        profile = dict(DEFAULT_PROFILE, cut_mode=settings.CUT_MODE, **settings.PRINTER_PROFILES.get(printer, {}))
+        emit({"day": args.day, "stores": [
+            {"store": os.path.basename(path), "copies": sum(job.copies for job in jobs),
+             "estimate": estimate_savings([jobs[i:i + BATCH_SIZE] for i in range(0, len(jobs), BATCH_SIZE)], profile),
+             "jobs": [job.to_dict() for job in jobs]}
+            for path, jobs in plans]})
+        return EXIT_OK
+
+    backend = make_backend(args.backend)
+    spooler = Spooler(backend.session, settings.SPOOL_DIR, initializer=backend.initialize_thread,
+                      printers=args.printer or settings.PRINTERS, cut_mode=settings.CUT_MODE,
+                      printer_profiles=settings.PRINTER_PROFILES)
+    runs = [spooler.submit(PrintRun(os.path.basename(path), jobs, resume=args.resume)) for path, jobs in plans if jobs]
+    for run in runs:
+        run.finished.wait()
+    emit({"day": args.day, "runs": [dict(run.summary(), failed=[path for path, _ in run.errors]) for run in runs]})
+    return EXIT_FAILED if any(run.errors for run in runs) else EXIT_OK
+
+
+# ------------------------------------------------------------------------
+# reprice
+# ------------------------------------------------------------------------
+def cmd_reprice(args):
+    import lbx
+    from jobs import Job
+    from label_index import LabelIndex
+    from labels import scan_folder
+    from reprice import RepriceJournal, group_by_content, reprice_copies
+
+    new_price = args.price if args.price.startswith("£") else f"£{args.price}"
+    store_of = {}
+    folders = []
+    for path in store_paths(args.base_dir, args.store, args.all):
+        folders.extend(os.path.join(path, folder_type) for folder_type in ("white", "brown"))
+        for row in scan_folder(path).iter_rows(("white", "brown")):
+            store_of[row.path] = os.path.basename(path)
+
+    # Identical templates (usually the same label in many stores) are decoded once.
+    index = LabelIndex(settings.INDEX_FILE)
+    hashes = {}
+    for folder in folders:
+        index.refresh_folder(folder)
+        hashes.update((entry.path, entry.content_hash) for entry in index.fresh_entries(folder))
+    index.close()
+    groups = group_by_content(list(store_of), hashes)
+
+    if args.dry_run:
+        labels = []
+        for paths in groups:
+            try:
+                current = lbx.read_price(paths[0])
+            except lbx.LbxError:
+                current = None  # would be read through b-PAC
+            labels.extend({"path": path, "price": current, "changes": current != new_price} for path in paths)
+        emit({"price": new_price, "files": len(store_of), "templates": len(groups), "labels": labels})
+        return EXIT_OK
+
+    backend = make_backend(args.backend)
+    journals = {store: RepriceJournal(settings.REPRICE_JOURNAL_DIR, store) for store in set(store_of.values())}
+    for journal in journals.values():
+        journal.begin(new_price)
+    job = Job("Reprice", groups, lambda paths: reprice_copies(backend, lambda path: journals[store_of[path]],
+                                                               paths, new_price),
+              workers=args.workers, initializer=backend.initialize_thread).start()
+    job.wait()
+    written = {path: flag for result in job.results.values() for path, flag in result.items()}
+    failed_stores = {store_of[path] for paths, _ in job.errors for path in paths}
+    for store, journal in journals.items():
+        if store not in failed_stores:
+            flags = [flag for path, flag in written.items() if store_of[path] == store]
+            journal.finish(price=new_price, changed=sum(flags), skipped=len(flags) - sum(flags))
+    changed = sum(written.values())
+    skipped = len(written) - changed
+    emit({"price": new_price, "stores": sorted(journals), "files": len(store_of), "templates": len(groups),
+          "changed": changed, "skipped": skipped, "decodes_saved": len(store_of) - len(groups),
+          "failed": {path: str(error) for paths, error in job.errors for path in paths},
+          "seconds": round(job.elapsed(), 3)})
+    return EXIT_FAILED if job.errors else EXIT_OK
+
+
+def cmd_undo_price(args):
+    from jobs import Job
+    from reprice import close_rolled_back, journal_old_prices, latest_journal, restore_label
+
+    journals = []
+    for path in store_paths(args.base_dir, args.store, args.all):
+        store = os.path.basename(path)
+        journal_path = latest_journal(settings.REPRICE_JOURNAL_DIR, store)
+        if journal_path:
+            journals.append((store, journal_path, journal_old_prices(journal_path)))
+
+    if args.dry_run:
+        emit({"stores": [{"store": store, "journal": journal_path,
+                          "labels": [{"path": path, "price": old} for path, old in old_prices]}
+                         for store, journal_path, old_prices in journals]})
+        return EXIT_OK
+
+    backend = make_backend(args.backend)
+    results = []
+    for store, journal_path, old_prices in journals:
+        job = Job("Undo price", old_prices, lambda item: restore_label(backend, *item),
+                  workers=args.workers, initializer=backend.initialize_thread).start()
+        job.wait()
+        if not job.errors:
+            close_rolled_back(journal_path)
+        results.append({"store": store, "labels": job.total,
+                        "failed": {str(path): str(error) for (path, _), error in job.errors}})
+    emit({"stores": results})
+    return EXIT_FAILED if any(result["failed"] for result in results) else EXIT_OK
+
+
+# ------------------------------------------------------------------------
+# production
+# ------------------------------------------------------------------------
+def cmd_production(args):
+    from demand import DemandCache
+    from schedule_store import ScheduleStore
+
+    stores = [os.path.basename(path) for path in store_paths(args.base_dir, args.store, args.all)]
+    schedules = ScheduleStore(settings.SCHEDULE_DB)
+    try:
+        schedules.import_dir(args.schedule_dir, stores)
+        matrix = DemandCache(schedules).matrix(stores)
+    except (OSError, csv.Error) as e:
+        raise CliError(f"Could not read the schedules: {e}")
+    finally:
+        schedules.close()
+    if not matrix.stores:
+        raise CliError(f"No store schedules found in {args.schedule_dir}")
+    if args.out:
+        matrix.export_csv(args.out, by_store=args.by_store)
+        return EXIT_OK
+    emit({"day": args.day or "Week", "stores": matrix.store_totals(args.day),
+          "total": matrix.total(day=args.day), "sheet": matrix.production_sheet(args.day)})
+    return EXIT_OK
+
+
+# ------------------------------------------------------------------------
+# import-schedules
+# ------------------------------------------------------------------------
+def cmd_import_schedules(args):
+    from schedule_store import ScheduleStore, current_week
+
+    schedules = ScheduleStore(settings.SCHEDULE_DB)
+    start = time.perf_counter()
+    try:
+        imported = schedules.import_dir(args.schedule_dir, args.store, args.week)
+    except (OSError, csv.Error) as e:
+        raise CliError(f"Could not read the schedules: {e}")
+    emit({"week": args.week or current_week(), "imported": [schedule.path for schedule in imported],
+          "problems": {schedule.path: schedule.problems for schedule in imported if schedule.problems},
+          "stores": sorted(schedules.stores()), "seconds": round(time.perf_counter() - start, 3)})
+    schedules.close()
+    return EXIT_OK
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(prog="cli.py", description="Butty Printer 3000 batch mode.")
+    parser.add_argument("--base-dir", default=settings.BASE_DIR)
+    parser.add_argument("--backend", default=settings.PRINT_BACKEND, help="bpac, fake or file")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    from schedule import DAYS
+    print_parser = commands.add_parser("print", help="print a day's schedule")
+    print_parser.add_argument("--day", required=True, choices=DAYS)
+    print_parser.add_argument("--schedule-dir", default=settings.SCHEDULE_DIR)
+    print_parser.add_argument("--resume", action="store_true",
+                              help="continue interrupted runs of the same plans instead of printing them again")
+    print_parser.add_argument("--skip-unscheduled", action="store_true",
+                              help="leave out stores without a schedule instead of failing")
+    print_parser.add_argument("--printer", action="append",
+                              help="printer to split the runs across (repeatable, default: PRINTERS in settings)")
+    print_parser.set_defaults(run=cmd_print)
+
+    reprice_parser = commands.add_parser("reprice", help="set the price of white and brown labels")
+    reprice_parser.add_argument("--price", required=True)
+    reprice_parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS)
+    reprice_parser.set_defaults(run=cmd_reprice)
+
+    undo_parser = commands.add_parser("undo-price", help="roll back the last reprice run of each store")
+    undo_parser.add_argument("--workers", type=int, default=settings.JOB_WORKERS)
+    undo_parser.set_defaults(run=cmd_undo_price)
+
+    production_parser = commands.add_parser("production", help="production sheet across stores")
+    production_parser.add_argument("--day", choices=DAYS, help="one day instead of the whole week")
+    production_parser.add_argument("--schedule-dir", default=settings.SCHEDULE_DIR)
+    production_parser.add_argument("--out", help="write every day's sheet to this CSV instead")
+    production_parser.add_argument("--by-store", action="store_true", help="split the CSV rows by store")
+    production_parser.set_defaults(run=cmd_production)
+
+    import_parser = commands.add_parser("import-schedules",
+                                        help="import the <store>_numbers.csv / <store>_paninis.csv schedules")
+    import_parser.add_argument("--schedule-dir", default=settings.SCHEDULE_DIR)
+    import_parser.add_argument("--store", action="append", help="store name (repeatable, default: every store)")
+    import_parser.add_argument("--week", help="ISO week to import as, e.g. 2026-W42 (default: this week)")
+    import_parser.set_defaults(run=cmd_import_schedules)
+
+    for sub in (print_parser, reprice_parser, undo_parser, production_parser):
+        stores = sub.add_mutually_exclusive_group(required=True)
+        stores.add_argument("--store", action="append", help="store folder name (repeatable)")
+        stores.add_argument("--all", action="store_true", help="every store in the base dir")
+        if sub is not production_parser:
+            sub.add_argument("--dry-run", action="store_true",
+                             help="output the plan as JSON without printing or saving")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+    try:
+        return args.run(args)
+    except CliError as e:
+        print(f"error: {e}", file=sys.stderr)
+        return e.exit_code
+    except ValueError as e:  # e.g. an unknown backend name
+        print(f"error: {e}", file=sys.stderr)
+        return EXIT_USAGE
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,103 @@
+import os
+
+from labels import FOLDER_TYPES
+
+# ------------------------------------------------------------------------
+# Cut modes and feed-optimized job order
+# ------------------------------------------------------------------------
+# Every PrintOut that doesn't follow a chained one starts by feeding the tape
+# margin, and every full cut costs time. Jobs are ordered so labels of the same
+# folder type (white, then brown, then other) print back to back, and the cut
+# mode of a printer decides which PrintOut options each job of a print session
+# gets:
+#   cut       every label is cut off (what the app always did)
+#   half-cut  labels are half-cut and each job's strip is cut off at its end
+#   chain     every label is cut off, but the tape isn't fed between jobs
+#   auto      each folder type comes out as one chained, half-cut strip
+#   no-cut    nothing is cut; labels are torn off by hand (printers without a cutter)
+AUTO_CUT = 0x1            # b-PAC bpoAutoCut
+HALF_CUT = 0x200          # b-PAC bpoHalfCut
+CHAIN_PRINT = 0x400       # b-PAC bpoChainPrint
+
+CUT_MODES = ("cut", "half-cut", "chain", "auto", "no-cut")
+
+# Cost model of a printer; settings.PRINTER_PROFILES overrides it per printer.
+DEFAULT_PROFILE = {
+    "cut_mode": "cut",
+    "feed_mm": 25.0,          # tape fed before a job that doesn't follow a chained one
+    "feed_seconds": 0.8,
+    "cut_seconds": 0.5,       # per full cut
+}
+
+
+def job_group(path):
+    """Returns the position of a label's folder type in FOLDER_TYPES (unknown folders last)."""
+    folder_type = os.path.basename(os.path.dirname(path)).lower()
+    return FOLDER_TYPES.index(folder_type) if folder_type in FOLDER_TYPES else len(FOLDER_TYPES)
+
+
+def order_jobs(jobs):
+    """Orders jobs by folder type, keeping the plan order within each type."""
+    return sorted(jobs, key=lambda job: job_group(job.path))
+
+
+def cut_options(jobs, cut_mode):
+    """Returns the PrintOut options of each job of one print session, in print order."""
+    if cut_mode not in CUT_MODES:
+        raise ValueError(f"Unknown cut mode {cut_mode!r}")
+    options = []
+    for i, job in enumerate(jobs):
+        last = i == len(jobs) - 1
+        if cut_mode == "no-cut":
+            options.append(0)
+        elif cut_mode == "cut":
+            options.append(AUTO_CUT)
+        elif cut_mode == "half-cut":
+            options.append(AUTO_CUT | HALF_CUT)
+        elif cut_mode == "chain":
+            options.append(AUTO_CUT if last else AUTO_CUT | CHAIN_PRINT)
+        elif last or job_group(jobs[i + 1].path) != job_group(job.path):
+            options.append(AUTO_CUT | HALF_CUT)
+        else:
+            options.append(AUTO_CUT | HALF_CUT | CHAIN_PRINT)
+    return options
+
+
+def session_cost(jobs, options):
+    """Returns (feeds, full cuts) of printing jobs with the given options in one session."""
+    feeds = cuts = 0
+    chained = False
+    for job, option in zip(jobs, options):
+        if not chained:
+            feeds += 1
+        chained = bool(option & CHAIN_PRINT)
+        if option & AUTO_CUT:
+            if not option & HALF_CUT:
+                cuts += job.copies
+            elif not chained:
+                cuts += 1
+    return feeds, cuts
+
+
+def estimate_savings(sessions, profile):
+    """
+    Estimates what printing the given sessions (lists of jobs) in the profile's
+    cut mode saves over cutting every label, which is what "cut" mode does.
+    """
+    feeds = cuts = base_feeds = base_cuts = 0
+    for jobs in sessions:
+        session_feeds, session_cuts = session_cost(jobs, cut_options(jobs, profile["cut_mode"]))
+        feeds += session_feeds
+        cuts += session_cuts
+        base_feeds += len(jobs)
+        base_cuts += sum(job.copies for job in jobs)
+    return {
+        "cut_mode": profile["cut_mode"],
+        "feeds": feeds,
+        "cuts": cuts,
+        "feeds_saved": base_feeds - feeds,
+        "cuts_saved": base_cuts - cuts,
+        "tape_saved_mm": round((base_feeds - feeds) * profile["feed_mm"], 1),
+        "seconds_saved": round((base_feeds - feeds) * profile["feed_seconds"]
+                               + (base_cuts - cuts) * profile["cut_seconds"], 1),
+    }
@@ -0,0 +1,140 @@
+import csv
+
+import numpy as np
+
+from labels import FOLDER_TYPES, natural_key
+from schedule import DAYS
+
+# ------------------------------------------------------------------------
+# Weekly demand matrix
+# ------------------------------------------------------------------------
+# The newest week of every store in the schedule store (see schedule_store.py)
+# is loaded into one integer array indexed by (store, product, day, bread),
+# where bread is white, brown or other (panini).
+# Totals, production sheets and exports are sums over its axes, so they cost
+# the same whether they cover one store or hundreds.
+BREADS = FOLDER_TYPES
+SHEET_HEADER = ["Product"] + [bread.capitalize() for bread in BREADS] + ["Total"]
+
+
+class DemandMatrix:
+    """Scheduled quantities of every store, product, day and bread."""
+
+    def __init__(self, stores, products, quantities):
+        self.stores = stores
+        self.products = products
+        self.quantities = quantities  # int32 array, shape (stores, products, days, breads)
+        self.store_index = {store: i for i, store in enumerate(stores)}
+        self.product_index = {product: i for i, product in enumerate(products)}
+        self._production = None
+
+    def _select(self, store=None, product=None, day=None, bread=None):
+        return (slice(None) if store is None else self.store_index[store],
+                slice(None) if product is None else self.product_index[product],
+                slice(None) if day is None else DAYS.index(day),
+                slice(None) if bread is None else BREADS.index(bread))
+
+    def total(self, store=None, product=None, day=None, bread=None):
+        """
+        Sums the quantities matching the given store, product, day and bread;
+        anything left as None is summed over, e.g. total(product="Beef", bread="brown").
+        Unknown stores and products total 0.
+        """
+        if (store is not None and store not in self.store_index) or \
+                (product is not None and product not in self.product_index):
+            return 0
+        return int(self.quantities[self._select(store, product, day, bread)].sum())
+
+    def labels_total(self, store, day, labels):
+        """
+        Sums a store's quantities on a day over (bread, product) pairs, e.g. the
+        labels of its tab. Pairs the matrix doesn't have count 0.
+        """
+        pairs = [(BREADS.index(bread), self.product_index[product]) for bread, product in labels
+                 if bread in BREADS and product in self.product_index]
+        if store not in self.store_index or not pairs:
+            return 0
+        breads, products = zip(*pairs)
+        return int(self.quantities[self.store_index[store], list(products), DAYS.index(day), list(breads)].sum())
+
+    def store_totals(self, day=None):
+        """Returns {store: total} for one day, or for the whole week if day is None."""
+        quantities = self.quantities if day is None else self.quantities[:, :, DAYS.index(day)]
+        totals = quantities.reshape(len(self.stores), -1).sum(axis=1)
+        return dict(zip(self.stores, totals.tolist()))
+
+    def production(self):
+        """All stores added up: an array of shape (products, days, breads)."""
+        if self._production is None:
+            self._production = self.quantities.sum(axis=0)
+        return self._production
+
+    def production_sheet(self, day=None):
+        """
+        Returns [product, white, brown, other, total] for every product needed on
+        a day (or over the week if day is None) across all stores.
+        """
+        production = self.production()
+        per_bread = production.sum(axis=1) if day is None else production[:, DAYS.index(day)]
+        totals = per_bread.sum(axis=1)
+        needed = np.flatnonzero(totals)
+        return [[self.products[p]] + per_bread[p].tolist() + [int(totals[p])] for p in needed]
+
+    def export_csv(self, path, by_store=False):
+        """
+        Writes one production sheet per day plus the week to a CSV (Day, Product,
+        White, Brown, Other, Total). With by_store the rows are also split by store.
+        """
+        with open(path, "w", newline="", encoding="utf-8") as f:
+            writer = csv.writer(f)
+            if not by_store:
+                writer.writerow(["Day"] + SHEET_HEADER)
+                for day in list(DAYS) + [None]:
+                    for row in self.production_sheet(day):
+                        writer.writerow([day or "Week"] + row)
+                return
+            writer.writerow(["Store", "Day"] + SHEET_HEADER)
+            totals = self.quantities.sum(axis=3)
+            for s, p, d in zip(*np.nonzero(totals)):
+                writer.writerow([self.stores[s], DAYS[d], self.products[p]]
+                                + self.quantities[s, p, d].tolist() + [int(totals[s, p, d])])
+
+
+def build_matrix(rows):
+    """
+    Builds a DemandMatrix from (store, day index, bread, product, quantity text)
+    rows, as ScheduleStore.newest_quantities() returns them. Cells that aren't
+    whole numbers count as 0.
+    """
+    stores = sorted({row[0] for row in rows}, key=natural_key)
+    products = sorted({row[3] for row in rows}, key=natural_key)
+    store_index = {store: i for i, store in enumerate(stores)}
+    product_index = {product: i for i, product in enumerate(products)}
+    quantities = np.zeros((len(stores), len(products), len(DAYS), len(BREADS)), dtype=np.int32)
+    cells = [(store_index[store], product_index[product], day, BREADS.index(bread), int(quantity))
+             for store, day, bread, product, quantity in rows
+             if bread in BREADS and quantity and quantity.isdigit()]
+    if cells:
+        s, p, d, b, values = np.array(cells, dtype=np.int64).T
+        quantities[s, p, d, b] = values
+    return DemandMatrix(stores, products, quantities)
+
+
+class DemandCache:
+    """
+    Keeps the DemandMatrix built from a ScheduleStore (the newest week of each
+    store) until an import changes the store or other stores are asked for.
+    """
+
+    def __init__(self, schedule_store):
+        self.schedule_store = schedule_store
+        self._matrix = None
+        self._stamp = None
+
+    def matrix(self, stores):
+        """Returns the demand matrix of the given stores (those without a schedule are left out)."""
+        stamp = (self.schedule_store.version(), tuple(sorted(stores)))
+        if stamp != self._stamp:
+            self._matrix = build_matrix(self.schedule_store.newest_quantities(set(stores)))
+            self._stamp = stamp
+        return self._matrix
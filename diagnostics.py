@@ -0,0 +1,188 @@
+import bisect
+import collections
+import functools
+import heapq
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+from backends import PrintBackend
+
+# ------------------------------------------------------------------------
+# Timing and error diagnostics
+# ------------------------------------------------------------------------
+# Every print-backend call and every top-level action is timed into the
+# module-level recorder. Each measurement is appended to a JSONL log (when one
+# is open) and folded into per-operation latency histograms that the
+# diagnostics window reads.
+BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000)
+MAX_SAMPLES = 10000   # per operation, for percentiles
+SLOWEST_FILES = 20
+
+
+class OperationStats:
+    """Latency histogram, recent samples and error count of one operation."""
+    __slots__ = ("count", "errors", "total", "histogram", "samples")
+
+    def __init__(self):
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.histogram = [0] * (len(BUCKETS_MS) + 1)
+        self.samples = collections.deque(maxlen=MAX_SAMPLES)
+
+    def add(self, seconds, error):
+        self.count += 1
+        self.total += seconds
+        if error is not None:
+            self.errors += 1
+        self.histogram[bisect.bisect_left(BUCKETS_MS, seconds * 1000)] += 1
+        self.samples.append(seconds)
+
+    def percentiles(self, *points):
+        ordered = sorted(self.samples)
+        if not ordered:
+            return [0.0 for _ in points]
+        return [ordered[min(len(ordered) - 1, int(len(ordered) * p / 100))] for p in points]
+
+
+class Recorder:
+    """Collects timings and errors from any thread."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.stats = {}
+        self.slowest = []  # min-heap of (seconds, op, file)
+        self.log_file = None
+
+    def open_log(self, path):
+        """Starts appending every measurement to a JSONL file."""
+        with self.lock:
+            if self.log_file:
+                self.log_file.close()
+            self.log_file = open(path, "a", encoding="utf-8")
+
+    def close(self):
+        with self.lock:
+            if self.log_file:
+                self.log_file.close()
+                self.log_file = None
+
+    def record(self, op, seconds, file=None, error=None, **extra):
+        with self.lock:
+            stats = self.stats.get(op)
+            if stats is None:
+                stats = self.stats[op] = OperationStats()
+            stats.add(seconds, error)
+            if file:
+                entry = (seconds, op, file)
+                if len(self.slowest) < SLOWEST_FILES:
+                    heapq.heappush(self.slowest, entry)
+                elif entry > self.slowest[0]:
+                    heapq.heapreplace(self.slowest, entry)
+            if self.log_file:
+                record = {"t": time.time(), "op": op, "ms": round(seconds * 1000, 3)}
+                if file:
+                    record["file"] = file
+                if error is not None:
+                    record["error"] = str(error)
+                record.update(extra)
+                self.log_file.write(json.dumps(record) + "\n")
+                self.log_file.flush()
+
+    def error(self, op, error, file=None):
+        """Records a failure that has no meaningful duration (in the log and the summary)."""
+        self.record(op + ".error", 0.0, file=file, error=error)
+
+    def summary(self):
+        """Returns one dict per operation with count, errors and p50/p95/p99/max in milliseconds."""
+        with self.lock:
+            rows = []
+            for op, stats in sorted(self.stats.items()):
+                p50, p95, p99 = stats.percentiles(50, 95, 99)
+                rows.append({
+                    "op": op,
+                    "count": stats.count,
+                    "errors": stats.errors,
+                    "p50_ms": p50 * 1000,
+                    "p95_ms": p95 * 1000,
+                    "p99_ms": p99 * 1000,
+                    "max_ms": max(stats.samples, default=0.0) * 1000,
+                    "histogram": dict(zip([f"<={b}ms" for b in BUCKETS_MS] + ["more"], stats.histogram)),
+                })
+            return rows
+
+    def slowest_files(self):
+        with self.lock:
+            return sorted(self.slowest, reverse=True)
+
+
+recorder = Recorder()
+
+
+@contextmanager
+def timed(op, file=None, **extra):
+    """Times the body of a with-statement as one measurement of op."""
+    start = time.perf_counter()
+    error = None
+    try:
+        yield
+    except Exception as e:
+        error = e
+        raise
+    finally:
+        recorder.record(op, time.perf_counter() - start, file=file, error=error, **extra)
+
+
+def timed_action(op):
+    """Decorator that times every call of a top-level action."""
+    def decorator(fn):
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with timed(op):
+                return fn(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+# ------------------------------------------------------------------------
+# Instrumented print backend
+# ------------------------------------------------------------------------
+class InstrumentedDocument:
+    """Wraps a backend document and times every method call as "bpac.<Method>"."""
+
+    def __init__(self, document, path=None):
+        self._document = document
+        self._path = path
+
+    def __getattr__(self, name):
+        attr = getattr(self._document, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args):
+            if name == "Open" and args:
+                self._path = args[0]
+            with timed(f"bpac.{name}", file=self._path):
+                return attr(*args)
+        return call
+
+
+class InstrumentedBackend(PrintBackend):
+    """A backend wrapper that times document creation and every document call."""
+
+    def __init__(self, backend):
+        self.backend = backend
+        self.name = backend.name
+
+    def document(self):
+        with timed("bpac.Dispatch"):
+            document = self.backend.document()
+        return InstrumentedDocument(document)
+
+    def initialize_thread(self):
+        self.backend.initialize_thread()
+
+    def __getattr__(self, name):
+        return getattr(self.backend, name)
@@ -0,0 +1,113 @@
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+# ------------------------------------------------------------------------
+# Background jobs
+# ------------------------------------------------------------------------
+# A Job applies one function to a list of items on a pool of worker threads.
+# Workers never touch Tk: they put events on the job's queue, and the UI drains
+# it with poll() from a root.after() callback. Long-running programs share one
+# worker_pool() between their jobs, so per-thread state such as the warm b-PAC
+# documents of a DocumentPool outlives a single action.
+PROGRESS = "progress"
+DONE = "done"
+
+
+def worker_pool(workers=4, initializer=None, name="Jobs"):
+    """A long-lived pool of worker threads for Jobs, each initialised once with initializer."""
+    return ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix=name, initializer=initializer)
+
+
+class Job:
+    """
+    A long-running operation over a list of items (e.g. label files). Each item
+    is passed to work(item) on a worker thread; exceptions are collected per
+    item instead of stopping the job. cancel() stops workers from picking up
+    further items. The job runs on executor (a worker_pool()) if one is given,
+    otherwise on a pool of its own with `workers` threads.
+    """
+
+    def __init__(self, name, items, work, workers=4, initializer=None, executor=None):
+        self.name = name
+        self.items = list(items)
+        self.work = work
+        self.workers = max(1, workers)
+        self.initializer = initializer
+        self.executor = executor
+        self.total = len(self.items)
+        self.done = 0
+        self.results = {}
+        self.errors = []
+        self.events = queue.Queue()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+        self.started_at = None
+        self.finished_at = None
+        self._lock = threading.Lock()
+        self._executor = None
+
+    def start(self):
+        """Submits every item to the worker pool and returns immediately."""
+        self.started_at = time.perf_counter()
+        if not self.items:
+            self._finish()
+            return self
+        if self.executor is not None:
+            for item in self.items:
+                self.executor.submit(self._run_item, item)
+            return self
+        self._executor = ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix=self.name,
+                                            initializer=self.initializer)
+        for item in self.items:
+            self._executor.submit(self._run_item, item)
+        self._executor.shutdown(wait=False)
+        return self
+
+    def cancel(self):
+        self.cancelled.set()
+
+    def _run_item(self, item):
+        error = None
+        if self.cancelled.is_set():
+            error = "cancelled"
+        else:
+            try:
+                self.results[item] = self.work(item)
+            except Exception as e:
+                error = e
+        with self._lock:
+            self.done += 1
+            if error is not None and error != "cancelled":
+                self.errors.append((item, error))
+            self.events.put((PROGRESS, item, error))
+            if self.done == self.total:
+                self._finish()
+
+    def _finish(self):
+        self.finished_at = time.perf_counter()
+        self.finished.set()
+        self.events.put((DONE, None, None))
+
+    def poll(self):
+        """Returns the events queued since the last call without blocking."""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def throughput(self):
+        """Items finished per second so far."""
+        elapsed = self.elapsed()
+        return self.done / elapsed if elapsed else 0.0
+
+    def wait(self, timeout=None):
+        return self.finished.wait(timeout)
@@ -0,0 +1,178 @@
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+
+import lbx
+from labels import FOLDER_TYPES, list_label_files, natural_key
+
+# ------------------------------------------------------------------------
+# Persistent label metadata index
+# ------------------------------------------------------------------------
+# One row per label file. A row is only trusted while the file's mtime and size
+# still match, so unchanged labels are never opened again, even across runs.
+# Files are fingerprinted by content hash: a byte-identical copy of a template
+# that is already indexed (e.g. in another store) reuses its metadata instead of
+# being decoded again.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS labels (
+    path TEXT PRIMARY KEY,
+    folder TEXT NOT NULL,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL,
+    content_hash TEXT NOT NULL,
+    price TEXT,
+    objects TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS labels_folder ON labels (folder);
+CREATE INDEX IF NOT EXISTS labels_hash ON labels (content_hash);
+"""
+
+
+def hash_file(file_path):
+    """Returns the SHA-1 hex digest of a file's contents."""
+    digest = hashlib.sha1()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(1 << 16), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_metadata(file_path):
+    """
+    Returns (price, object_names) for a label. Files the native codec can't
+    parse (e.g. .lbl) get a price of None and no object names.
+    """
+    try:
+        xml = lbx.read_label_xml(file_path)
+    except lbx.LbxError:
+        return None, []
+    return lbx.get_text(xml), lbx.object_names(xml)
+
+
+class LabelEntry:
+    """Indexed metadata of one label file."""
+    __slots__ = ("path", "folder", "mtime_ns", "size", "content_hash", "price", "objects")
+
+    def __init__(self, path, folder, mtime_ns, size, content_hash, price, objects):
+        self.path = path
+        self.folder = folder
+        self.mtime_ns = mtime_ns
+        self.size = size
+        self.content_hash = content_hash
+        self.price = price
+        self.objects = objects
+
+
+def is_fresh(entry):
+    """True if the file of an index entry still has the mtime and size it was indexed with."""
+    try:
+        st = os.stat(entry.path)
+    except OSError:
+        return False
+    return (st.st_mtime_ns, st.st_size) == (entry.mtime_ns, entry.size)
+
+
+class LabelIndex:
+    """
+    SQLite-backed index of label metadata that can be queried by folder.
+    Safe to share between the UI thread and background threads.
+    """
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+        self.decoded = 0      # files whose metadata had to be read
+        self.shared = 0       # files that reused the metadata of an identical template
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def folder_entries(self, folder):
+        """Returns the indexed labels of one folder in natural order."""
+        with self.lock:
+            rows = self.conn.execute(
+                "SELECT path, folder, mtime_ns, size, content_hash, price, objects "
+                "FROM labels WHERE folder = ?", (folder,)).fetchall()
+        entries = [LabelEntry(*row[:6], json.loads(row[6])) for row in rows]
+        entries.sort(key=lambda entry: natural_key(os.path.basename(entry.path)))
+        return entries
+
+    def fresh_entries(self, folder):
+        """Returns the indexed labels of a folder whose file hasn't changed since (same mtime and size)."""
+        return [entry for entry in self.folder_entries(folder) if is_fresh(entry)]
+
+    def fresh_prices(self, folder):
+        """Returns {path: price} for the fresh entries of a folder that have a price."""
+        return {entry.path: entry.price for entry in self.fresh_entries(folder) if entry.price is not None}
+
+    def metadata_for_hash(self, content_hash):
+        """Returns (price, object_names) of an indexed file with this content, or None."""
+        with self.lock:
+            row = self.conn.execute("SELECT price, objects FROM labels WHERE content_hash = ? LIMIT 1",
+                                    (content_hash,)).fetchone()
+        return (row[0], json.loads(row[1])) if row else None
+
+    def refresh_folder(self, folder):
+        """
+        Brings the index of one folder up to date: new or changed files (by mtime
+        and size) are re-read, removed files are dropped. Returns the number of
+        files that had to be read.
+        """
+        if os.path.isdir(folder):
+            files = {os.path.join(folder, f) for f in list_label_files(folder, sort=False)}
+        else:
+            files = set()
+        with self.lock:
+            known = {path: (mtime_ns, size) for path, mtime_ns, size in self.conn.execute(
+                "SELECT path, mtime_ns, size FROM labels WHERE folder = ?", (folder,))}
+
+        changed = []
+        seen = {}
+        decoded = 0
+        for path in files:
+            try:
+                st = os.stat(path)
+            except OSError:
+                continue
+            if known.get(path) != (st.st_mtime_ns, st.st_size):
+                content_hash = hash_file(path)
+                metadata = seen.get(content_hash) or self.metadata_for_hash(content_hash)
+                if metadata is None:
+                    metadata = read_metadata(path)
+                    decoded += 1
+                seen[content_hash] = metadata
+                price, objects = metadata
+                changed.append((path, folder, st.st_mtime_ns, st.st_size, content_hash,
+                                price, json.dumps(objects)))
+        removed = [(path,) for path in known if path not in files]
+        with self.lock:
+            self.decoded += decoded
+            self.shared += len(changed) - decoded
+
+        if changed or removed:
+            with self.lock, self.conn:
+                self.conn.executemany("INSERT OR REPLACE INTO labels VALUES (?, ?, ?, ?, ?, ?, ?)", changed)
+                self.conn.executemany("DELETE FROM labels WHERE path = ?", removed)
+        return len(changed)
+
+    def refresh_store(self, folder_path):
+        """Refreshes the white, brown and other folders of a store. Returns the number of files read."""
+        return sum(self.refresh_folder(os.path.join(folder_path, folder_type))
+                   for folder_type in FOLDER_TYPES)
+
+    def first_entry(self, folder):
+        """
+        Returns the first label of a folder, re-indexing the folder first if it
+        isn't indexed yet or the first label changed since (e.g. it was edited in
+        P-touch Editor). Returns None rather than an entry that is out of date.
+        """
+        entries = self.folder_entries(folder)
+        if not entries or not is_fresh(entries[0]):
+            self.refresh_folder(folder)
+            entries = self.folder_entries(folder)
+        return entries[0] if entries and is_fresh(entries[0]) else None
@@ -0,0 +1,161 @@
+import os
+import re
+
+# ------------------------------------------------------------------------
+# Label data model
+# ------------------------------------------------------------------------
+LABEL_EXTENSIONS = (".lbx", ".lbl")
+FOLDER_TYPES = ("white", "brown", "other")
+
+
+def natural_key(text):
+    """
+    Splits the string into alpha and numeric parts so that sorting is done in natural order.
+    """
+    return [int(part) if part.isdigit() else part.lower() for part in re.split(r'(\d+)', text)]
+
+
+def parse_quantity(text):
+    """Converts the text of a quantity entry to a whole number (0 if it isn't a number)."""
+    try:
+        return int(float(text))
+    except ValueError:
+        return 0
+
+
+def list_label_files(path, sort=True):
+    """Returns the label file names in a folder, in natural order unless sort is False."""
+    files = [f for f in os.listdir(path) if f.lower().endswith(LABEL_EXTENSIONS)]
+    if sort:
+        files.sort(key=natural_key)
+    return files
+
+
+class LabelRow:
+    """One label file of a tab together with the quantity typed for it."""
+    __slots__ = ("folder_path", "folder_type", "subfolder", "filename", "index", "text", "quantity", "entry")
+
+    def __init__(self, folder_path, folder_type, subfolder, filename, index):
+        self.folder_path = folder_path
+        self.folder_type = folder_type
+        self.subfolder = subfolder
+        self.filename = filename
+        self.index = index
+        self.text = ""
+        self.quantity = 0
+        self.entry = None
+
+    @property
+    def path(self):
+        return os.path.join(self.subfolder, self.filename)
+
+    @property
+    def name(self):
+        return os.path.splitext(self.filename)[0]
+
+
+class FolderModel:
+    """
+    All label rows of one store folder, grouped by folder type, plus a running
+    total of the quantities that is kept up to date by set_text(). version is
+    bumped whenever rows are added or removed (add_row() or sync_files()).
+    """
+    __slots__ = ("folder_path", "rows", "by_key", "missing", "total", "version")
+
+    def __init__(self, folder_path):
+        self.folder_path = folder_path
+        self.rows = {folder_type: [] for folder_type in FOLDER_TYPES}
+        self.by_key = {}
+        self.missing = set()
+        self.total = 0
+        self.version = 0
+
+    def add_row(self, folder_type, filename):
+        subfolder = os.path.join(self.folder_path, folder_type)
+        row = LabelRow(self.folder_path, folder_type, subfolder, filename, len(self.rows[folder_type]))
+        self.rows[folder_type].append(row)
+        self.by_key[(folder_type, filename)] = row
+        self.version += 1
+        return row
+
+    def sync_files(self, folder_type, filenames):
+        """
+        Brings the rows of one folder type in line with a new listing (None if the
+        folder is gone). Rows that are still there keep their quantities; new white
+        and brown rows are inserted in natural order, new "other" rows are appended.
+        Returns (added, removed) file names.
+        """
+        rows = self.rows[folder_type]
+        if filenames is None:
+            self.missing.add(folder_type)
+            filenames = []
+        else:
+            self.missing.discard(folder_type)
+        wanted = set(filenames)
+        removed = [row for row in rows if row.filename not in wanted]
+        known = {row.filename for row in rows}
+        added = [filename for filename in filenames if filename not in known]
+        if not added and not removed:
+            return [], []
+
+        for row in removed:
+            self.total -= row.quantity
+            del self.by_key[(folder_type, row.filename)]
+        rows = [row for row in rows if row.filename in wanted]
+        subfolder = os.path.join(self.folder_path, folder_type)
+        for filename in added:
+            row = LabelRow(self.folder_path, folder_type, subfolder, filename, 0)
+            self.by_key[(folder_type, filename)] = row
+            rows.append(row)
+        if folder_type != "other":
+            rows.sort(key=lambda row: natural_key(row.filename))
+        for index, row in enumerate(rows):
+            row.index = index
+        self.rows[folder_type] = rows
+        self.version += 1
+        return added, [row.filename for row in removed]
+
+    def get(self, folder_type, filename):
+        return self.by_key.get((folder_type, filename))
+
+    def iter_rows(self, folder_types=FOLDER_TYPES):
+        for folder_type in folder_types:
+            yield from self.rows[folder_type]
+
+    def set_text(self, row, text):
+        """Stores the entry text of a row and adjusts the total by the change in its quantity."""
+        quantity = parse_quantity(text)
+        self.total += quantity - row.quantity
+        row.text = text
+        row.quantity = quantity
+        return self.total
+
+
+def listed_folder(folder_path, labels, missing=()):
+    """
+    Returns the FolderModel of a store folder from a listing of labels as
+    "<folder_type>/<file name>" in tab order, e.g. one sent by the print server.
+    """
+    model = FolderModel(folder_path)
+    model.missing.update(missing)
+    for label in labels:
+        folder_type, _, filename = label.partition("/")
+        if folder_type in FOLDER_TYPES and filename:
+            model.add_row(folder_type, filename)
+    return model
+
+
+def scan_folder(folder_path):
+    """
+    Lists the white, brown and other subfolders of a store folder and returns
+    its FolderModel. White and brown labels are sorted in natural order.
+    """
+    model = FolderModel(folder_path)
+    for folder_type in FOLDER_TYPES:
+        subfolder = os.path.join(folder_path, folder_type)
+        if not os.path.isdir(subfolder):
+            model.missing.add(folder_type)
+            continue
+        for filename in list_label_files(subfolder, sort=folder_type != "other"):
+            model.add_row(folder_type, filename)
+    return model
@@ -0,0 +1,121 @@
+import io
+import os
+import re
+import zipfile
+from xml.sax.saxutils import escape, unescape
+
+from atomicfile import write_file_atomic
+
+# ------------------------------------------------------------------------
+# Native .lbx codec
+# ------------------------------------------------------------------------
+# An .lbx file is a zip archive whose label.xml holds the label objects. Text
+# objects look like:
+#   <text:text><pt:objectStyle ...><pt:expanded objectName="Price" .../></pt:objectStyle>
+#     ...<pt:data>£2.50</pt:data><text:stringItem charLen="5">...</text:stringItem></text:text>
+# Only the text of those objects is read or rewritten; everything else in the
+# archive is copied through byte for byte. Bulk repricing calls write_price from
+# jobs.Job worker threads (see reprice.py) rather than a process pool: a file
+# the codec can't rewrite falls back to b-PAC on the same thread, which a worker
+# process without a COM apartment couldn't do, and each write is mostly zip I/O.
+LABEL_XML = "label.xml"
+
+_TEXT_OBJECT_RE = re.compile(r"<text:text>.*?</text:text>", re.S)
+_OBJECT_NAME_RE = re.compile(r'objectName="([^"]*)"')
+_DATA_RE = re.compile(r"<pt:data>(.*?)</pt:data>", re.S)
+_STRING_ITEM_RE = re.compile(r'<text:stringItem charLen="\d+">.*?</text:stringItem>', re.S)
+_CHAR_LEN_RE = re.compile(r'charLen="\d+"')
+
+
+class LbxError(Exception):
+    """Raised when a file is not an .lbx archive this codec can read or rewrite."""
+
+
+def read_label_xml(file_path):
+    """Returns the decoded label.xml of an .lbx file."""
+    try:
+        with zipfile.ZipFile(file_path) as archive:
+            return archive.read(LABEL_XML).decode("utf-8")
+    except (OSError, zipfile.BadZipFile, KeyError, UnicodeDecodeError) as e:
+        raise LbxError(f"{file_path}: {e}") from e
+
+
+def _text_objects(xml):
+    """Yields (name, match) for every text object in label.xml."""
+    for match in _TEXT_OBJECT_RE.finditer(xml):
+        name = _OBJECT_NAME_RE.search(match.group(0))
+        if name:
+            yield unescape(name.group(1), {"&quot;": '"'}), match
+
+
+def object_names(xml):
+    """Returns the names of all objects in label.xml, text or not."""
+    return [unescape(name, {"&quot;": '"'}) for name in _OBJECT_NAME_RE.findall(xml)]
+
+
+def get_text(xml, object_name="Price"):
+    """Returns the text of the named text object, or None if the label has no such object."""
+    for name, match in _text_objects(xml):
+        if name == object_name:
+            data = _DATA_RE.search(match.group(0))
+            return unescape(data.group(1)) if data else ""
+    return None
+
+
+def set_text(xml, new_text, object_name="Price"):
+    """
+    Returns label.xml with the text of the named text object replaced, or None
+    if there is no such object. The object keeps the formatting of its first
+    string item, which is resized to the new text.
+    """
+    for name, match in _text_objects(xml):
+        if name != object_name:
+            continue
+        block = match.group(0)
+        block = _DATA_RE.sub(lambda m: f"<pt:data>{escape(new_text)}</pt:data>", block, count=1)
+        items = _STRING_ITEM_RE.findall(block)
+        if items:
+            first = _CHAR_LEN_RE.sub(f'charLen="{len(new_text)}"', items[0], count=1)
+            start = block.index(items[0])
+            end = block.index(items[-1]) + len(items[-1])
+            block = block[:start] + first + block[end:]
+        return xml[:match.start()] + block + xml[match.end():]
+    return None
+
+
+def read_price(file_path):
+    """Reads the 'Price' text of an .lbx file without going through b-PAC."""
+    return get_text(read_label_xml(file_path))
+
+
+def build_label_archive(file_path, xml):
+    """Returns the bytes of the .lbx file with its label.xml replaced by xml."""
+    buffer = io.BytesIO()
+    with zipfile.ZipFile(file_path) as source, zipfile.ZipFile(buffer, "w") as target:
+        for info in source.infolist():
+            data = xml.encode("utf-8") if info.filename == LABEL_XML else source.read(info)
+            target.writestr(info, data)
+    return buffer.getvalue()
+
+
+def write_label_xml(file_path, xml):
+    """Rewrites label.xml inside an .lbx file, atomically."""
+    write_file_atomic(file_path, build_label_archive(file_path, xml))
+
+
+def write_price(file_path, new_price):
+    """
+    Sets the 'Price' text of an .lbx file. Returns False if the label has no
+    'Price' text object; raises LbxError if the file can't be parsed.
+    """
+    if not file_path.lower().endswith(".lbx"):
+        raise LbxError(f"{file_path}: not an .lbx file")
+    xml = set_text(read_label_xml(file_path), new_price)
+    if xml is None:
+        return False
+    try:
+        write_label_xml(file_path, xml)
+    except zipfile.BadZipFile as e:
+        raise LbxError(f"{file_path}: {e}") from e
+    return True
+
@@ -0,0 +1,160 @@
+import os
+import queue
+import tempfile
+import threading
+from collections import OrderedDict
+
+import render
+from atomicfile import write_file_atomic
+from backends import EXPORT_BMP
+from diagnostics import timed
+from label_index import hash_file
+
+# ------------------------------------------------------------------------
+# Label previews
+# ------------------------------------------------------------------------
+# A preview is the label exported through the print backend (b-PAC writes a
+# bitmap, which is converted to PNG for Tk). Thumbnails are stored by content
+# hash, so byte-identical templates in different stores share one, in a
+# size-bounded in-memory LRU on top of a directory of PNG files. The hash of a
+# file is remembered with its mtime and size, so an unchanged label is never
+# hashed twice and a repriced one is rendered again.
+
+
+class ThumbnailCache:
+    """PNG thumbnails keyed by content hash, in memory (up to max_bytes) and in cache_dir."""
+
+    def __init__(self, cache_dir, max_bytes=16 * 1024 * 1024):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.size = 0
+        self.hits = 0
+        self.misses = 0
+        self._memory = OrderedDict()    # content hash -> PNG bytes, least recently used first
+        self._hashes = {}               # path -> (mtime_ns, size, content hash)
+        self._lock = threading.Lock()
+
+    def content_hash(self, path):
+        """Returns the content hash of a label, hashing it only if it changed since the last call."""
+        st = os.stat(path)
+        with self._lock:
+            known = self._hashes.get(path)
+        if known and known[:2] == (st.st_mtime_ns, st.st_size):
+            return known[2]
+        content_hash = hash_file(path)
+        with self._lock:
+            self._hashes[path] = (st.st_mtime_ns, st.st_size, content_hash)
+        return content_hash
+
+    def peek(self, path):
+        """
+        Returns the thumbnail last seen for a path if it is still in memory,
+        without touching the file system (it may be out of date), or None.
+        """
+        with self._lock:
+            known = self._hashes.get(path)
+            return self._memory.get(known[2]) if known else None
+
+    def get(self, content_hash):
+        """Returns the thumbnail of a content hash from memory or disk, or None."""
+        with self._lock:
+            png = self._memory.get(content_hash)
+            if png is not None:
+                self._memory.move_to_end(content_hash)
+                self.hits += 1
+                return png
+        try:
+            with open(self._disk_path(content_hash), "rb") as f:
+                png = f.read()
+        except OSError:
+            with self._lock:
+                self.misses += 1
+            return None
+        self._remember(content_hash, png)
+        with self._lock:
+            self.hits += 1
+        return png
+
+    def put(self, content_hash, png):
+        """Stores a thumbnail in memory and on disk."""
+        os.makedirs(self.cache_dir, exist_ok=True)
+        write_file_atomic(self._disk_path(content_hash), png)
+        self._remember(content_hash, png)
+
+    def _disk_path(self, content_hash):
+        return os.path.join(self.cache_dir, f"{content_hash}.png")
+
+    def _remember(self, content_hash, png):
+        with self._lock:
+            previous = self._memory.pop(content_hash, None)
+            if previous is not None:
+                self.size -= len(previous)
+            self._memory[content_hash] = png
+            self.size += len(png)
+            while self.size > self.max_bytes and len(self._memory) > 1:
+                _, evicted = self._memory.popitem(last=False)
+                self.size -= len(evicted)
+
+
+def export_png(backend, label_path, dpi=96):
+    """Renders a label through the backend's Export and returns it as PNG bytes."""
+    fd, temp_path = tempfile.mkstemp(prefix="preview-", suffix=".bmp")
+    os.close(fd)
+    try:
+        with backend.session() as document:
+            if not document.Open(label_path):
+                raise RuntimeError("Failed to open")
+            if not document.Export(EXPORT_BMP, temp_path, dpi):
+                raise RuntimeError("Failed to export")
+        with open(temp_path, "rb") as f:
+            data = f.read()
+    finally:
+        os.remove(temp_path)
+    return data if data.startswith(render.PNG_SIGNATURE) else render.bmp_to_png(data)
+
+
+class PreviewRenderer:
+    """
+    Loads or renders previews on one background thread and puts (path, png,
+    error) on results. Only the latest request is served: requests made while
+    a render runs replace each other, so holding an arrow key down doesn't
+    queue up one render per row.
+    """
+
+    def __init__(self, backend, cache, dpi=96, initializer=None):
+        self.backend = backend
+        self.cache = cache
+        self.dpi = dpi
+        self.initializer = initializer
+        self.results = queue.Queue()
+        self._pending = None
+        self._wakeup = threading.Condition()
+        threading.Thread(target=self._worker, name="Preview", daemon=True).start()
+
+    def request(self, path):
+        with self._wakeup:
+            self._pending = path
+            self._wakeup.notify()
+
+    def load(self, path):
+        """Returns the PNG preview of a label, rendering it only if no cache has it."""
+        content_hash = self.cache.content_hash(path)
+        png = self.cache.get(content_hash)
+        if png is None:
+            with timed("preview.render", file=path):
+                png = export_png(self.backend, path, self.dpi)
+            self.cache.put(content_hash, png)
+        return png
+
+    def _worker(self):
+        if self.initializer:
+            self.initializer()
+        while True:
+            with self._wakeup:
+                while self._pending is None:
+                    self._wakeup.wait()
+                path, self._pending = self._pending, None
+            try:
+                self.results.put((path, self.load(path), None))
+            except Exception as e:
+                self.results.put((path, None, e))
@@ -0,0 +1,206 @@
+import os
+import struct
+import zlib
+
+import lbx
+
+# ------------------------------------------------------------------------
+# Label rendering to PNG / PDF
+# ------------------------------------------------------------------------
+# Used by the print-to-file backend. A label is rendered as the text of each of
+# its text objects, which is enough to check what a run would print without a
+# printer or the b-PAC runtime. Nothing here needs more than the standard library.
+
+# 5x7 bitmap font: 7 rows per glyph, 5 bits per row (MSB = leftmost pixel).
+# Lower-case letters are drawn with the upper-case glyphs.
+FONT = {
+    " ": (0, 0, 0, 0, 0, 0, 0),
+    "0": (0x0E, 0x11, 0x13, 0x15, 0x19, 0x11, 0x0E),
+    "1": (0x04, 0x0C, 0x04, 0x04, 0x04, 0x04, 0x0E),
+    "2": (0x0E, 0x11, 0x01, 0x02, 0x04, 0x08, 0x1F),
+    "3": (0x1F, 0x02, 0x04, 0x02, 0x01, 0x11, 0x0E),
+    "4": (0x02, 0x06, 0x0A, 0x12, 0x1F, 0x02, 0x02),
+    "5": (0x1F, 0x10, 0x1E, 0x01, 0x01, 0x11, 0x0E),
+    "6": (0x06, 0x08, 0x10, 0x1E, 0x11, 0x11, 0x0E),
+    "7": (0x1F, 0x01, 0x02, 0x04, 0x08, 0x08, 0x08),
+    "8": (0x0E, 0x11, 0x11, 0x0E, 0x11, 0x11, 0x0E),
+    "9": (0x0E, 0x11, 0x11, 0x0F, 0x01, 0x02, 0x0C),
+    "A": (0x0E, 0x11, 0x11, 0x11, 0x1F, 0x11, 0x11),
+    "B": (0x1E, 0x11, 0x11, 0x1E, 0x11, 0x11, 0x1E),
+    "C": (0x0E, 0x11, 0x10, 0x10, 0x10, 0x11, 0x0E),
+    "D": (0x1C, 0x12, 0x11, 0x11, 0x11, 0x12, 0x1C),
+    "E": (0x1F, 0x10, 0x10, 0x1E, 0x10, 0x10, 0x1F),
+    "F": (0x1F, 0x10, 0x10, 0x1E, 0x10, 0x10, 0x10),
+    "G": (0x0E, 0x11, 0x10, 0x17, 0x11, 0x11, 0x0F),
+    "H": (0x11, 0x11, 0x11, 0x1F, 0x11, 0x11, 0x11),
+    "I": (0x0E, 0x04, 0x04, 0x04, 0x04, 0x04, 0x0E),
+    "J": (0x07, 0x02, 0x02, 0x02, 0x02, 0x12, 0x0C),
+    "K": (0x11, 0x12, 0x14, 0x18, 0x14, 0x12, 0x11),
+    "L": (0x10, 0x10, 0x10, 0x10, 0x10, 0x10, 0x1F),
+    "M": (0x11, 0x1B, 0x15, 0x15, 0x11, 0x11, 0x11),
+    "N": (0x11, 0x11, 0x19, 0x15, 0x13, 0x11, 0x11),
+    "O": (0x0E, 0x11, 0x11, 0x11, 0x11, 0x11, 0x0E),
+    "P": (0x1E, 0x11, 0x11, 0x1E, 0x10, 0x10, 0x10),
+    "Q": (0x0E, 0x11, 0x11, 0x11, 0x15, 0x12, 0x0D),
+    "R": (0x1E, 0x11, 0x11, 0x1E, 0x14, 0x12, 0x11),
+    "S": (0x0F, 0x10, 0x10, 0x0E, 0x01, 0x01, 0x1E),
+    "T": (0x1F, 0x04, 0x04, 0x04, 0x04, 0x04, 0x04),
+    "U": (0x11, 0x11, 0x11, 0x11, 0x11, 0x11, 0x0E),
+    "V": (0x11, 0x11, 0x11, 0x11, 0x11, 0x0A, 0x04),
+    "W": (0x11, 0x11, 0x11, 0x15, 0x15, 0x15, 0x0A),
+    "X": (0x11, 0x11, 0x0A, 0x04, 0x0A, 0x11, 0x11),
+    "Y": (0x11, 0x11, 0x11, 0x0A, 0x04, 0x04, 0x04),
+    "Z": (0x1F, 0x01, 0x02, 0x04, 0x08, 0x10, 0x1F),
+    ".": (0, 0, 0, 0, 0, 0x0C, 0x0C),
+    ",": (0, 0, 0, 0, 0x0C, 0x04, 0x08),
+    "-": (0, 0, 0, 0x1F, 0, 0, 0),
+    ":": (0, 0x0C, 0x0C, 0, 0x0C, 0x0C, 0),
+    "&": (0x0C, 0x12, 0x14, 0x08, 0x15, 0x12, 0x0D),
+    "'": (0x0C, 0x04, 0x08, 0, 0, 0, 0),
+    "(": (0x02, 0x04, 0x08, 0x08, 0x08, 0x04, 0x02),
+    ")": (0x08, 0x04, 0x02, 0x02, 0x02, 0x04, 0x08),
+    "/": (0, 0x01, 0x02, 0x04, 0x08, 0x10, 0),
+    "£": (0x06, 0x09, 0x08, 0x1C, 0x08, 0x08, 0x1F),
+    "?": (0x0E, 0x11, 0x01, 0x02, 0x04, 0, 0x04),
+}
+GLYPH_WIDTH = 6   # 5 pixels plus 1 column of spacing
+LINE_HEIGHT = 9   # 7 pixels plus 2 rows of spacing
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+
+
+def label_lines(file_path, copies=1):
+    """Returns the lines of text rendered for a label: its text objects, then the copy count."""
+    lines = []
+    try:
+        xml = lbx.read_label_xml(file_path)
+        for name in lbx.object_names(xml):
+            text = lbx.get_text(xml, name)
+            if text is not None:
+                lines.append(f"{name}: {text}")
+    except lbx.LbxError:
+        pass
+    if not lines:
+        lines.append(os.path.splitext(os.path.basename(file_path))[0])
+    if copies != 1:
+        lines.append(f"x{copies}")
+    return lines
+
+
+def render_png(lines, out_path, scale=2, margin=4):
+    """Writes black-on-white text lines to an 8-bit grayscale PNG."""
+    cols = max((len(line) for line in lines), default=1) * GLYPH_WIDTH + 2 * margin
+    rows = len(lines) * LINE_HEIGHT + 2 * margin
+    pixels = [bytearray(b"\xff" * cols) for _ in range(rows)]
+    for line_no, line in enumerate(lines):
+        top = margin + line_no * LINE_HEIGHT
+        for char_no, char in enumerate(line):
+            glyph = FONT.get(char.upper(), FONT["?"])
+            left = margin + char_no * GLYPH_WIDTH
+            for y, bits in enumerate(glyph):
+                for x in range(5):
+                    if bits & (0x10 >> x):
+                        pixels[top + y][left + x] = 0
+
+    scaled = []
+    for row in pixels:
+        scaled_row = bytes(value for value in row for _ in range(scale))
+        scaled.extend([scaled_row] * scale)
+    with open(out_path, "wb") as f:
+        f.write(encode_png(scaled, cols * scale))
+
+
+def encode_png(rows, width):
+    """Returns an 8-bit grayscale PNG of rows (one bytes object of width pixels per row)."""
+    raw = bytearray()
+    for row in rows:
+        raw += b"\x00" + row  # filter type 0 per scanline
+
+    def chunk(kind, data):
+        return struct.pack(">I", len(data)) + kind + data + struct.pack(">I", zlib.crc32(kind + data))
+
+    return (PNG_SIGNATURE
+            + chunk(b"IHDR", struct.pack(">IIBBBBB", width, len(rows), 8, 0, 0, 0, 0))
+            + chunk(b"IDAT", zlib.compress(bytes(raw), 6))
+            + chunk(b"IEND", b""))
+
+
+def bmp_to_png(data):
+    """
+    Converts an uncompressed 1, 4, 8, 24 or 32-bit BMP (what b-PAC's Export
+    writes) to a grayscale PNG, so Tk can show it without an imaging library.
+    """
+    if data[:2] != b"BM":
+        raise ValueError("Not a BMP file")
+    offset, = struct.unpack_from("<I", data, 10)
+    header_size, width, height, _, bits, compression = struct.unpack_from("<IiiHHI", data, 14)
+    if compression not in (0, 3) or bits not in (1, 4, 8, 24, 32):
+        raise ValueError(f"Unsupported BMP ({bits}-bit, compression {compression})")
+    palette = []
+    if bits <= 8:
+        colors, = struct.unpack_from("<I", data, 46)
+        start = 14 + header_size
+        for i in range(colors or 1 << bits):
+            b, g, r = data[start + 4 * i:start + 4 * i + 3]
+            palette.append((r * 299 + g * 587 + b * 114) // 1000)
+    stride = (width * bits + 31) // 32 * 4
+    rows = []
+    for y in range(abs(height)):
+        line = data[offset + y * stride:offset + (y + 1) * stride]
+        if bits <= 8:
+            per_byte = 8 // bits
+            mask = (1 << bits) - 1
+            row = bytes(palette[(line[x // per_byte] >> (8 - bits * (x % per_byte + 1))) & mask]
+                        for x in range(width))
+        else:
+            step = bits // 8
+            row = bytes((line[x * step + 2] * 299 + line[x * step + 1] * 587 + line[x * step] * 114) // 1000
+                        for x in range(width))
+        rows.append(row)
+    if height > 0:
+        rows.reverse()  # bottom-up bitmap
+    return encode_png(rows, width)
+
+
+def _pdf_string(text):
+    data = text.encode("cp1252", "replace")
+    return b"(" + data.replace(b"\\", b"\\\\").replace(b"(", b"\\(").replace(b")", b"\\)") + b")"
+
+
+def render_pdf(lines, out_path, font_size=10):
+    """Writes text lines to a one-page PDF in Helvetica."""
+    width = max(72, max((len(line) for line in lines), default=1) * font_size * 0.6 + 24)
+    height = len(lines) * font_size * 1.4 + 24
+    content = b"BT /F1 %d Tf %d TL 12 %.1f Td\n" % (font_size, font_size * 1.4, height - 12 - font_size)
+    for line in lines:
+        content += _pdf_string(line) + b" '\n"
+    content += b"ET"
+    objects = [
+        b"<< /Type /Catalog /Pages 2 0 R >>",
+        b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+        b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 %.1f %.1f] "
+        b"/Resources << /Font << /F1 4 0 R >> >> /Contents 5 0 R >>" % (width, height),
+        b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica /Encoding /WinAnsiEncoding >>",
+        b"<< /Length %d >>\nstream\n" % len(content) + content + b"\nendstream",
+    ]
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    for offset in offsets:
+        out += b"%010d 00000 n \n" % offset
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    with open(out_path, "wb") as f:
+        f.write(out)
+
+
+def render_label(file_path, out_path, copies=1):
+    """Renders a label to PNG or PDF, chosen by the extension of out_path. Returns out_path."""
+    lines = label_lines(file_path, copies)
+    if out_path.lower().endswith(".pdf"):
+        render_pdf(lines, out_path)
+    else:
+        render_png(lines, out_path)
+    return out_path
@@ -0,0 +1,215 @@
+import glob
+import json
+import os
+import threading
+import time
+
+import lbx
+from atomicfile import write_file_atomic
+from label_index import hash_file
+
+# ------------------------------------------------------------------------
+# Repricing
+# ------------------------------------------------------------------------
+# A reprice run only rewrites labels whose price actually changes. Before a
+# label is rewritten its old price is appended (and fsynced) to a per-store
+# write-ahead journal, so an interrupted run can be resumed, and any run can be
+# rolled back to the prices it replaced.
+def reprice_label(backend, label_path, new_price):
+    """
+    Sets the 'Price' text of one label. .lbx files are rewritten natively;
+    anything the codec can't parse goes through the print backend. Raises on failure.
+    """
+    try:
+        if not lbx.write_price(label_path, new_price):
+            raise ValueError("Invalid Price object")
+        return
+    except lbx.LbxError:
+        pass
+    with backend.session() as bpac:
+        if not bpac.Open(label_path):
+            raise RuntimeError("Failed to open")
+        price_obj = bpac.GetObject("Price")
+        if price_obj is None:
+            raise ValueError("Invalid Price object")
+        price_obj.Text = new_price
+        if not bpac.Save():
+            raise RuntimeError("Failed to save")
+
+
+def read_label_price(backend, label_path):
+    """Returns the 'Price' text of one label (None if it has none), natively where possible."""
+    try:
+        return lbx.read_price(label_path)
+    except lbx.LbxError:
+        pass
+    with backend.session() as bpac:
+        if not bpac.Open(label_path):
+            raise RuntimeError("Failed to open")
+        price_obj = bpac.GetObject("Price")
+        return price_obj.Text if price_obj is not None else None
+
+
+class RepriceJournal:
+    """
+    Append-only JSONL journal of the reprice runs of one store. Each rewritten
+    label gets an "intent" record with its old price before the write and a
+    "done" record after it. The journal stays in place until a run finishes
+    cleanly, so a new run against the same store continues the same journal.
+    """
+
+    def __init__(self, journal_dir, store):
+        self.journal_dir = journal_dir
+        self.store = store
+        self.path = os.path.join(journal_dir, f"{store}.jsonl")
+        self.lock = threading.Lock()
+
+    def unfinished(self):
+        """Returns the price of the interrupted run of this store, or None if there is none."""
+        price = None
+        for record in read_journal(self.path):
+            if record["event"] == "begin":
+                price = record["price"]
+        return price
+
+    def _append(self, record, sync=False):
+        record["t"] = time.time()
+        with self.lock:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                if sync:
+                    os.fsync(f.fileno())
+
+    def begin(self, new_price):
+        self._append({"event": "begin", "store": self.store, "price": new_price}, sync=True)
+
+    def intent(self, label_path, old_price, new_price):
+        self._append({"event": "intent", "path": label_path, "old": old_price, "new": new_price}, sync=True)
+
+    def done(self, label_path):
+        self._append({"event": "done", "path": label_path})
+
+    def finish(self, **summary):
+        """
+        Closes the journal of a completed run. It is kept for undo as
+        <store>-<time>.done.jsonl, unless the run didn't change any label.
+        """
+        if not journal_old_prices(self.path):
+            if os.path.exists(self.path):
+                os.remove(self.path)
+            return
+        self._append({"event": "finish", **summary}, sync=True)
+        os.replace(self.path, os.path.join(self.journal_dir, f"{self.store}-{time.time_ns() // 1000000}.done.jsonl"))
+
+
+def read_journal(journal_path):
+    """Yields the records of a journal, stopping at a torn last line."""
+    if not os.path.exists(journal_path):
+        return
+    with open(journal_path, encoding="utf-8") as f:
+        for line in f:
+            try:
+                yield json.loads(line)
+            except ValueError:
+                return
+
+
+def latest_journal(journal_dir, store):
+    """Returns the journal to roll back for a store: the unfinished one, else the newest finished one."""
+    unfinished = os.path.join(journal_dir, f"{store}.jsonl")
+    if os.path.exists(unfinished):
+        return unfinished
+    pattern = os.path.join(glob.escape(journal_dir), f"{glob.escape(store)}-*.done.jsonl")
+    finished = [path for path in glob.glob(pattern)
+                if os.path.basename(path)[len(store) + 1:-len(".done.jsonl")].isdigit()]
+    return max(finished, key=os.path.getmtime, default=None)
+
+
+def journal_old_prices(journal_path):
+    """Returns [(label_path, old_price)] for every label the journal rewrote, with the earliest old price."""
+    old_prices = {}
+    for record in read_journal(journal_path):
+        if record["event"] == "intent" and record["path"] not in old_prices:
+            old_prices[record["path"]] = record["old"]
+    return list(old_prices.items())
+
+
+def close_rolled_back(journal_path):
+    """Marks a journal as rolled back so it is neither resumed nor undone again."""
+    base = journal_path[:-len(".jsonl")]
+    if base.endswith(".done"):
+        base = base[:-len(".done")]
+    os.replace(journal_path, f"{base}-{time.time_ns() // 1000000}.undone.jsonl")
+
+
+def reprice_if_changed(backend, journal, label_path, new_price, known_prices=None):
+    """
+    Rewrites one label if its price differs from new_price, journaling the old
+    price first. known_prices maps paths to prices that are known to be current
+    (e.g. from the label index); other labels are read. Returns True if the
+    label was rewritten, False if it already had the new price.
+    """
+    if known_prices and label_path in known_prices:
+        old_price = known_prices[label_path]
+    else:
+        old_price = read_label_price(backend, label_path)
+    if old_price == new_price:
+        return False
+    if old_price is None:
+        raise ValueError("Invalid Price object")
+    journal.intent(label_path, old_price, new_price)
+    reprice_label(backend, label_path, new_price)
+    journal.done(label_path)
+    return True
+
+
+def restore_label(backend, label_path, old_price):
+    """Puts back the price a journal recorded for a label."""
+    if read_label_price(backend, label_path) != old_price:
+        reprice_label(backend, label_path, old_price)
+
+
+# ------------------------------------------------------------------------
+# Cross-store repricing of shared templates
+# ------------------------------------------------------------------------
+def group_by_content(label_paths, hashes=None):
+    """
+    Groups label files by content hash. hashes maps paths to hashes that are
+    known to be current (e.g. from the label index); other files are hashed.
+    Returns a list of path tuples, one per distinct template.
+    """
+    groups = {}
+    for label_path in label_paths:
+        content_hash = (hashes or {}).get(label_path) or hash_file(label_path)
+        groups.setdefault(content_hash, []).append(label_path)
+    return [tuple(paths) for paths in groups.values()]
+
+
+def reprice_copies(backend, journal_for, paths, new_price):
+    """
+    Reprices byte-identical copies of one template: the first copy is decoded
+    and re-encoded once, and the resulting file is written to every copy, each
+    journaled in its own store's journal (journal_for(path)). Templates the
+    native codec can't handle are repriced one by one. Returns {path: written}.
+    """
+    try:
+        if not paths[0].lower().endswith(".lbx"):
+            raise lbx.LbxError(f"{paths[0]}: not an .lbx file")
+        xml = lbx.read_label_xml(paths[0])
+    except lbx.LbxError:
+        return {path: reprice_if_changed(backend, journal_for(path), path, new_price) for path in paths}
+    old_price = lbx.get_text(xml)
+    if old_price == new_price:
+        return dict.fromkeys(paths, False)
+    new_xml = lbx.set_text(xml, new_price)
+    if old_price is None or new_xml is None:
+        raise ValueError("Invalid Price object")
+    data = lbx.build_label_archive(paths[0], new_xml)
+    for path in paths:
+        journal = journal_for(path)
+        journal.intent(path, old_price, new_price)
+        write_file_atomic(path, data)
+        journal.done(path)
+    return dict.fromkeys(paths, True)
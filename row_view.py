@@ -0,0 +1,189 @@
+import tkinter as tk
+from tkinter import ttk
+
+# ------------------------------------------------------------------------
+# Virtualized label grid
+# ------------------------------------------------------------------------
+COLUMNS = ("white", "brown", "other")
+NAV_COLUMNS = ("white", "brown")  # columns reachable with the arrow keys
+
+
+class _RowSlot:
+    """The widgets of one visible row; rebound to a different model row as the grid scrolls."""
+    __slots__ = ("frame", "window", "white_label", "other_label", "entries", "rows")
+
+
+class LabelGridView:
+    """
+    Scrollable white / brown / panini grid for one FolderModel. Only enough row
+    widgets to fill the visible canvas are created, and they are recycled for
+    other rows as the canvas scrolls, so the cost of scrolling and resizing does
+    not depend on the number of labels.
+    """
+
+    def __init__(self, parent, model, row_by_entry, on_edit, on_navigate, on_focus=None):
+        self.model = model
+        self.row_by_entry = row_by_entry
+        self.on_edit = on_edit
+        self.on_navigate = on_navigate
+        self.on_focus = on_focus
+        self.slots = []
+        self.row_height = 0
+        self.scrollregion = None
+
+        self.header = tk.Frame(parent)
+        headers = {"white": "W", "brown": "B", "other": "Panini's"}
+        for folder_type in COLUMNS:
+            if folder_type in model.missing:
+                headers[folder_type] = f"No '{folder_type}' folder"
+        tk.Label(self.header, text=headers["white"], font=("Calibri", 10, "bold"),
+                 width=25, anchor="e").grid(row=0, column=0, columnspan=2, sticky="e")
+        tk.Label(self.header, text=headers["brown"], font=("Calibri", 10, "bold"),
+                 anchor="w").grid(row=0, column=2, sticky="w", padx=2)
+        tk.Label(self.header, text=headers["other"], font=("Calibri", 10, "bold"),
+                 anchor="w").grid(row=0, column=3, columnspan=2, sticky="w", padx=(30, 0))
+
+        self.canvas = tk.Canvas(parent, bd=0, highlightthickness=0, relief='flat')
+        self.scrollbar = ttk.Scrollbar(parent, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self._on_yscroll)
+        self.canvas.bind("<Configure>", self._on_configure)
+
+    # --------------------------------------------------------------------
+    # Slots
+    # --------------------------------------------------------------------
+    def _add_slot(self):
+        slot = _RowSlot()
+        slot.frame = tk.Frame(self.canvas)
+        slot.white_label = tk.Label(slot.frame, width=25, anchor="w")
+        slot.white_label.grid(row=0, column=0)
+        slot.entries = {}
+        for column, folder_type in ((1, "white"), (2, "brown"), (4, "other")):
+            entry = ttk.Entry(slot.frame, width=3)
+            entry.grid(row=0, column=column, padx=2 if folder_type == "brown" else 0)
+            entry.bind("<KeyRelease>", self.on_edit)
+            if self.on_focus:
+                entry.bind("<FocusIn>", self.on_focus)
+            if folder_type in NAV_COLUMNS:
+                for key in ("<Up>", "<Down>", "<Left>", "<Right>"):
+                    entry.bind(key, self.on_navigate)
+            slot.entries[folder_type] = entry
+        slot.other_label = tk.Label(slot.frame, width=15, anchor="w")
+        slot.other_label.grid(row=0, column=3, padx=(30, 0))
+        tk.Frame(slot.frame, bg="grey", height=1).grid(row=1, column=0, columnspan=5, sticky="ew")
+        slot.rows = dict.fromkeys(COLUMNS)
+        slot.window = self.canvas.create_window((0, 0), window=slot.frame, anchor="nw")
+        self.slots.append(slot)
+        if not self.row_height:
+            slot.frame.update_idletasks()
+            self.row_height = max(slot.frame.winfo_reqheight(), 1)
+            self.canvas.configure(yscrollincrement=self.row_height)
+        return slot
+
+    def _bind_slot(self, slot, index, reload=False):
+        """
+        Points the widgets of a slot at the model rows with the given index (None hides it).
+        Entries that already show the right row keep their text unless reload is True.
+        """
+        for folder_type in COLUMNS:
+            rows = self.model.rows[folder_type]
+            row = rows[index] if index is not None and index < len(rows) else None
+            previous = slot.rows[folder_type]
+            entry = slot.entries[folder_type]
+            if previous is row:
+                if reload and row is not None:
+                    entry.delete(0, tk.END)
+                    entry.insert(0, row.text)
+                continue
+            if previous is not None and previous.entry is entry:
+                previous.entry = None
+                if entry.focus_get() is entry:
+                    self.canvas.focus_set()
+            slot.rows[folder_type] = row
+            if row is None:
+                self.row_by_entry.pop(entry, None)
+                entry.grid_remove()
+            else:
+                entry.delete(0, tk.END)
+                entry.insert(0, row.text)
+                entry.grid()
+                row.entry = entry
+                self.row_by_entry[entry] = row
+        white = slot.rows["white"]
+        other = slot.rows["other"]
+        slot.white_label.config(text=white.name if white else "")
+        slot.other_label.config(text=other.name if other else "")
+
+    # --------------------------------------------------------------------
+    # Rendering
+    # --------------------------------------------------------------------
+    def row_count(self):
+        return max(len(rows) for rows in self.model.rows.values())
+
+    def _on_yscroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.render()
+
+    def _on_configure(self, event):
+        self._update_scrollregion()
+        self.render()
+
+    def _update_scrollregion(self):
+        if not self.slots:
+            self._add_slot()
+        scrollregion = (0, 0, self.canvas.winfo_width(), self.row_count() * self.row_height)
+        if scrollregion != self.scrollregion:
+            self.scrollregion = scrollregion
+            self.canvas.configure(scrollregion=scrollregion)
+
+    def render(self, reload=False):
+        """Binds the slots to the rows that are currently inside the visible part of the canvas."""
+        if not self.slots:
+            self._add_slot()
+        count = self.row_count()
+        first = max(0, int(self.canvas.canvasy(0) // self.row_height))
+        needed = max(0, min(count - first, self.canvas.winfo_height() // self.row_height + 2))
+        while len(self.slots) < needed:
+            self._add_slot()
+        for i, slot in enumerate(self.slots):
+            if i < needed:
+                self._bind_slot(slot, first + i, reload)
+                self.canvas.coords(slot.window, 0, (first + i) * self.row_height)
+                self.canvas.itemconfigure(slot.window, state="normal")
+            else:
+                self._bind_slot(slot, None)
+                self.canvas.itemconfigure(slot.window, state="hidden")
+
+    def refresh(self):
+        """Reloads every visible row from the model, e.g. after rows or quantities changed."""
+        self._update_scrollregion()
+        self.render(reload=True)
+
+    # --------------------------------------------------------------------
+    # Navigation
+    # --------------------------------------------------------------------
+    def scroll_to(self, index):
+        """Scrolls the canvas just enough for the row with the given index to be visible."""
+        total = self.row_count() * self.row_height
+        if not total:
+            return
+        top = self.canvas.canvasy(0)
+        bottom = top + self.canvas.winfo_height()
+        y = index * self.row_height
+        if y < top:
+            self.canvas.yview_moveto(y / total)
+        elif y + self.row_height > bottom:
+            self.canvas.yview_moveto((y + self.row_height - self.canvas.winfo_height()) / total)
+        else:
+            return
+        self.render()
+
+    def focus_row(self, folder_type, index):
+        """Scrolls to a row and moves the keyboard focus into its entry. Returns the entry or None."""
+        rows = self.model.rows[folder_type]
+        if not 0 <= index < len(rows):
+            return None
+        self.scroll_to(index)
+        entry = rows[index].entry
+        if entry is not None:
+            entry.focus_set()
+        return entry
@@ -0,0 +1,96 @@
+import csv
+import os
+
+# ------------------------------------------------------------------------
+# Day schedules
+# ------------------------------------------------------------------------
+# <store>_numbers.csv has headers like:
+#     Name,Monday white,Monday brown,Tuesday white,...,Sunday brown
+# <store>_paninis.csv has headers like:
+#     Name,Monday other,Tuesday other,...,Saturday other
+# The CSVs are imported into the schedule store (schedule_store.py) and parsed
+# again only when they change.
+DAYS = ("Monday", "Tuesday", "Wednesday", "Thursday", "Friday", "Saturday", "Sunday")
+
+
+SCHEDULE_SUFFIXES = {"main": "_numbers.csv", "other": "_paninis.csv"}
+
+
+def find_store_schedules(schedule_dir, stores):
+    """
+    Finds the schedule CSVs of each store by name, e.g. Spalding_numbers.csv and
+    Spalding_paninis.csv (case-insensitive). Returns {store: {kind: path}} for
+    the stores that have at least one of them.
+    """
+    try:
+        files = {f.lower(): os.path.join(schedule_dir, f) for f in os.listdir(schedule_dir)}
+    except OSError:
+        return {}
+    found = {}
+    for store in stores:
+        paths = {kind: files[(store + suffix).lower()] for kind, suffix in SCHEDULE_SUFFIXES.items()
+                 if (store + suffix).lower() in files}
+        if paths:
+            found[store] = paths
+    return found
+
+
+class Schedule:
+    """A parsed schedule CSV: the stripped cell values of each named row, by column."""
+    __slots__ = ("path", "mtime_ns", "columns", "rows", "problems")
+
+    def __init__(self, path, mtime_ns, columns, rows, problems):
+        self.path = path
+        self.mtime_ns = mtime_ns
+        self.columns = columns
+        self.rows = rows
+        self.problems = problems
+
+    def value(self, name, column):
+        """Returns the cell for a row name and column, "" if the column is missing, or None if the row is."""
+        row = self.rows.get(name)
+        if row is None:
+            return None
+        index = self.columns.get(column)
+        return row[index] if index is not None and index < len(row) else ""
+
+
+def load_schedule(path):
+    """
+    Parses a schedule CSV. Malformed rows (extra or missing fields, duplicate
+    names, non-numeric quantities) are kept as far as they can be, and listed in
+    Schedule.problems.
+    """
+    mtime_ns = os.stat(path).st_mtime_ns
+    problems = []
+    rows = {}
+    with open(path, newline='', encoding='utf-8') as csvfile:
+        reader = csv.reader(csvfile)
+        header = [h.strip() for h in next(reader, [])]
+        columns = {h: i for i, h in enumerate(header) if h}
+        name_index = columns.get("Name")
+        if name_index is None:
+            problems.append("no 'Name' column")
+            return Schedule(path, mtime_ns, columns, rows, problems)
+        for line_no, fields in enumerate(reader, start=2):
+            fields = [f.strip() for f in fields]
+            if not any(fields):
+                continue
+            if len(fields) > len(header):
+                extra = fields[len(header):]
+                detail = "empty" if not any(extra) else ", ".join(repr(f) for f in extra)
+                problems.append(f"line {line_no}: {len(fields)} fields, header has {len(header)} (extra: {detail})")
+            elif len(fields) < len(header):
+                problems.append(f"line {line_no}: {len(fields)} fields, header has {len(header)}")
+            name = fields[name_index] if name_index < len(fields) else ""
+            if not name:
+                problems.append(f"line {line_no}: no name")
+                continue
+            if name in rows:
+                problems.append(f"line {line_no}: duplicate name {name!r}")
+            bad = [f for i, f in enumerate(fields[:len(header)]) if i != name_index and f and not f.isdigit()]
+            if bad:
+                problems.append(f"line {line_no}: non-numeric quantities {', '.join(repr(f) for f in bad)}")
+            rows[name] = fields
+    return Schedule(path, mtime_ns, columns, rows, problems)
+
@@ -0,0 +1,196 @@
+import json
+import os
+import sqlite3
+import threading
+from datetime import date
+
+from labels import natural_key
+from schedule import DAYS, SCHEDULE_SUFFIXES, find_store_schedules, load_schedule
+
+# ------------------------------------------------------------------------
+# Schedule store
+# ------------------------------------------------------------------------
+# Quantities of every store, product, bread and day, imported from the
+# <store>_numbers.csv / <store>_paninis.csv schedules. Each import is tagged
+# with an ISO week ("2026-W42"), so earlier weeks are kept as history and a
+# day is filled from the newest week of its store. The primary key starts with
+# (store, week, day), so filling a tab is one range lookup no matter how many
+# stores and weeks the store holds. A CSV is only imported again when its mtime
+# or size changes, so the problems found while parsing it are kept with it.
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS quantities (
+    store TEXT NOT NULL,
+    week TEXT NOT NULL,
+    day INTEGER NOT NULL,
+    bread TEXT NOT NULL,
+    product TEXT NOT NULL,
+    quantity TEXT NOT NULL,
+    PRIMARY KEY (store, week, day, bread, product)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS weeks (
+    store TEXT NOT NULL,
+    week TEXT NOT NULL,
+    PRIMARY KEY (store, week)
+) WITHOUT ROWID;
+CREATE TABLE IF NOT EXISTS sources (
+    path TEXT PRIMARY KEY,
+    mtime_ns INTEGER NOT NULL,
+    size INTEGER NOT NULL
+);
+CREATE TABLE IF NOT EXISTS problems (
+    path TEXT PRIMARY KEY,
+    store TEXT NOT NULL,
+    problems TEXT NOT NULL
+);
+"""
+
+# Breads each kind of schedule CSV holds
+KIND_BREADS = {"main": ("white", "brown"), "other": ("other",)}
+
+DAY_QUERY = """
+SELECT bread, product, quantity FROM quantities
+WHERE store = ? AND week = (SELECT MAX(week) FROM weeks WHERE store = ?) AND day = ?
+"""
+
+NEWEST_QUERY = """
+SELECT q.store, q.day, q.bread, q.product, q.quantity FROM quantities q
+JOIN (SELECT store, MAX(week) AS week FROM weeks GROUP BY store) newest
+ON q.store = newest.store AND q.week = newest.week
+"""
+
+
+def current_week(today=None):
+    """Returns the ISO week of a date (default today) as "YYYY-Www"."""
+    year, week, _ = (today or date.today()).isocalendar()
+    return f"{year}-W{week:02d}"
+
+
+def schedule_stores(schedule_dir):
+    """Returns the names of the stores that have a schedule CSV in a folder."""
+    stores = set()
+    try:
+        files = os.listdir(schedule_dir)
+    except OSError:
+        return []
+    for f in files:
+        for suffix in SCHEDULE_SUFFIXES.values():
+            if f.lower().endswith(suffix) and len(f) > len(suffix):
+                stores.add(f[:-len(suffix)])
+    return sorted(stores, key=natural_key)
+
+
+class ScheduleStore:
+    """SQLite-backed schedules of every store, safe to use from several threads."""
+
+    def __init__(self, db_path):
+        self.db_path = db_path
+        self.lock = threading.Lock()
+        self.conn = sqlite3.connect(db_path, check_same_thread=False)
+        self.conn.executescript(SCHEMA)
+
+    def close(self):
+        with self.lock:
+            self.conn.close()
+
+    def stores(self):
+        """Returns the set of stores that have a schedule."""
+        with self.lock:
+            return {store for store, in self.conn.execute("SELECT DISTINCT store FROM weeks")}
+
+    def weeks(self, store):
+        """Returns the weeks imported for a store, oldest first."""
+        with self.lock:
+            return [week for week, in self.conn.execute(
+                "SELECT week FROM weeks WHERE store = ? ORDER BY week", (store,))]
+
+    def import_dir(self, schedule_dir, stores=None, week=None):
+        """
+        Imports the schedule CSVs of the given stores (default: every store with
+        one in schedule_dir) that changed since they were last imported, as week
+        (default: the current week). A store whose CSVs changed is imported whole.
+        Returns the parsed schedules that were imported. Their problems are
+        also stored, see problems().
+        """
+        if stores is None:
+            stores = schedule_stores(schedule_dir)
+        week = week or current_week()
+        with self.lock:
+            known = {path: (mtime_ns, size) for path, mtime_ns, size in self.conn.execute(
+                "SELECT path, mtime_ns, size FROM sources")}
+
+        imported = []
+        rows = []
+        replaced = []
+        sources = []
+        problems = []
+        for store, paths in find_store_schedules(schedule_dir, stores).items():
+            stats = {path: os.stat(path) for path in paths.values()}
+            if all(known.get(path) == (st.st_mtime_ns, st.st_size) for path, st in stats.items()):
+                continue
+            # Both CSVs of a store are imported together, so every week holds all of its breads.
+            for kind, path in paths.items():
+                st = stats[path]
+                schedule = load_schedule(path)
+                breads = KIND_BREADS[kind]
+                for name in schedule.rows:
+                    for day_no, day in enumerate(DAYS):
+                        for bread in breads:
+                            rows.append((store, week, day_no, bread, name, schedule.value(name, f"{day} {bread}")))
+                replaced.extend((store, week, bread) for bread in breads)
+                sources.append((path, st.st_mtime_ns, st.st_size))
+                problems.append((path, store, json.dumps(schedule.problems)))
+                imported.append(schedule)
+
+        if sources:
+            with self.lock, self.conn:
+                self.conn.executemany("DELETE FROM quantities WHERE store = ? AND week = ? AND bread = ?", replaced)
+                self.conn.executemany("INSERT OR REPLACE INTO quantities VALUES (?, ?, ?, ?, ?, ?)", rows)
+                self.conn.executemany("INSERT OR IGNORE INTO weeks VALUES (?, ?)",
+                                      {(store, week) for store, week, _ in replaced})
+                self.conn.executemany("INSERT OR REPLACE INTO sources VALUES (?, ?, ?)", sources)
+                self.conn.executemany("INSERT OR REPLACE INTO problems VALUES (?, ?, ?)", problems)
+        return imported
+
+    def problems(self, stores=None):
+        """
+        Returns {csv path: problems} for the schedule CSVs of the given stores
+        (default: every store) whose last import found malformed rows.
+        """
+        with self.lock:
+            rows = self.conn.execute("SELECT path, store, problems FROM problems ORDER BY path").fetchall()
+        return {path: json.loads(problems) for path, store, problems in rows
+                if problems != "[]" and (stores is None or store in stores)}
+
+    def version(self):
+        """Returns a value that changes whenever an import changes what the store holds."""
+        with self.lock:
+            sources = self.conn.execute("SELECT path, mtime_ns, size FROM sources ORDER BY path").fetchall()
+            weeks = self.conn.execute("SELECT store, MAX(week) FROM weeks GROUP BY store ORDER BY store").fetchall()
+        return tuple(sources), tuple(weeks)
+
+    def newest_quantities(self, stores=None):
+        """
+        Returns (store, day index, bread, product, quantity text) for every row
+        of the newest week of the given stores (default: every store).
+        """
+        with self.lock:
+            rows = self.conn.execute(NEWEST_QUERY).fetchall()
+        return rows if stores is None else [row for row in rows if row[0] in stores]
+
+    def day_quantities(self, store, day):
+        """
+        Returns {(bread, product): quantity text} for a day from the newest week
+        of a store ({} if the store has no schedule).
+        """
+        with self.lock:
+            rows = self.conn.execute(DAY_QUERY, (store, store, DAYS.index(day))).fetchall()
+        return {(bread, product): quantity for bread, product, quantity in rows}
+
+    def day_values(self, model, day):
+        """
+        Returns the quantities for a day aligned to model.iter_rows(), for the
+        store the model's folder is named after: the cell text for rows named in
+        the store's schedule, and None for rows it doesn't mention.
+        """
+        quantities = self.day_quantities(os.path.basename(model.folder_path), day)
+        return [quantities.get((row.folder_type, row.name)) for row in model.iter_rows()]
@@ -0,0 +1,461 @@
+"""
+Print server: lets several tills share one printer host.
+
+    python server.py --port 8765 --backend bpac --printer "Brother QL-820NWB"
+
+The server owns BASE_DIR, the print backend and the spooler. Clients send
+store names and label names relative to the store folder, never local paths:
+
+    POST /print     {"store": "Spalding", "jobs": [{"label": "white/1.Ham.lbx", "copies": 2}],
+                     "printer": "", "client": "till-2"}
+    POST /reprice   {"store": "Spalding", "price": "£2.75", "client": "till-2"}
+    GET  /stores
+    GET  /stores/<store>/labels
+    GET  /requests/<id>
+    GET  /status
+
+Print requests that arrive within BATCH_WINDOW seconds of each other are merged
+per store and printer into one spooler run, so a template ordered by several
+tills is opened once. Reprice requests run one at a time, journaled like the
+GUI's Set Price. /stores and /stores/<store>/labels list the stores and their
+labels with prices, so a GUI pointed at the server needs no access to BASE_DIR.
+PrintServer can also be used in-process (see LocalClient), which is how it runs
+against the fake backend without any network.
+"""
+import argparse
+import json
+import os
+import queue
+import socket
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+import uuid
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import settings
+from jobs import Job, worker_pool
+from label_index import LabelIndex
+from labels import FOLDER_TYPES, natural_key, scan_folder
+from reprice import RepriceJournal, reprice_if_changed
+from spooler import PrintRun, Spooler, plan_jobs
+
+BATCH_WINDOW = 0.5          # seconds to wait for more print requests before dispatching a batch
+MAX_FINISHED_REQUESTS = 1000  # finished requests kept for status queries
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+
+
+class PrintServerError(Exception):
+    """A request the print server rejected, or a server that couldn't be reached."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+class ServerRequest:
+    """One print or reprice request of a client and what has happened to it."""
+    __slots__ = ("id", "kind", "store", "client", "printer", "jobs", "price", "run", "indexes", "job",
+                 "submitted_at", "error")
+
+    def __init__(self, kind, store, client, printer=None, jobs=None, price=None):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.store = store
+        self.client = client
+        self.printer = printer
+        self.jobs = jobs or []      # (path, copies)
+        self.price = price
+        self.run = None             # PrintRun this request was merged into
+        self.indexes = []           # indexes of this request's templates in run.jobs
+        self.job = None             # reprice Job
+        self.submitted_at = time.time()
+        self.error = None
+
+    def status(self):
+        if self.error is not None:
+            return FAILED
+        task = self.run if self.kind == "print" else self.job
+        if task is None:
+            return QUEUED
+        if not task.finished.is_set():
+            return RUNNING if task.started_at is not None else QUEUED
+        if self.kind == "print":
+            own = {path for path, _ in self.jobs}
+            failed = any(path == "" or path in own for path, _ in self.run.errors)
+            return FAILED if failed or self.run.cancelled.is_set() else DONE
+        return FAILED if self.job.errors else DONE
+
+    def to_dict(self):
+        result = {"id": self.id, "kind": self.kind, "store": self.store, "client": self.client,
+                  "status": self.status(), "submitted_at": self.submitted_at}
+        if self.error is not None:
+            result["error"] = self.error
+        if self.kind == "print":
+            result["copies"] = sum(copies for _, copies in self.jobs)
+            if self.run is not None:
+                own = {path for path, _ in self.jobs}
+                printed = {self.run.jobs[i].path for i in self.indexes if i in self.run.printed}
+                result["labels_printed"] = sum(copies for path, copies in self.jobs if path in printed)
+                result["run"] = self.run.id
+                result["errors"] = [[os.path.basename(path), message] for path, message in self.run.errors
+                                    if path == "" or path in own]
+                if self.run.finished.is_set():
+                    result["printers"] = self.run.summary()["printers"]
+        else:
+            result["price"] = self.price
+            if self.job is not None:
+                written = list(self.job.results.values())
+                result.update(labels=self.job.total, done=self.job.done,
+                              changed=sum(1 for w in written if w), skipped=sum(1 for w in written if not w),
+                              errors=[[os.path.basename(str(item)), str(error)] for item, error in self.job.errors])
+        return result
+
+
+class PrintServer:
+    """
+    Accepts print and reprice requests from any thread and runs them against one
+    backend: prints through a Spooler, reprices on a single worker thread.
+    """
+
+    def __init__(self, backend, base_dir, journal_dir, reprice_journal_dir, printers=("",),
+                 batch_window=BATCH_WINDOW, workers=4, cut_mode="cut", printer_profiles=None,
+                 index_file=":memory:"):
+        self.backend = backend
+        self.base_dir = base_dir
+        self.reprice_journal_dir = reprice_journal_dir
+        self.batch_window = batch_window
+        self.workers = workers
+        self.executor = worker_pool(workers, backend.initialize_thread, name="PrintServer job")
+        self.label_index = LabelIndex(index_file)
+        self.spooler = Spooler(backend.session, journal_dir, initializer=backend.initialize_thread,
+                               printers=printers, cut_mode=cut_mode, printer_profiles=printer_profiles)
+        self.lock = threading.Lock()
+        self.requests = {}
+        self._prints = queue.Queue()
+        self._reprices = queue.Queue()
+        threading.Thread(target=self._dispatcher, name="PrintServer", daemon=True).start()
+        threading.Thread(target=self._reprice_worker, name="PrintServer reprice", daemon=True).start()
+
+    # --------------------------------------------------------------------
+    # Requests
+    # --------------------------------------------------------------------
+    def _store_path(self, store):
+        if not isinstance(store, str) or not store or os.path.basename(store) != store or store in (".", ".."):
+            raise PrintServerError(f"Invalid store {store!r}")
+        path = os.path.join(self.base_dir, store)
+        if not os.path.isdir(path):
+            raise PrintServerError(f"No store {store!r}", status=404)
+        return path
+
+    def _label_path(self, store_path, label):
+        folder_type, _, filename = str(label).replace("\\", "/").partition("/")
+        if folder_type not in FOLDER_TYPES or not filename or "/" in filename or filename in (".", ".."):
+            raise PrintServerError(f"Invalid label {label!r}")
+        return os.path.join(store_path, folder_type, filename)
+
+    def _add(self, request):
+        with self.lock:
+            self.requests[request.id] = request
+            finished = [r for r in self.requests.values() if r.status() in (DONE, FAILED)]
+            for old in sorted(finished, key=lambda r: r.submitted_at)[:-MAX_FINISHED_REQUESTS]:
+                del self.requests[old.id]
+        return request
+
+    def submit_print(self, store, jobs, printer=None, client=None):
+        """Queues a print plan of [{"label": "<folder_type>/<file>", "copies": n}]. Returns its status."""
+        store_path = self._store_path(store)
+        if printer and printer not in self.spooler.printers:
+            raise PrintServerError(f"Unknown printer {printer!r}")
+        try:
+            plan = [(self._label_path(store_path, job["label"]), int(job["copies"])) for job in jobs]
+        except (KeyError, TypeError, ValueError) as e:
+            raise PrintServerError(f"Invalid job list: {e}")
+        plan = [(path, copies) for path, copies in plan if copies > 0]
+        if not plan:
+            raise PrintServerError("Nothing to print")
+        request = self._add(ServerRequest("print", store, client, printer=printer or None, jobs=plan))
+        self._prints.put(request)
+        return request.to_dict()
+
+    def submit_reprice(self, store, price, client=None):
+        """Queues setting the price of a store's white and brown labels. Returns its status."""
+        self._store_path(store)
+        price = str(price or "").strip()
+        if not price:
+            raise PrintServerError("No price")
+        if not price.startswith("£"):
+            price = f"£{price}"
+        request = self._add(ServerRequest("reprice", store, client, price=price))
+        self._reprices.put(request)
+        return request.to_dict()
+
+    def stores(self):
+        """Returns the names of the store folders in base_dir."""
+        try:
+            names = [f for f in os.listdir(self.base_dir) if os.path.isdir(os.path.join(self.base_dir, f))]
+        except OSError as e:
+            raise PrintServerError(f"Cannot list the stores: {e}", status=500)
+        return {"stores": sorted(names, key=natural_key)}
+
+    def store_labels(self, store):
+        """
+        Returns the labels of a store in tab order as "<folder_type>/<file>" with
+        their prices (None where the native codec can't read one), and the price
+        of the store: that of its first white label.
+        """
+        store_path = self._store_path(store)
+        model = scan_folder(store_path)
+        self.label_index.refresh_store(store_path)
+        prices = {}
+        for folder_type in FOLDER_TYPES:
+            prices.update(self.label_index.fresh_prices(os.path.join(store_path, folder_type)))
+        white = model.rows["white"]
+        return {"store": store, "price": prices.get(white[0].path) if white else None,
+                "missing": sorted(model.missing),
+                "labels": [{"label": f"{row.folder_type}/{row.filename}", "price": prices.get(row.path)}
+                           for row in model.iter_rows()]}
+
+    def status(self, request_id=None):
+        """Returns the status of one request, or of the server if request_id is None."""
+        with self.lock:
+            if request_id is None:
+                requests = list(self.requests.values())
+            else:
+                request = self.requests.get(request_id)
+                if request is None:
+                    raise PrintServerError(f"No request {request_id!r}", status=404)
+                return request.to_dict()
+        counts = {}
+        for request in requests:
+            counts[request.status()] = counts.get(request.status(), 0) + 1
+        return {"printers": [p or "(default)" for p in self.spooler.printers], "requests": counts,
+                "backend": self.backend.name}
+
+    # --------------------------------------------------------------------
+    # Workers
+    # --------------------------------------------------------------------
+    def _dispatcher(self):
+        while True:
+            try:
+                batch = [self._prints.get(timeout=5)]
+            except queue.Empty:
+                self.spooler.poll()  # nobody else drains the spooler's events
+                continue
+            deadline = time.monotonic() + self.batch_window
+            while True:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._prints.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            self.dispatch(batch)
+            self.spooler.poll()
+
+    def dispatch(self, batch):
+        """Merges a batch of print requests into one run per store and printer and submits the runs."""
+        groups = {}
+        for request in batch:
+            groups.setdefault((request.store, request.printer), []).append(request)
+        for (store, printer), requests in groups.items():
+            jobs = plan_jobs(job for request in requests for job in request.jobs)
+            run = PrintRun(store, jobs, printers=[printer] if printer else None)
+            positions = {os.path.normcase(job.path): i for i, job in enumerate(jobs)}
+            for request in requests:
+                request.indexes = sorted({positions[os.path.normcase(path)] for path, _ in request.jobs})
+                request.run = run
+            self.spooler.submit(run)
+
+    def _reprice_worker(self):
+        self.backend.initialize_thread()
+        while True:
+            request = self._reprices.get()
+            try:
+                self.reprice(request)
+            except Exception as e:
+                request.error = str(e)
+
+    def reprice(self, request):
+        store_path = self._store_path(request.store)
+        label_paths = [row.path for row in scan_folder(store_path).iter_rows(("white", "brown"))]
+        journal = RepriceJournal(self.reprice_journal_dir, request.store)
+        journal.begin(request.price)
+        job = Job("Reprice", label_paths,
+                  lambda path: reprice_if_changed(self.backend, journal, path, request.price),
+                  executor=self.executor)
+        request.job = job
+        job.start().wait()
+        if not job.errors:
+            written = job.results.values()
+            journal.finish(price=request.price, changed=sum(1 for w in written if w),
+                           skipped=sum(1 for w in written if not w))
+
+
+class LocalClient:
+    """Client interface to an in-process PrintServer, e.g. for tests or a single-machine setup."""
+
+    def __init__(self, server, client=None):
+        self.server = server
+        self.client = client or socket.gethostname()
+
+    def submit_print(self, store, jobs, printer=None):
+        return self.server.submit_print(store, jobs, printer=printer, client=self.client)
+
+    def submit_reprice(self, store, price):
+        return self.server.submit_reprice(store, price, client=self.client)
+
+    def stores(self):
+        return self.server.stores()
+
+    def store_labels(self, store):
+        return self.server.store_labels(store)
+
+    def status(self, request_id=None):
+        return self.server.status(request_id)
+
+
+# ------------------------------------------------------------------------
+# HTTP
+# ------------------------------------------------------------------------
+class RequestHandler(BaseHTTPRequestHandler):
+    server_version = "ButtyPrintServer/1"
+
+    def _reply(self, code, payload):
+        body = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        self.send_response(code)
+        self.send_header("Content-Type", "application/json; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self, action):
+        try:
+            self._reply(200, action())
+        except PrintServerError as e:
+            self._reply(e.status, {"error": str(e)})
+        except ValueError as e:
+            self._reply(400, {"error": f"Invalid request: {e}"})
+
+    def do_GET(self):
+        print_server = self.server.print_server
+        path = urllib.parse.unquote(self.path)
+        if path == "/status":
+            self._handle(print_server.status)
+        elif path == "/stores":
+            self._handle(print_server.stores)
+        elif path.startswith("/stores/") and path.endswith("/labels"):
+            self._handle(lambda: print_server.store_labels(path[len("/stores/"):-len("/labels")]))
+        elif path.startswith("/requests/"):
+            self._handle(lambda: print_server.status(path[len("/requests/"):]))
+        else:
+            self._reply(404, {"error": "Not found"})
+
+    def _read_json(self):
+        length = int(self.headers.get("Content-Length") or 0)
+        data = json.loads(self.rfile.read(length) or b"{}")
+        if not isinstance(data, dict):
+            raise ValueError("expected a JSON object")
+        return data
+
+    def do_POST(self):
+        print_server = self.server.print_server
+        routes = {
+            "/print": lambda d: print_server.submit_print(d.get("store"), d.get("jobs") or [],
+                                                          printer=d.get("printer"), client=d.get("client")),
+            "/reprice": lambda d: print_server.submit_reprice(d.get("store"), d.get("price"), client=d.get("client")),
+        }
+        route = routes.get(self.path)
+        if route is None:
+            self._reply(404, {"error": "Not found"})
+        else:
+            self._handle(lambda: route(self._read_json()))
+
+    def log_message(self, format, *args):
+        if self.server.verbose:
+            super().log_message(format, *args)
+
+
+def make_http_server(print_server, host="127.0.0.1", port=8765, verbose=False):
+    """Returns an HTTP server for a PrintServer; call serve_forever() on it."""
+    httpd = ThreadingHTTPServer((host, port), RequestHandler)
+    httpd.print_server = print_server
+    httpd.verbose = verbose
+    return httpd
+
+
+class PrintClient:
+    """Client for a print server over HTTP, with the same interface as LocalClient."""
+
+    def __init__(self, url, client=None, timeout=5.0):
+        self.url = url.rstrip("/")
+        self.client = client or socket.gethostname()
+        self.timeout = timeout
+
+    def _call(self, method, path, payload=None):
+        data = json.dumps(payload).encode("utf-8") if payload is not None else None
+        request = urllib.request.Request(self.url + path, data=data, method=method,
+                                         headers={"Content-Type": "application/json"})
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", str(e))
+            except ValueError:
+                message = str(e)
+            raise PrintServerError(message, status=e.code) from e
+        except (OSError, ValueError) as e:
+            raise PrintServerError(f"Print server {self.url} unavailable: {e}", status=503) from e
+
+    def submit_print(self, store, jobs, printer=None):
+        return self._call("POST", "/print", {"store": store, "jobs": jobs, "printer": printer, "client": self.client})
+
+    def submit_reprice(self, store, price):
+        return self._call("POST", "/reprice", {"store": store, "price": price, "client": self.client})
+
+    def stores(self):
+        return self._call("GET", "/stores")
+
+    def store_labels(self, store):
+        return self._call("GET", f"/stores/{urllib.parse.quote(store, safe='')}/labels")
+
+    def status(self, request_id=None):
+        return self._call("GET", "/status" if request_id is None else f"/requests/{request_id}")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Butty Printer 3000 print server.")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--base-dir", default=settings.BASE_DIR)
+    parser.add_argument("--backend", default=settings.PRINT_BACKEND, help="bpac, fake or file")
+    parser.add_argument("--printer", action="append", help="printer to print on (repeatable)")
+    parser.add_argument("--verbose", action="store_true", help="log every HTTP request")
+    args = parser.parse_args(argv)
+
+    from cli import make_backend
+    print_server = PrintServer(make_backend(args.backend), args.base_dir, settings.SPOOL_DIR,
+                               settings.REPRICE_JOURNAL_DIR, printers=args.printer or settings.PRINTERS,
+                               workers=settings.JOB_WORKERS, cut_mode=settings.CUT_MODE,
+                               printer_profiles=settings.PRINTER_PROFILES, index_file=settings.INDEX_FILE)
+    httpd = make_http_server(print_server, args.host, args.port, verbose=args.verbose)
+    print(f"Print server on http://{args.host}:{httpd.server_port} for {args.base_dir}")
+    try:
+        httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        httpd.server_close()
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,103 @@
+import threading
+import time
+from contextlib import contextmanager
+
+from backends import PrintBackend
+
+# ------------------------------------------------------------------------
+# Pooled document sessions
+# ------------------------------------------------------------------------
+# Creating a bpac.Document is a COM activation, which is a large part of the
+# per-label cost. DocumentPool keeps a few warm documents and lends them out
+# through session(). COM objects belong to the thread (apartment) that created
+# them, so idle documents are pooled per thread.
+
+
+def close_check(document):
+    """Default health check: a healthy document can always be closed."""
+    document.Close()
+
+
+class DocumentPool(PrintBackend):
+    """
+    Wraps a backend so that session() reuses warm documents. A document is
+    health-checked when it is returned (which also closes whatever it had open)
+    and again when it is lent out, since it can break while idle (e.g. when
+    P-touch Editor is restarted). One that fails either check is dropped and a
+    fresh one is used instead.
+    """
+
+    def __init__(self, backend, size=2, health_check=close_check):
+        self.backend = backend
+        self.name = backend.name
+        self.size = size
+        self.health_check = health_check
+        self.lock = threading.Lock()
+        self.local = threading.local()
+        self.hits = 0
+        self.misses = 0
+        self.broken = 0
+        self.activation_seconds = 0.0
+
+    def _idle(self):
+        idle = getattr(self.local, "idle", None)
+        if idle is None:
+            idle = self.local.idle = []
+        return idle
+
+    def document(self):
+        """Creates a new, unpooled document (counted as an activation)."""
+        start = time.perf_counter()
+        document = self.backend.document()
+        with self.lock:
+            self.misses += 1
+            self.activation_seconds += time.perf_counter() - start
+        return document
+
+    def initialize_thread(self):
+        self.backend.initialize_thread()
+
+    @contextmanager
+    def session(self):
+        """Lends out a healthy warm document of the current thread, or a new one if there is none."""
+        idle = self._idle()
+        document = None
+        while idle and document is None:
+            document = idle.pop()
+            try:
+                self.health_check(document)
+            except Exception:
+                with self.lock:
+                    self.broken += 1
+                document = None
+        if document is not None:
+            with self.lock:
+                self.hits += 1
+        else:
+            document = self.document()
+        try:
+            yield document
+        finally:
+            try:
+                self.health_check(document)
+            except Exception:
+                with self.lock:
+                    self.broken += 1
+                document = None
+            if document is not None and len(idle) < self.size:
+                idle.append(document)
+
+    def clear(self):
+        """Drops the idle documents of the current thread."""
+        self._idle().clear()
+
+    def stats(self):
+        with self.lock:
+            activations = self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "broken": self.broken,
+                "activation_ms_total": round(self.activation_seconds * 1000, 3),
+                "activation_ms_mean": round(self.activation_seconds * 1000 / activations, 3) if activations else 0.0,
+            }
@@ -0,0 +1,27 @@
+# ------------------------------------------------------------------------
+# Settings shared by the GUI (app.py) and the command line (cli.py)
+# ------------------------------------------------------------------------
+BASE_DIR = r"C:\Users\Deivydas\Desktop\label_printer1"  # Replace with your actual path
+PRINT_BACKEND = "bpac"                      # "bpac", or "fake" / "file" to run without a printer
+DOCUMENT_POOL_SIZE = 2                      # Warm b-PAC documents kept per thread
+JOB_WORKERS = 4                             # Worker threads for set_price, rescans and metadata refreshes
+BACKGROUND_WORKERS = 1                      # Worker threads for the startup prescan and index warm-up
+TAB_PREFETCH = 1                            # Tabs on each side of the selected one whose price is fetched ahead
+INDEX_FILE = "label_index.sqlite"           # Cached label metadata (price, objects, content hash)
+SPOOL_DIR = "print_journal"                 # Journals of print runs, used to resume interrupted runs
+DIAGNOSTICS_LOG = "diagnostics.jsonl"       # Timing and error log of backend calls and actions
+WATCH_DEBOUNCE = 0.5                        # Seconds without file changes before the tabs are updated
+WATCH_POLL_INTERVAL = 2.0                   # Seconds between folder checks where inotify isn't available
+PRINTERS = [""]                             # Printer names to split print runs across; "" is the default printer
+CUT_MODE = "cut"                            # "cut", "half-cut", "chain", "auto" or "no-cut" (see cutter.py)
+PRINTER_PROFILES = {}                       # Per printer name: {"cut_mode", "feed_mm", "feed_seconds", "cut_seconds"}
+REPRICE_JOURNAL_DIR = "reprice_journal"     # Old prices of every reprice run, for resume and undo
+SCHEDULE_DIR = "."                          # Folder with the <store>_numbers.csv / <store>_paninis.csv schedules
+SCHEDULE_DB = "schedules.sqlite"            # Imported schedules of every store, by week
+SNAPSHOT_FILE = "quantities.json"           # Autosaved quantities of every tab, restored at startup
+SNAPSHOT_DELAY = 1.0                        # Seconds without typing before the quantities are saved
+PREVIEW_CACHE_DIR = "preview_cache"         # Rendered label previews, one PNG per distinct template
+PREVIEW_MEMORY_MB = 16                      # Previews kept in memory, least recently used dropped first
+PREVIEW_DPI = 96                            # Resolution previews are exported at
+PREVIEW_WIDTH = 300                         # Previews wider than this are scaled down in the preview pane
+PRINT_SERVER = ""                           # e.g. "http://printhost:8765" to print and reprice through server.py
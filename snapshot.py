@@ -0,0 +1,127 @@
+import json
+import os
+import threading
+import time
+
+from atomicfile import write_file_atomic
+from diagnostics import recorder, timed
+
+# ------------------------------------------------------------------------
+# Quantity snapshots
+# ------------------------------------------------------------------------
+# The non-empty entry texts of every tab are kept in one small JSON file:
+#     {"version": 1, "saved": <time>, "stores": {store: {folder_type: {filename: text}}}}
+# Changes only update an in-memory copy; a writer thread saves it at most once
+# per `delay` seconds, atomically (see atomicfile.py), so a crash never leaves a
+# half-written snapshot behind.
+SNAPSHOT_VERSION = 1
+
+
+def load_snapshot(path):
+    """Returns the saved texts by store, or {} if there is no readable snapshot."""
+    try:
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError) as e:
+        if not isinstance(e, FileNotFoundError):
+            recorder.error("snapshot.load", e, file=path)
+        return {}
+    if not isinstance(data, dict) or data.get("version") != SNAPSHOT_VERSION:
+        return {}
+    return data.get("stores", {})
+
+
+def write_snapshot(path, stores):
+    data = json.dumps({"version": SNAPSHOT_VERSION, "saved": time.time(), "stores": stores},
+                      ensure_ascii=False, separators=(",", ":"))
+    write_file_atomic(path, data.encode("utf-8"))
+
+
+class Snapshot:
+    """
+    Autosaves the entered quantities. set_row() and set_model() are cheap and
+    meant to be called from the UI thread; the file is written by a background
+    thread once changes have stopped arriving for `delay` seconds (or at least
+    every few seconds while typing continues).
+    """
+
+    def __init__(self, path, delay=1.0):
+        self.path = path
+        self.delay = delay
+        self.stores = load_snapshot(path)
+        self.lock = threading.Lock()
+        self.changed = threading.Event()
+        self.stopped = threading.Event()
+        self._version = 0
+        self._saved_version = 0
+        self._thread = threading.Thread(target=self._writer, name="Snapshot", daemon=True)
+        self._thread.start()
+
+    def restore(self, model):
+        """Puts the saved texts of a store back into its freshly scanned model. Returns the number restored."""
+        restored = 0
+        with self.lock:
+            saved = self.stores.get(os.path.basename(model.folder_path), {})
+            for folder_type, texts in saved.items():
+                for filename, text in texts.items():
+                    row = model.get(folder_type, filename)
+                    if row is not None:
+                        model.set_text(row, text)
+                        restored += 1
+        return restored
+
+    def set_row(self, row):
+        """Records the current text of one row."""
+        with self.lock:
+            texts = self.stores.setdefault(os.path.basename(row.folder_path), {}).setdefault(row.folder_type, {})
+            if row.text:
+                texts[row.filename] = row.text
+            elif texts.pop(row.filename, None) is None:
+                return
+            self._version += 1
+        self.changed.set()
+
+    def set_model(self, model):
+        """Records the texts of every row of a model, e.g. after a day was loaded into it."""
+        saved = {}
+        for row in model.iter_rows():
+            if row.text:
+                saved.setdefault(row.folder_type, {})[row.filename] = row.text
+        with self.lock:
+            self.stores[os.path.basename(model.folder_path)] = saved
+            self._version += 1
+        self.changed.set()
+
+    def flush(self):
+        """Writes any unsaved changes now, on the calling thread."""
+        with self.lock:
+            if self._version == self._saved_version:
+                return
+            version = self._version
+            stores = {store: {folder_type: dict(texts) for folder_type, texts in saved.items() if texts}
+                      for store, saved in self.stores.items() if any(saved.values())}
+        with timed("snapshot.write", file=self.path, stores=len(stores)):
+            write_snapshot(self.path, stores)
+        with self.lock:
+            self._saved_version = max(self._saved_version, version)
+
+    def close(self):
+        self.stopped.set()
+        self.changed.set()
+        self._thread.join()
+        self.flush()
+
+    def _writer(self):
+        while not self.stopped.is_set():
+            self.changed.wait()
+            first = time.monotonic()
+            # Coalesce a burst of changes into one write, but don't put it off forever.
+            while self.changed.is_set() and not self.stopped.is_set() and time.monotonic() - first < 5 * self.delay:
+                self.changed.clear()
+                self.stopped.wait(self.delay)
+            if self.stopped.is_set():
+                return
+            try:
+                self.flush()
+            except OSError as e:
+                recorder.error("snapshot.save", e, file=self.path)
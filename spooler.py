@@ -0,0 +1,369 @@
+import hashlib
+import json
+import os
+import queue
+import threading
+import time
+
+from cutter import DEFAULT_PROFILE, cut_options, estimate_savings, order_jobs
+
+# ------------------------------------------------------------------------
+# Print spooler
+# ------------------------------------------------------------------------
+# A print run is planned from a tab's quantities, merged so each template is
+# opened once, ordered by folder type to save tape feeds (see cutter.py), split
+# across the configured printers by copy count and printed in batches on one
+# worker thread per printer. Every batch that reaches EndPrint is recorded in
+# an append-only journal. If a run is interrupted or some of its labels fail,
+# its journal stays in place, and submitting the same plan again with
+# resume=True prints only the jobs that weren't committed instead of printing
+# everything twice; without it the old journal is set aside, so a
+# later run that happens to have the same plan (e.g. next week's Monday) prints
+# every label.
+BATCH_SIZE = 10  # templates per StartPrint/EndPrint session (one journal commit each)
+
+RUN_STARTED = "started"
+RUN_PROGRESS = "progress"
+RUN_FINISHED = "finished"
+
+
+class PrintJob:
+    """One template to print and how many copies of it."""
+    __slots__ = ("path", "copies")
+
+    def __init__(self, path, copies):
+        self.path = path
+        self.copies = copies
+
+    def to_dict(self):
+        return {"path": self.path, "copies": self.copies}
+
+
+def plan_jobs(labels, template_key=os.path.normcase):
+    """
+    Turns (file_path, copies) pairs into a job plan. Entries with no copies are
+    dropped and entries for the same template are merged into one job. Jobs are
+    ordered white before brown before other, and otherwise in the order in which
+    each template first appears.
+    """
+    jobs = {}
+    for file_path, copies in labels:
+        if copies <= 0:
+            continue
+        key = template_key(file_path)
+        if key in jobs:
+            jobs[key].copies += copies
+        else:
+            jobs[key] = PrintJob(file_path, copies)
+    return order_jobs(jobs.values())
+
+
+def plan_id(store, jobs):
+    """Stable identifier of a plan, used to find its journal."""
+    payload = json.dumps([store, [job.to_dict() for job in jobs]], sort_keys=True)
+    return hashlib.sha1(payload.encode("utf-8")).hexdigest()[:16]
+
+
+def shard_jobs(jobs, indexes, printers):
+    """
+    Splits the given job indexes of a plan across printers so that every printer
+    gets about the same number of copies (largest jobs first, each to the least
+    loaded printer). Returns (printer, indexes) pairs in plan order, leaving out
+    printers that got nothing.
+    """
+    loads = [0] * len(printers)
+    shards = [[] for _ in printers]
+    for i in sorted(indexes, key=lambda i: -jobs[i].copies):
+        least = loads.index(min(loads))
+        shards[least].append(i)
+        loads[least] += jobs[i].copies
+    return [(printer, sorted(shard)) for printer, shard in zip(printers, shards) if shard]
+
+
+class PrinterShard:
+    """The part of a run that is printed on one printer."""
+    __slots__ = ("printer", "jobs", "copies", "labels_printed", "estimate", "started_at", "finished_at")
+
+    def __init__(self, printer, jobs, copies):
+        self.printer = printer
+        self.jobs = jobs
+        self.copies = copies
+        self.labels_printed = 0
+        self.estimate = None      # what the printer's cut mode saves, from cutter.estimate_savings
+        self.started_at = None
+        self.finished_at = None
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def summary(self):
+        elapsed = self.elapsed()
+        return {
+            "printer": self.printer or "(default)",
+            "jobs": len(self.jobs),
+            "copies": self.copies,
+            "labels_printed": self.labels_printed,
+            "finished": self.finished_at is not None,
+            "seconds": round(elapsed, 3),
+            "labels_per_minute": round(self.labels_printed * 60 / elapsed, 1) if elapsed else 0.0,
+            "estimate": self.estimate,
+        }
+
+
+class PrintRun:
+    """
+    A planned print run for one store and what has happened to it so far.
+    printers limits the run to some of the spooler's printers (default: all of them).
+    resume continues an interrupted attempt at the same plan (see interrupted_jobs).
+    """
+
+    def __init__(self, store, jobs, batch_size=BATCH_SIZE, printers=None, resume=False):
+        self.store = store
+        self.jobs = jobs
+        self.printers = printers
+        self.resume = resume
+        self.batch_size = max(1, batch_size)
+        self.id = plan_id(store, jobs)
+        self.printed = set()      # job indexes committed by EndPrint, this run or a previous one
+        self.resumed = 0          # jobs skipped because a previous attempt already printed them
+        self.errors = []          # (path, message)
+        self.labels_printed = 0
+        self.shards = []          # PrinterShard per printer the run was split across
+        self.pending_shards = 0
+        self.journal = None
+        self.failed = False       # a session or some labels failed, so the journal is kept for a resume
+        self.started_at = None
+        self.finished_at = None
+        self.lock = threading.Lock()
+        self.cancelled = threading.Event()
+        self.finished = threading.Event()
+
+    @property
+    def total_copies(self):
+        return sum(job.copies for job in self.jobs)
+
+    def elapsed(self):
+        if self.started_at is None:
+            return 0.0
+        return (self.finished_at or time.perf_counter()) - self.started_at
+
+    def labels_per_minute(self):
+        elapsed = self.elapsed()
+        return self.labels_printed * 60 / elapsed if elapsed else 0.0
+
+    def sessions(self, indexes):
+        """Splits job indexes into the jobs of each print session (batch)."""
+        return [[self.jobs[i] for i in indexes[start:start + self.batch_size]]
+                for start in range(0, len(indexes), self.batch_size)]
+
+    def summary(self):
+        estimates = [shard.estimate for shard in self.shards if shard.estimate]
+        return {
+            "run": self.id,
+            "store": self.store,
+            "jobs": len(self.jobs),
+            "copies": self.total_copies,
+            "labels_printed": self.labels_printed,
+            "resumed_jobs": self.resumed,
+            "errors": len(self.errors),
+            "labels_per_minute": round(self.labels_per_minute(), 1),
+            "tape_saved_mm": round(sum(estimate["tape_saved_mm"] for estimate in estimates), 1),
+            "seconds_saved": round(sum(estimate["seconds_saved"] for estimate in estimates), 1),
+            "printers": [shard.summary() for shard in self.shards],
+        }
+
+
+class Journal:
+    """Append-only JSONL record of the batches of a run that were committed to the printer."""
+
+    def __init__(self, journal_dir, run_id):
+        self.journal_dir = journal_dir
+        self.path = os.path.join(journal_dir, f"{run_id}.jsonl")
+        self.lock = threading.Lock()
+
+    def committed(self):
+        """Returns the job indexes committed by an earlier, unfinished attempt at this plan."""
+        printed = set()
+        if not os.path.exists(self.path):
+            return printed
+        with open(self.path, encoding="utf-8") as f:
+            for line in f:
+                try:
+                    record = json.loads(line)
+                except ValueError:
+                    break  # torn last line from a crash
+                if record.get("event") == "batch":
+                    printed.update(record["jobs"])
+        return printed
+
+    def append(self, record):
+        record["t"] = time.time()
+        with self.lock:
+            os.makedirs(self.journal_dir, exist_ok=True)
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(json.dumps(record) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+    def close(self, status="done"):
+        """Moves the journal out of the way of future runs, e.g. as <run>-<time>.done.jsonl."""
+        if os.path.exists(self.path):
+            os.replace(self.path, self.path[:-len(".jsonl")] + f"-{time.time_ns() // 1000000}.{status}.jsonl")
+
+
+def interrupted_jobs(journal_dir, run):
+    """Returns the job indexes an earlier, unfinished attempt at the run's plan already printed."""
+    return Journal(journal_dir, run.id).committed()
+
+
+class Spooler:
+    """
+    Prints runs on one or more printers. A dispatcher thread reads each run's
+    journal and splits the jobs still to print across the printers, balanced by
+    copy count; every printer has its own worker thread that prints one run's
+    share at a time, so runs of different stores are never mixed in a session.
+    open_session() must return a context manager that provides a b-PAC style
+    document (SetPrinter, StartPrint, Open, PrintOut, EndPrint), such as a
+    backend's session; it is called on the printer threads, after initializer()
+    if one is given. A printer name of "" means the default printer.
+    Each printer cuts in cut_mode unless printer_profiles (printer name ->
+    overrides of cutter.DEFAULT_PROFILE) says otherwise. Progress is reported as (kind, run) tuples on the events queue.
+    """
+
+    def __init__(self, open_session, journal_dir, initializer=None, printers=("",), cut_mode="cut",
+                 printer_profiles=None):
+        self.open_session = open_session
+        self.journal_dir = journal_dir
+        self.initializer = initializer
+        self.printers = list(printers) or [""]
+        self.profiles = {printer: dict(DEFAULT_PROFILE, cut_mode=cut_mode, **(printer_profiles or {}).get(printer, {}))
+                         for printer in self.printers}
+        self.events = queue.Queue()
+        self._runs = queue.Queue()
+        self._shards = {printer: queue.Queue() for printer in self.printers}
+        self._thread = threading.Thread(target=self._worker, name="Spooler", daemon=True)
+        self._thread.start()
+        for printer in self.printers:
+            threading.Thread(target=self._printer_worker, args=(printer,),
+                             name=f"Spooler {printer or 'default'}", daemon=True).start()
+
+    def submit(self, run):
+        """Queues a run for printing and returns it."""
+        self._runs.put(run)
+        return run
+
+    def poll(self):
+        """Returns the events queued since the last call without blocking."""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+
+    def _worker(self):
+        while True:
+            run = self._runs.get()
+            try:
+                self.dispatch(run)
+            except Exception as e:
+                run.errors.append(("", str(e)))
+                run.failed = True
+                self._finish(run, None)
+
+    def dispatch(self, run):
+        """Splits the jobs of a run that aren't in its journal yet across the printers."""
+        printers = run.printers or self.printers
+        unknown = [printer for printer in printers if printer not in self._shards]
+        if unknown:
+            raise ValueError(f"Unknown printer {unknown[0]!r}")
+        journal = Journal(self.journal_dir, run.id)
+        run.printed = journal.committed()
+        if run.printed and not run.resume:
+            journal.close("stale")
+            run.printed = set()
+        run.resumed = len(run.printed)
+        run.started_at = time.perf_counter()
+        if not run.printed:
+            journal.append({"event": "plan", "store": run.store, "jobs": [job.to_dict() for job in run.jobs]})
+        self.events.put((RUN_STARTED, run))
+
+        pending = [i for i in range(len(run.jobs)) if i not in run.printed]
+        run.shards = [PrinterShard(printer, indexes, sum(run.jobs[i].copies for i in indexes))
+                      for printer, indexes in shard_jobs(run.jobs, pending, printers)]
+        for shard in run.shards:
+            shard.estimate = estimate_savings(run.sessions(shard.jobs), self.profiles[shard.printer])
+        if not run.shards:
+            self._finish(run, journal)
+            return
+        run.journal = journal
+        run.pending_shards = len(run.shards)
+        for shard in run.shards:
+            self._shards[shard.printer].put((run, shard))
+
+    def _printer_worker(self, printer):
+        if self.initializer:
+            self.initializer()
+        shards = self._shards[printer]
+        while True:
+            run, shard = shards.get()
+            shard.started_at = time.perf_counter()
+            try:
+                self.print_shard(run, shard)
+            except Exception as e:
+                with run.lock:
+                    run.errors.append(("", f"{printer or 'default printer'}: {e}"))
+                    run.failed = True
+            finally:
+                shard.finished_at = time.perf_counter()
+                with run.lock:
+                    run.pending_shards -= 1
+                    last = run.pending_shards == 0
+                if last:
+                    self._finish(run, run.journal)
+
+    def _finish(self, run, journal):
+        if run.errors:
+            run.failed = True     # the labels that failed aren't in the journal, so a resume retries them
+        if journal is not None and not run.failed and not run.cancelled.is_set():
+            journal.append({"event": "done", **run.summary()})
+            journal.close()
+        run.finished_at = time.perf_counter()
+        run.finished.set()
+        self.events.put((RUN_FINISHED, run))
+
+    def print_shard(self, run, shard):
+        """Prints one printer's share of a run, one batch per print session."""
+        cut_mode = self.profiles[shard.printer]["cut_mode"]
+        with self.open_session() as document:
+            for start in range(0, len(shard.jobs), run.batch_size):
+                if run.cancelled.is_set():
+                    return
+                batch = shard.jobs[start:start + run.batch_size]
+                if not document.StartPrint("", 0):
+                    raise RuntimeError("Failed to start printing.")
+                sent = []
+                options = cut_options([run.jobs[i] for i in batch], cut_mode)
+                for i, option in zip(batch, options):
+                    job = run.jobs[i]
+                    try:
+                        if not document.Open(job.path):
+                            run.errors.append((job.path, "Failed to open"))
+                        elif shard.printer and not document.SetPrinter(shard.printer, True):
+                            run.errors.append((job.path, f"Printer {shard.printer} not available"))
+                        else:
+                            document.PrintOut(job.copies, option)
+                            sent.append(i)
+                    except Exception as e:
+                        run.errors.append((job.path, str(e)))
+                if document.EndPrint() is False:
+                    raise RuntimeError("Failed to finish printing.")
+                run.journal.append({"event": "batch", "printer": shard.printer, "jobs": sent})
+                copies = sum(run.jobs[i].copies for i in sent)
+                with run.lock:
+                    run.printed.update(sent)
+                    run.labels_printed += copies
+                shard.labels_printed += copies
+                self.events.put((RUN_PROGRESS, run))
@@ -0,0 +1,49 @@
+import os
+import sys
+import zipfile
+
+import pytest
+
+# The modules live at the repository root rather than in a package.
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+LABEL_XML_TEMPLATE = (
+    '<?xml version="1.0" encoding="UTF-8"?>'
+    '<pt:document xmlns:pt="http://schemas.brother.info/ptouch/2007/lbx/main" '
+    'xmlns:text="http://schemas.brother.info/ptouch/2007/lbx/text"><pt:body><pt:objects>'
+    '<text:text><pt:objectStyle x="4pt" y="4pt"><pt:expanded objectName="Name" ID="0"/></pt:objectStyle>'
+    '<pt:data>{name}</pt:data><text:stringItem charLen="{name_len}"><text:ptFontInfo/></text:stringItem></text:text>'
+    '<text:text><pt:objectStyle x="4pt" y="20pt"><pt:expanded objectName="Price" ID="1"/></pt:objectStyle>'
+    '<pt:data>{price}</pt:data><text:stringItem charLen="{price_len}"><text:ptFontInfo/></text:stringItem></text:text>'
+    '</pt:objects></pt:body></pt:document>'
+)
+
+
+@pytest.fixture
+def write_label():
+    """Returns a function that writes a minimal .lbx file with a Name and a Price text object."""
+    def write(file_path, name, price="£2.50"):
+        os.makedirs(os.path.dirname(file_path), exist_ok=True)
+        xml = LABEL_XML_TEMPLATE.format(name=name.replace("&", "&amp;"), name_len=len(name),
+                                        price=price, price_len=len(price))
+        with zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as archive:
+            archive.writestr("label.xml", xml)
+            archive.writestr("prop.xml", '<?xml version="1.0" encoding="UTF-8"?><meta:properties/>')
+        return file_path
+    return write
+
+
+@pytest.fixture
+def label(tmp_path, write_label):
+    return write_label(str(tmp_path / "1.Ham.lbx"), "Ham & Cheese", price="£2.50")
+
+
+@pytest.fixture
+def store(tmp_path, write_label):
+    """A store folder with two white, two brown and two other labels, all priced £2.50."""
+    store_path = tmp_path / "base" / "Store001"
+    for folder_type, names in (("white", ["1.Ham", "2.Egg"]), ("brown", ["1.Ham", "2.Egg"]),
+                               ("other", ["Cheese Panini", "Tuna Panini"])):
+        for name in names:
+            write_label(str(store_path / folder_type / f"{name}.lbx"), name)
+    return str(store_path)
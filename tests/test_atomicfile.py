@@ -0,0 +1,39 @@
+import json
+import os
+import stat
+
+import pytest
+
+from atomicfile import write_file_atomic
+from snapshot import write_snapshot
+
+
+def test_replaces_contents_without_leaving_temp_files(tmp_path):
+    path = str(tmp_path / "data.bin")
+    write_file_atomic(path, b"old")
+    write_file_atomic(path, b"new")
+    with open(path, "rb") as f:
+        assert f.read() == b"new"
+    assert os.listdir(tmp_path) == ["data.bin"]
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_keeps_mode_of_existing_file(tmp_path):
+    path = str(tmp_path / "data.bin")
+    write_file_atomic(path, b"old")
+    os.chmod(path, 0o640)
+    write_file_atomic(path, b"new")
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o640
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_new_file_gets_default_mode(tmp_path):
+    umask = os.umask(0o022)
+    try:
+        path = str(tmp_path / "quantities.json")
+        write_snapshot(path, {"Spalding": {"white": {"1.Ham.lbx": "3"}}})
+    finally:
+        os.umask(umask)
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o644
+    with open(path, encoding="utf-8") as f:
+        assert json.load(f)["stores"] == {"Spalding": {"white": {"1.Ham.lbx": "3"}}}
@@ -0,0 +1,69 @@
+import os
+import threading
+
+from labels import listed_folder, parse_quantity, scan_folder
+from watcher import TreeWatcher
+
+
+def test_scan_folder_and_running_total(store):
+    model = scan_folder(store)
+    assert [row.filename for row in model.rows["white"]] == ["1.Ham.lbx", "2.Egg.lbx"]
+    assert model.missing == set()
+
+    ham, egg = model.rows["white"]
+    assert model.set_text(ham, "3") == 3
+    assert model.set_text(egg, "2") == 5
+    assert model.set_text(ham, "x") == 2
+    assert parse_quantity("1.5") == 1
+
+
+def test_sync_files_keeps_quantities_and_order(store):
+    model = scan_folder(store)
+    model.set_text(model.get("white", "2.Egg.lbx"), "4")
+    model.set_text(model.get("white", "1.Ham.lbx"), "1")
+    version = model.version
+
+    assert model.sync_files("white", ["2.Egg.lbx", "10.Tuna.lbx", "3.Brie.lbx"]) == (
+        ["10.Tuna.lbx", "3.Brie.lbx"], ["1.Ham.lbx"])
+    assert [(row.filename, row.index) for row in model.rows["white"]] == [
+        ("2.Egg.lbx", 0), ("3.Brie.lbx", 1), ("10.Tuna.lbx", 2)]
+    assert model.get("white", "2.Egg.lbx").text == "4"
+    assert model.get("white", "1.Ham.lbx") is None
+    assert model.total == 4
+    assert model.version == version + 1
+    assert model.sync_files("white", ["2.Egg.lbx", "3.Brie.lbx", "10.Tuna.lbx"]) == ([], [])
+    assert model.version == version + 1
+
+
+def test_sync_files_appends_other_rows_and_tracks_missing_folders(store):
+    model = listed_folder(store, ["other/Tuna Panini.lbx", "other/Cheese Panini.lbx"])
+    model.sync_files("other", ["Tuna Panini.lbx", "Cheese Panini.lbx", "Brie Panini.lbx"])
+    assert [row.filename for row in model.rows["other"]] == ["Tuna Panini.lbx", "Cheese Panini.lbx",
+                                                             "Brie Panini.lbx"]
+
+    model.set_text(model.rows["other"][0], "2")
+    assert model.sync_files("other", None) == ([], ["Tuna Panini.lbx", "Cheese Panini.lbx", "Brie Panini.lbx"])
+    assert model.missing == {"other"}
+    assert model.total == 0
+    model.sync_files("other", ["Tuna Panini.lbx"])
+    assert model.missing == set()
+
+
+def test_watcher_reports_added_and_removed_labels(store, write_label):
+    listings = []
+    changed = threading.Event()
+    expected = ["2.Egg.lbx", "3.Brie.lbx"]
+
+    def on_change(changes):
+        listings.append(changes)
+        if changes.get((store, "white")) == expected:
+            changed.set()
+
+    watcher = TreeWatcher([store], on_change, debounce=0.05, poll_interval=0.05).start()
+    try:
+        write_label(os.path.join(store, "white", "3.Brie.lbx"), "3.Brie")
+        os.remove(os.path.join(store, "white", "1.Ham.lbx"))
+        assert changed.wait(5), listings
+    finally:
+        watcher.stop()
+    assert all(set(changes) == {(store, "white")} for changes in listings)
@@ -0,0 +1,65 @@
+import os
+import stat
+import zipfile
+
+import pytest
+
+import lbx
+
+
+def test_read_label(label):
+    xml = lbx.read_label_xml(label)
+    assert lbx.get_text(xml) == "£2.50"
+    assert lbx.get_text(xml, "Name") == "Ham & Cheese"
+    assert lbx.object_names(xml) == ["Name", "Price"]
+
+
+def test_set_text_resizes_string_item(label):
+    xml = lbx.set_text(lbx.read_label_xml(label), "£10.25")
+    assert lbx.get_text(xml) == "£10.25"
+    assert 'charLen="6"' in xml
+    assert lbx.set_text(xml, "£1", object_name="Missing") is None
+
+
+def test_write_price_round_trip(label):
+    with zipfile.ZipFile(label) as archive:
+        prop = archive.read("prop.xml")
+
+    assert lbx.write_price(label, "£3.10")
+    assert lbx.read_price(label) == "£3.10"
+    assert lbx.get_text(lbx.read_label_xml(label), "Name") == "Ham & Cheese"
+    with zipfile.ZipFile(label) as archive:
+        assert archive.read("prop.xml") == prop
+    assert lbx.write_price(label, "£2.50")
+    assert lbx.read_price(label) == "£2.50"
+
+
+def test_write_price_without_price_object(tmp_path):
+    path = str(tmp_path / "plain.lbx")
+    with zipfile.ZipFile(path, "w") as archive:
+        archive.writestr("label.xml", "<pt:document/>")
+    before = os.stat(path).st_mtime_ns
+    assert lbx.write_price(path, "£1.00") is False
+    assert os.stat(path).st_mtime_ns == before
+
+
+def test_unreadable_files_raise_lbx_error(tmp_path):
+    path = str(tmp_path / "broken.lbx")
+    with open(path, "wb") as f:
+        f.write(b"not a zip")
+    with pytest.raises(lbx.LbxError):
+        lbx.read_price(path)
+    with pytest.raises(lbx.LbxError):
+        lbx.write_price(str(tmp_path / "label.lbl"), "£1.00")
+
+
+@pytest.mark.skipif(os.name != "posix", reason="POSIX permission bits")
+def test_write_price_keeps_mode(label):
+    os.chmod(label, 0o644)
+    lbx.write_price(label, "£2.75")
+    assert stat.S_IMODE(os.stat(label).st_mode) == 0o644
+
+
+def test_missing_file_raises_lbx_error(tmp_path):
+    with pytest.raises(lbx.LbxError):
+        lbx.read_price(str(tmp_path / "gone.lbx"))
@@ -0,0 +1,138 @@
+import glob
+import os
+
+import pytest
+
+import lbx
+import reprice
+from backends import FakeBackend
+from reprice import RepriceJournal
+
+
+def label_paths(store):
+    return sorted(glob.glob(os.path.join(store, "*", "*.lbx")))
+
+
+def test_reprice_if_changed_skips_unchanged_labels(tmp_path, store):
+    backend = FakeBackend()
+    journal = RepriceJournal(str(tmp_path / "journal"), "Store001")
+    first, second = label_paths(store)[:2]
+
+    journal.begin("£2.75")
+    assert reprice.reprice_if_changed(backend, journal, first, "£2.75")
+    assert not reprice.reprice_if_changed(backend, journal, second, "£2.50")
+    assert not reprice.reprice_if_changed(backend, journal, first, "£2.75", known_prices={first: "£2.75"})
+    assert lbx.read_price(first) == "£2.75"
+    assert reprice.journal_old_prices(journal.path) == [(first, "£2.50")]
+    assert backend.calls == []
+
+
+def test_interrupted_run_is_resumed_with_the_earliest_old_price(tmp_path, store):
+    backend = FakeBackend()
+    journal_dir = str(tmp_path / "journal")
+    first, second = label_paths(store)[:2]
+
+    journal = RepriceJournal(journal_dir, "Store001")
+    journal.begin("£2.75")
+    reprice.reprice_if_changed(backend, journal, first, "£2.75")
+    assert journal.unfinished() == "£2.75"
+
+    # A new run against the same store continues the same journal.
+    journal = RepriceJournal(journal_dir, "Store001")
+    journal.begin("£3.00")
+    for path in (first, second):
+        reprice.reprice_if_changed(backend, journal, path, "£3.00")
+    assert journal.unfinished() == "£3.00"
+    assert reprice.journal_old_prices(journal.path) == [(first, "£2.50"), (second, "£2.50")]
+
+
+def test_torn_last_line_is_ignored(tmp_path, store):
+    journal = RepriceJournal(str(tmp_path / "journal"), "Store001")
+    first = label_paths(store)[0]
+    journal.begin("£2.75")
+    journal.intent(first, "£2.50", "£2.75")
+    with open(journal.path, "a", encoding="utf-8") as f:
+        f.write('{"event": "do')
+    assert reprice.journal_old_prices(journal.path) == [(first, "£2.50")]
+
+
+def test_finish_keeps_journal_for_undo(tmp_path, store):
+    backend = FakeBackend()
+    journal_dir = str(tmp_path / "journal")
+    paths = label_paths(store)
+
+    journal = RepriceJournal(journal_dir, "Store001")
+    journal.begin("£2.75")
+    for path in paths:
+        reprice.reprice_if_changed(backend, journal, path, "£2.75")
+    journal.finish(changed=len(paths))
+    assert not os.path.exists(journal.path)
+    assert journal.unfinished() is None
+
+    journal_path = reprice.latest_journal(journal_dir, "Store001")
+    assert journal_path.endswith(".done.jsonl")
+    for path, old_price in reprice.journal_old_prices(journal_path):
+        reprice.restore_label(backend, path, old_price)
+    reprice.close_rolled_back(journal_path)
+
+    assert [lbx.read_price(path) for path in paths] == ["£2.50"] * len(paths)
+    assert reprice.latest_journal(journal_dir, "Store001") is None
+    assert len(glob.glob(os.path.join(journal_dir, "Store001-*.undone.jsonl"))) == 1
+
+
+def test_finish_without_changes_removes_journal(tmp_path, store):
+    journal_dir = str(tmp_path / "journal")
+    journal = RepriceJournal(journal_dir, "Store001")
+    journal.begin("£2.50")
+    assert not reprice.reprice_if_changed(FakeBackend(), journal, label_paths(store)[0], "£2.50")
+    journal.finish(changed=0)
+    assert os.listdir(journal_dir) == []
+
+
+def test_latest_journal_prefers_the_unfinished_run(tmp_path, store):
+    backend = FakeBackend()
+    journal_dir = str(tmp_path / "journal")
+    first = label_paths(store)[0]
+
+    journal = RepriceJournal(journal_dir, "Store001")
+    journal.begin("£2.75")
+    reprice.reprice_if_changed(backend, journal, first, "£2.75")
+    journal.finish()
+    journal.begin("£3.00")
+    reprice.reprice_if_changed(backend, journal, first, "£3.00")
+
+    journal_path = reprice.latest_journal(journal_dir, "Store001")
+    assert journal_path == journal.path
+    assert reprice.journal_old_prices(journal_path) == [(first, "£2.75")]
+    assert reprice.latest_journal(journal_dir, "Store00") is None
+
+
+def test_reprice_copies_writes_every_copy(tmp_path, store, write_label):
+    backend = FakeBackend()
+    journal_dir = str(tmp_path / "journal")
+    other = write_label(str(tmp_path / "base" / "Store002" / "white" / "1.Ham.lbx"), "1.Ham")
+    paths = (os.path.join(store, "white", "1.Ham.lbx"), other)
+    journals = {}
+
+    def journal_for(path):
+        store_name = os.path.basename(os.path.dirname(os.path.dirname(path)))
+        return journals.setdefault(store_name, RepriceJournal(journal_dir, store_name))
+
+    assert reprice.group_by_content(paths) == [paths]
+    assert reprice.reprice_copies(backend, journal_for, paths, "£2.75") == dict.fromkeys(paths, True)
+    assert [lbx.read_price(path) for path in paths] == ["£2.75", "£2.75"]
+    assert sorted(journals) == ["Store001", "Store002"]
+    assert reprice.reprice_copies(backend, journal_for, paths, "£2.75") == dict.fromkeys(paths, False)
+
+
+def test_labels_the_codec_cannot_read_go_through_the_backend(tmp_path):
+    path = str(tmp_path / "old.lbl")
+    with open(path, "wb") as f:
+        f.write(b"legacy label")
+    backend = FakeBackend()
+    journal = RepriceJournal(str(tmp_path / "journal"), "Store001")
+    # The fake document has no Price object for a file it can't decode.
+    with pytest.raises(ValueError):
+        reprice.reprice_if_changed(backend, journal, path, "£2.75")
+    assert backend.count("Open") == 1
+    assert reprice.journal_old_prices(journal.path) == []
@@ -0,0 +1,101 @@
+import csv
+import os
+from datetime import date
+
+import pytest
+
+from labels import scan_folder
+from schedule import DAYS
+from schedule_store import ScheduleStore, current_week, schedule_stores
+
+
+def write_schedules(schedule_dir, store, sandwiches, paninis):
+    """Writes <store>_numbers.csv and <store>_paninis.csv with the same quantities every day."""
+    os.makedirs(schedule_dir, exist_ok=True)
+    with open(os.path.join(schedule_dir, f"{store}_numbers.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name"] + [f"{day} {bread}" for day in DAYS for bread in ("white", "brown")])
+        for name, (white, brown) in sandwiches.items():
+            writer.writerow([name] + [white, brown] * len(DAYS))
+    with open(os.path.join(schedule_dir, f"{store}_paninis.csv"), "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(["Name"] + [f"{day} other" for day in DAYS])
+        for name, other in paninis.items():
+            writer.writerow([name] + [other] * len(DAYS))
+
+
+@pytest.fixture
+def schedule_dir(tmp_path):
+    schedule_dir = str(tmp_path / "schedules")
+    write_schedules(schedule_dir, "Store001", {"1.Ham": (3, 1), "2.Egg": (2, 0)}, {"Cheese Panini": 4})
+    write_schedules(schedule_dir, "Store002", {"1.Ham": (5, 5)}, {})
+    return schedule_dir
+
+
+@pytest.fixture
+def schedules(tmp_path):
+    schedules = ScheduleStore(str(tmp_path / "schedules.sqlite"))
+    yield schedules
+    schedules.close()
+
+
+def test_current_week():
+    assert current_week(date(2026, 10, 17)) == "2026-W42"
+    assert current_week(date(2027, 1, 1)) == "2026-W53"
+
+
+def test_import_dir_skips_unchanged_csvs(schedules, schedule_dir):
+    assert schedule_stores(schedule_dir) == ["Store001", "Store002"]
+    assert len(schedules.import_dir(schedule_dir, week="2026-W41")) == 4
+    version = schedules.version()
+    assert schedules.import_dir(schedule_dir, week="2026-W41") == []
+    assert schedules.version() == version
+    assert schedules.stores() == {"Store001", "Store002"}
+
+    write_schedules(schedule_dir, "Store002", {"1.Ham": (6, 6), "3.Tuna": (1, 1)}, {})
+    imported = schedules.import_dir(schedule_dir, week="2026-W41")
+    assert sorted(os.path.basename(schedule.path) for schedule in imported) == [
+        "Store002_numbers.csv", "Store002_paninis.csv"]
+    assert schedules.version() != version
+    assert schedules.day_quantities("Store002", "Friday") == {
+        ("white", "1.Ham"): "6", ("brown", "1.Ham"): "6", ("white", "3.Tuna"): "1", ("brown", "3.Tuna"): "1"}
+
+
+def test_days_are_filled_from_the_newest_week(schedules, schedule_dir):
+    schedules.import_dir(schedule_dir, week="2026-W41")
+    write_schedules(schedule_dir, "Store001", {"1.Ham": (7, 0)}, {})
+    schedules.import_dir(schedule_dir, stores=["Store001"], week="2026-W42")
+
+    assert schedules.weeks("Store001") == ["2026-W41", "2026-W42"]
+    assert schedules.weeks("Store002") == ["2026-W41"]
+    assert schedules.day_quantities("Store001", "Monday") == {("white", "1.Ham"): "7", ("brown", "1.Ham"): "0"}
+    assert schedules.day_quantities("Store003", "Monday") == {}
+
+    rows = schedules.newest_quantities(stores={"Store001"})
+    assert len(rows) == 2 * len(DAYS)
+    assert {row[0] for row in schedules.newest_quantities()} == {"Store001", "Store002"}
+    assert ("Store001", DAYS.index("Sunday"), "white", "1.Ham", "7") in rows
+
+
+def test_day_values_follow_the_model_rows(schedules, schedule_dir, store):
+    schedules.import_dir(schedule_dir, week="2026-W41")
+    model = scan_folder(store)
+    values = dict(zip(((row.folder_type, row.name) for row in model.iter_rows()),
+                      schedules.day_values(model, "Tuesday")))
+    assert values == {("white", "1.Ham"): "3", ("white", "2.Egg"): "2", ("brown", "1.Ham"): "1",
+                      ("brown", "2.Egg"): "0", ("other", "Cheese Panini"): "4", ("other", "Tuna Panini"): None}
+
+
+def test_problems_are_kept_with_their_csv(schedules, schedule_dir):
+    with open(os.path.join(schedule_dir, "Store002_paninis.csv"), "a", encoding="utf-8") as f:
+        f.write("Tuna Panini,two\n")
+    schedules.import_dir(schedule_dir, week="2026-W41")
+    path = os.path.join(schedule_dir, "Store002_paninis.csv")
+
+    problems = schedules.problems()
+    assert list(problems) == [path]
+    assert any("non-numeric" in problem for problem in problems[path])
+    assert schedules.problems(stores=["Store001"]) == {}
+    # The CSV isn't parsed again, but its problems are still reported.
+    assert schedules.import_dir(schedule_dir, week="2026-W41") == []
+    assert schedules.problems() == problems
@@ -0,0 +1,101 @@
+import os
+import threading
+import time
+
+import pytest
+
+import lbx
+from backends import FakeBackend
+from server import DONE, FAILED, LocalClient, PrintClient, PrintServer, PrintServerError, make_http_server
+
+
+def wait_for(client, request_id, timeout=10):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        status = client.status(request_id)
+        if status["status"] in (DONE, FAILED):
+            return status
+        time.sleep(0.02)
+    raise AssertionError(f"request {request_id} still {status['status']}")
+
+
+@pytest.fixture
+def server(tmp_path, store):
+    return PrintServer(FakeBackend(), os.path.dirname(store), str(tmp_path / "journal"),
+                       str(tmp_path / "reprice_journal"), batch_window=0.2, workers=2)
+
+
+def test_requests_of_several_tills_are_merged(server, store):
+    till_1 = LocalClient(server, client="till-1")
+    till_2 = LocalClient(server, client="till-2")
+    first = till_1.submit_print("Store001", [{"label": "white/1.Ham.lbx", "copies": 2},
+                                             {"label": "other/Tuna Panini.lbx", "copies": 1}])
+    second = till_2.submit_print("Store001", [{"label": "white/1.Ham.lbx", "copies": 3}])
+
+    first, second = wait_for(till_1, first["id"]), wait_for(till_2, second["id"])
+    assert first["run"] == second["run"]
+    assert (first["client"], first["labels_printed"]) == ("till-1", 3)
+    assert (second["client"], second["labels_printed"]) == ("till-2", 3)
+    assert sorted((os.path.basename(path), copies) for path, copies, _ in server.backend.printed) == [
+        ("1.Ham.lbx", 5), ("Tuna Panini.lbx", 1)]
+    assert server.backend.count("Open") == 2
+    assert till_1.status()["requests"] == {DONE: 2}
+
+
+def test_failed_labels_fail_only_their_request(server, store):
+    client = LocalClient(server)
+    os.remove(os.path.join(store, "brown", "2.Egg.lbx"))
+    ok = client.submit_print("Store001", [{"label": "white/2.Egg.lbx", "copies": 1}])
+    broken = client.submit_print("Store001", [{"label": "brown/2.Egg.lbx", "copies": 1}])
+
+    assert wait_for(client, ok["id"])["status"] == DONE
+    broken = wait_for(client, broken["id"])
+    assert broken["status"] == FAILED
+    assert broken["errors"] == [["2.Egg.lbx", "Failed to open"]]
+
+
+@pytest.mark.parametrize("store_name, jobs, printer", [
+    ("..", [{"label": "white/1.Ham.lbx", "copies": 1}], None),
+    ("Store002", [{"label": "white/1.Ham.lbx", "copies": 1}], None),
+    ("Store001", [{"label": "../Store001/white/1.Ham.lbx", "copies": 1}], None),
+    ("Store001", [{"label": "white/1.Ham.lbx", "copies": "two"}], None),
+    ("Store001", [{"label": "white/1.Ham.lbx", "copies": 0}], None),
+    ("Store001", [{"label": "white/1.Ham.lbx", "copies": 1}], "Elsewhere"),
+])
+def test_invalid_print_requests_are_rejected(server, store_name, jobs, printer):
+    with pytest.raises(PrintServerError):
+        LocalClient(server).submit_print(store_name, jobs, printer=printer)
+    assert server.status()["requests"] == {}
+
+
+def test_reprice_and_store_listing(server, store):
+    client = LocalClient(server)
+    status = wait_for(client, client.submit_reprice("Store001", "2.75")["id"])
+    assert (status["price"], status["changed"], status["skipped"]) == ("£2.75", 4, 0)
+    assert lbx.read_price(os.path.join(store, "other", "Tuna Panini.lbx")) == "£2.50"
+
+    assert client.stores() == {"stores": ["Store001"]}
+    listing = client.store_labels("Store001")
+    assert listing["price"] == "£2.75"
+    assert listing["labels"][:2] == [{"label": "white/1.Ham.lbx", "price": "£2.75"},
+                                     {"label": "white/2.Egg.lbx", "price": "£2.75"}]
+    assert not os.path.exists(os.path.join(server.reprice_journal_dir, "Store001.jsonl"))
+
+    status = wait_for(client, client.submit_reprice("Store001", "£2.75")["id"])
+    assert (status["changed"], status["skipped"]) == (0, 4)
+
+
+def test_http_client_matches_local_client(server, store):
+    httpd = make_http_server(server, port=0)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    try:
+        client = PrintClient(f"http://127.0.0.1:{httpd.server_port}", client="till-3")
+        request = client.submit_print("Store001", [{"label": "brown/1.Ham.lbx", "copies": 2}])
+        assert wait_for(client, request["id"])["labels_printed"] == 2
+        assert client.store_labels("Store001") == LocalClient(server).store_labels("Store001")
+        with pytest.raises(PrintServerError) as error:
+            client.status("nope")
+        assert error.value.status == 404
+    finally:
+        httpd.shutdown()
+        httpd.server_close()
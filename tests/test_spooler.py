@@ -0,0 +1,100 @@
+import glob
+import os
+
+import pytest
+
+from backends import FakeBackend
+from spooler import PrintJob, PrintRun, Spooler, interrupted_jobs, plan_jobs, shard_jobs
+
+
+def store_labels(store):
+    return [os.path.join(store, folder_type, name) for folder_type, name in
+            (("other", "Tuna Panini.lbx"), ("white", "1.Ham.lbx"), ("brown", "2.Egg.lbx"),
+             ("white", "2.Egg.lbx"))]
+
+
+def print_run(spooler, run):
+    spooler.submit(run)
+    assert run.finished.wait(10)
+    return run
+
+
+@pytest.fixture
+def spooler(tmp_path):
+    backend = FakeBackend()
+    spooler = Spooler(backend.session, str(tmp_path / "journal"), initializer=backend.initialize_thread)
+    spooler.backend = backend
+    return spooler
+
+
+def test_plan_jobs_merges_templates_and_orders_by_folder_type(store):
+    other, white_ham, brown_egg, white_egg = store_labels(store)
+    jobs = plan_jobs([(other, 2), (white_ham, 1), (brown_egg, 0), (white_egg, 3), (white_ham, 4)])
+    assert [(job.path, job.copies) for job in jobs] == [(white_ham, 5), (white_egg, 3), (other, 2)]
+
+
+def test_shard_jobs_balances_copies():
+    jobs = [PrintJob(f"{i}.lbx", copies) for i, copies in enumerate([8, 1, 5, 4, 2])]
+    shards = shard_jobs(jobs, range(len(jobs)), ["A", "B"])
+    assert shards == [("A", [0, 4]), ("B", [1, 2, 3])]
+    assert shard_jobs(jobs, [1], ["A", "B", "C"]) == [("A", [1])]
+
+
+def test_run_prints_every_job_once(spooler, store):
+    jobs = plan_jobs((path, 2) for path in store_labels(store))
+    run = print_run(spooler, PrintRun("Store001", jobs, batch_size=3))
+
+    assert not run.failed and run.errors == []
+    assert run.labels_printed == 8
+    assert sorted(path for path, _, _ in spooler.backend.printed) == sorted(job.path for job in jobs)
+    assert spooler.backend.count("StartPrint") == 2
+    assert glob.glob(os.path.join(spooler.journal_dir, f"{run.id}-*.done.jsonl"))
+    assert interrupted_jobs(spooler.journal_dir, run) == set()
+
+
+def test_resume_prints_only_failed_labels(spooler, store):
+    jobs = plan_jobs((path, 1) for path in store_labels(store))
+    missing = jobs[1].path
+    os.rename(missing, missing + ".bak")
+
+    run = print_run(spooler, PrintRun("Store001", jobs))
+    assert run.failed and [path for path, _ in run.errors] == [missing]
+    assert run.labels_printed == 3
+    assert interrupted_jobs(spooler.journal_dir, run) == {0, 2, 3}
+
+    os.rename(missing + ".bak", missing)
+    spooler.backend.printed.clear()
+    run = print_run(spooler, PrintRun("Store001", jobs, resume=True))
+    assert not run.failed
+    assert run.resumed == 3
+    assert [path for path, _, _ in spooler.backend.printed] == [missing]
+    assert interrupted_jobs(spooler.journal_dir, run) == set()
+
+
+def test_without_resume_an_old_journal_is_set_aside(spooler, store):
+    jobs = plan_jobs((path, 1) for path in store_labels(store))
+    missing = jobs[0].path
+    os.rename(missing, missing + ".bak")
+    print_run(spooler, PrintRun("Store001", jobs))
+    os.rename(missing + ".bak", missing)
+
+    spooler.backend.printed.clear()
+    run = print_run(spooler, PrintRun("Store001", jobs))
+    assert run.resumed == 0
+    assert len(spooler.backend.printed) == len(jobs)
+    assert len(glob.glob(os.path.join(spooler.journal_dir, f"{run.id}-*.stale.jsonl"))) == 1
+
+
+def test_run_is_split_across_printers(tmp_path, store):
+    backend = FakeBackend()
+    spooler = Spooler(backend.session, str(tmp_path / "journal"), printers=("A", "B"))
+    jobs = plan_jobs(zip(store_labels(store), [4, 3, 2, 1]))
+    run = print_run(spooler, PrintRun("Store001", jobs))
+
+    assert not run.failed
+    assert {shard.printer: shard.copies for shard in run.shards} == {"A": 5, "B": 5}
+    assert sum(shard.labels_printed for shard in run.shards) == 10
+    assert {args[0] for method, args in backend.calls if method == "SetPrinter"} == {"A", "B"}
+
+    run = print_run(spooler, PrintRun("Store001", jobs, printers=["C"]))
+    assert run.failed and "Unknown printer" in run.errors[0][1]
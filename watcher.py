@@ -0,0 +1,223 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import threading
+import time
+
+from labels import FOLDER_TYPES, list_label_files
+
+# ------------------------------------------------------------------------
+# BASE_DIR watcher
+# ------------------------------------------------------------------------
+# Watches the white/brown/other folders of every store and reports, per
+# (store_path, folder_type), the new list of label files whenever it changes.
+# Events only mark folders dirty; once no new event has arrived for `debounce`
+# seconds the dirty folders are listed again and compared with the last
+# listing, so a bulk copy of thousands of files produces one update.
+# inotify is used on Linux; everywhere else a stat-snapshot poll is used. Both
+# also list every folder now and then, and inotify does so at once when its
+# event queue overflowed, so a lost event never hides a change for good.
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+WATCH_MASK = IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE | IN_DELETE_SELF | IN_MOVE_SELF
+EVENT_HEADER = struct.Struct("iIII")
+
+MAX_DELAY = 5.0          # report at the latest this long after the first event of a burst
+FULL_SCAN_EVERY = 15     # polling: list every folder on every Nth poll, not only those whose mtime changed;
+                         # inotify: list every folder every FULL_SCAN_EVERY * poll_interval seconds
+
+
+def list_folder(folder):
+    """Returns the label files of a folder (natural order), or None if it doesn't exist."""
+    try:
+        return list_label_files(folder, sort=os.path.basename(folder) != "other")
+    except OSError:
+        return None
+
+
+class Inotify:
+    """Minimal inotify binding through ctypes. Raises OSError where inotify isn't available."""
+
+    def __init__(self):
+        if not sys.platform.startswith("linux"):
+            raise OSError("inotify is only available on Linux")
+        self.libc = ctypes.CDLL(ctypes.util.find_library("c"), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        self.paths = {}
+        self.overflowed = False   # set when the kernel dropped events; cleared by the reader
+
+    def add_watch(self, path):
+        wd = self.libc.inotify_add_watch(self.fd, os.fsencode(path), WATCH_MASK)
+        if wd >= 0:
+            self.paths[wd] = path
+        return wd
+
+    def read(self, timeout):
+        """Waits up to timeout seconds and returns the (directory, name) of each event."""
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return []
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return []
+        events = []
+        offset = 0
+        while offset + EVENT_HEADER.size <= len(data):
+            wd, mask, cookie, length = EVENT_HEADER.unpack_from(data, offset)
+            offset += EVENT_HEADER.size
+            name = data[offset:offset + length].split(b"\0", 1)[0].decode("utf-8", "replace")
+            offset += length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+            elif wd in self.paths:
+                events.append((self.paths[wd], name))
+        return events
+
+    def close(self):
+        os.close(self.fd)
+
+
+class TreeWatcher:
+    """
+    Watches the label folders of the given stores on a background thread and calls
+    on_change({(store_path, folder_type): files_or_None}) with every debounced batch
+    of changes. on_change runs on the watcher thread.
+    """
+
+    def __init__(self, store_paths, on_change, debounce=0.5, poll_interval=2.0):
+        self.store_paths = list(store_paths)
+        self.on_change = on_change
+        self.debounce = debounce
+        self.poll_interval = poll_interval
+        self.listings = {}
+        self.mtimes = {}
+        self.stopped = threading.Event()
+        self.mode = None
+        self._thread = None
+
+    def folders(self):
+        for store_path in self.store_paths:
+            for folder_type in FOLDER_TYPES:
+                yield store_path, folder_type, os.path.join(store_path, folder_type)
+
+    def start(self):
+        for store_path, folder_type, folder in self.folders():
+            self.listings[(store_path, folder_type)] = list_folder(folder)
+            self.mtimes[folder] = self._mtime(folder)
+        self._thread = threading.Thread(target=self._run, name="TreeWatcher", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.stopped.set()
+
+    @staticmethod
+    def _mtime(path):
+        try:
+            return os.stat(path).st_mtime_ns
+        except OSError:
+            return None
+
+    def _run(self):
+        try:
+            inotify = Inotify()
+        except OSError:
+            self.mode = "poll"
+            self._run_polling()
+        else:
+            self.mode = "inotify"
+            try:
+                self._run_inotify(inotify)
+            finally:
+                inotify.close()
+
+    def _flush(self, dirty):
+        """Lists the dirty folders again and reports the ones whose files changed."""
+        changes = {}
+        for key in dirty:
+            store_path, folder_type = key
+            files = list_folder(os.path.join(store_path, folder_type))
+            if files != self.listings.get(key):
+                self.listings[key] = files
+                changes[key] = files
+        if changes:
+            self.on_change(changes)
+
+    def _run_inotify(self, inotify):
+        folder_keys = {folder: (store_path, folder_type) for store_path, folder_type, folder in self.folders()}
+
+        def watch_all():
+            for store_path in self.store_paths:
+                inotify.add_watch(store_path)
+            for folder in folder_keys:
+                if os.path.isdir(folder):
+                    inotify.add_watch(folder)
+        watch_all()
+
+        dirty = set()
+        first_event = last_event = None
+        next_full_scan = time.monotonic() + FULL_SCAN_EVERY * self.poll_interval
+        while not self.stopped.is_set():
+            timeout = self.debounce if dirty else 1.0
+            events = inotify.read(timeout)
+            if inotify.overflowed or time.monotonic() >= next_full_scan:
+                # Events may have been lost: watch every folder again and list them all.
+                inotify.overflowed = False
+                next_full_scan = time.monotonic() + FULL_SCAN_EVERY * self.poll_interval
+                watch_all()
+                dirty.update(folder_keys.values())
+                last_event = time.monotonic()
+                first_event = first_event or last_event
+            for directory, name in events:
+                if directory in folder_keys:
+                    dirty.add(folder_keys[directory])
+                elif os.path.join(directory, name) in folder_keys:
+                    # A white/brown/other folder was created, removed or renamed.
+                    folder = os.path.join(directory, name)
+                    if os.path.isdir(folder):
+                        inotify.add_watch(folder)
+                    dirty.add(folder_keys[folder])
+                else:
+                    continue
+                last_event = time.monotonic()
+                first_event = first_event or last_event
+            now = time.monotonic()
+            if dirty and (now - last_event >= self.debounce or now - first_event >= MAX_DELAY):
+                self._flush(dirty)
+                dirty = set()
+                first_event = last_event = None
+
+    def _run_polling(self):
+        dirty = set()
+        first_event = last_event = None
+        polls = 0
+        while not self.stopped.wait(self.debounce if dirty else self.poll_interval):
+            polls += 1
+            full_scan = polls % FULL_SCAN_EVERY == 0
+            for store_path, folder_type, folder in self.folders():
+                mtime = self._mtime(folder)
+                if full_scan or mtime != self.mtimes.get(folder):
+                    self.mtimes[folder] = mtime
+                    if full_scan and list_folder(folder) == self.listings.get((store_path, folder_type)):
+                        continue
+                    dirty.add((store_path, folder_type))
+                    last_event = time.monotonic()
+                    first_event = first_event or last_event
+            now = time.monotonic()
+            if dirty and (now - last_event >= self.debounce or now - first_event >= MAX_DELAY):
+                self._flush(dirty)
+                dirty = set()
+                first_event = last_event = None